@@ -0,0 +1,153 @@
+"""partition submissions by month
+
+Revision ID: 006_partition_submissions
+Revises: 005_update_drafts_schema
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+
+from datetime import date, datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic
+revision = "006_partition_submissions"
+down_revision = "005_update_drafts_schema"
+branch_labels = None
+depends_on = None
+
+PARTITIONS_AHEAD = 3
+
+COLUMNS = (
+    "id, challenge_id, user_id, query, status, passed_tests, total_tests, "
+    "execution_time, error_message, test_results, submitted_at"
+)
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _create_month_partition(month: date):
+    upper = _add_months(month, 1)
+    op.execute(
+        f"CREATE TABLE IF NOT EXISTS submissions_y{month.year:04d}m{month.month:02d} "
+        f"PARTITION OF submissions "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+    )
+
+
+def upgrade() -> None:
+    # Range partitioning is Postgres-only; other backends keep the plain table
+    connection = op.get_bind()
+    if connection.dialect.name != "postgresql":
+        return
+
+    sequence = connection.execute(
+        sa.text("SELECT pg_get_serial_sequence('submissions', 'id')")
+    ).scalar()
+    oldest = connection.execute(
+        sa.text("SELECT MIN(submitted_at) FROM submissions")
+    ).scalar()
+
+    op.execute("ALTER TABLE submissions RENAME TO submissions_unpartitioned")
+    op.execute(
+        "ALTER TABLE submissions_unpartitioned "
+        "RENAME CONSTRAINT submissions_pkey TO submissions_unpartitioned_pkey"
+    )
+    op.drop_index("ix_submissions_challenge_id", table_name="submissions_unpartitioned")
+    op.drop_index("ix_submissions_user_id", table_name="submissions_unpartitioned")
+    op.drop_index("ix_submissions_status", table_name="submissions_unpartitioned")
+
+    op.execute(
+        f"""
+        CREATE TABLE submissions (
+            id INTEGER NOT NULL DEFAULT nextval('{sequence}'),
+            challenge_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL DEFAULT 1,
+            query TEXT NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            passed_tests INTEGER NOT NULL DEFAULT 0,
+            total_tests INTEGER NOT NULL DEFAULT 0,
+            execution_time DOUBLE PRECISION,
+            error_message TEXT,
+            test_results JSON,
+            submitted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            CONSTRAINT submissions_pkey PRIMARY KEY (id, submitted_at)
+        ) PARTITION BY RANGE (submitted_at)
+        """
+    )
+    # Catches rows for months nobody created yet; create_partitions moves
+    # them into their own partition before attaching it
+    op.execute("CREATE TABLE submissions_default PARTITION OF submissions DEFAULT")
+
+    this_month = datetime.utcnow().date().replace(day=1)
+    month = oldest.date().replace(day=1) if oldest else this_month
+    while month <= _add_months(this_month, PARTITIONS_AHEAD):
+        _create_month_partition(month)
+        month = _add_months(month, 1)
+
+    # Composite indexes so per-user history and per-challenge lookups stay
+    # ordered by time inside each partition
+    op.create_index(
+        "ix_submissions_user_id_submitted_at", "submissions", ["user_id", "submitted_at"]
+    )
+    op.create_index(
+        "ix_submissions_challenge_id_submitted_at",
+        "submissions",
+        ["challenge_id", "submitted_at"],
+    )
+    op.create_index("ix_submissions_user_id_status", "submissions", ["user_id", "status"])
+
+    op.execute(
+        f"INSERT INTO submissions ({COLUMNS}) "
+        f"SELECT {COLUMNS} FROM submissions_unpartitioned"
+    )
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY submissions.id")
+    op.drop_table("submissions_unpartitioned")
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    if connection.dialect.name != "postgresql":
+        return
+
+    sequence = connection.execute(
+        sa.text("SELECT pg_get_serial_sequence('submissions', 'id')")
+    ).scalar()
+
+    op.execute("ALTER TABLE submissions RENAME TO submissions_partitioned")
+    op.execute(
+        "ALTER TABLE submissions_partitioned "
+        "RENAME CONSTRAINT submissions_pkey TO submissions_partitioned_pkey"
+    )
+    op.execute(
+        f"""
+        CREATE TABLE submissions (
+            id INTEGER NOT NULL DEFAULT nextval('{sequence}'),
+            challenge_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL DEFAULT 1,
+            query TEXT NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            passed_tests INTEGER NOT NULL DEFAULT 0,
+            total_tests INTEGER NOT NULL DEFAULT 0,
+            execution_time DOUBLE PRECISION,
+            error_message TEXT,
+            test_results JSON,
+            submitted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            CONSTRAINT submissions_pkey PRIMARY KEY (id)
+        )
+        """
+    )
+    op.execute(
+        f"INSERT INTO submissions ({COLUMNS}) "
+        f"SELECT {COLUMNS} FROM submissions_partitioned"
+    )
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY submissions.id")
+    op.drop_table("submissions_partitioned")
+
+    op.create_index("ix_submissions_challenge_id", "submissions", ["challenge_id"])
+    op.create_index("ix_submissions_user_id", "submissions", ["user_id"])
+    op.create_index("ix_submissions_status", "submissions", ["status"])
@@ -0,0 +1,47 @@
+"""unique draft per challenge and user
+
+Revision ID: 007_drafts_unique_key
+Revises: 006_partition_submissions
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic
+revision = "007_drafts_unique_key"
+down_revision = "006_partition_submissions"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    constraints = [
+        constraint["name"] for constraint in inspector.get_unique_constraints("drafts")
+    ]
+    if "uq_drafts_challenge_user" in constraints:
+        return
+
+    # Keep only the newest draft per key so the constraint can be created
+    op.execute(
+        "DELETE FROM drafts WHERE id NOT IN "
+        "(SELECT MAX(id) FROM drafts GROUP BY challenge_id, user_id)"
+    )
+    op.create_unique_constraint(
+        "uq_drafts_challenge_user", "drafts", ["challenge_id", "user_id"]
+    )
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    constraints = [
+        constraint["name"] for constraint in inspector.get_unique_constraints("drafts")
+    ]
+    if "uq_drafts_challenge_user" in constraints:
+        op.drop_constraint("uq_drafts_challenge_user", "drafts", type_="unique")
@@ -0,0 +1,43 @@
+"""add execution plan to challenges
+
+Revision ID: 008_challenge_execution_plan
+Revises: 007_drafts_unique_key
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic
+revision = "008_challenge_execution_plan"
+down_revision = "007_drafts_unique_key"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    columns = [col["name"] for col in inspector.get_columns("challenges")]
+
+    # Existing challenges keep NULL and are compiled when first loaded
+    if "execution_plan" not in columns:
+        op.add_column(
+            "challenges",
+            sa.Column(
+                "execution_plan",
+                postgresql.JSON(astext_type=sa.Text()),
+                nullable=True,
+            ),
+        )
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    columns = [col["name"] for col in inspector.get_columns("challenges")]
+
+    if "execution_plan" in columns:
+        op.drop_column("challenges", "execution_plan")
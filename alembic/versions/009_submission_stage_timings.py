@@ -0,0 +1,40 @@
+"""add stage timings to submissions
+
+Revision ID: 009_submission_stage_timings
+Revises: 008_challenge_execution_plan
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic
+revision = "009_submission_stage_timings"
+down_revision = "008_challenge_execution_plan"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    columns = [col["name"] for col in inspector.get_columns("submissions")]
+
+    if "stage_timings" not in columns:
+        op.add_column(
+            "submissions",
+            sa.Column(
+                "stage_timings", postgresql.JSON(astext_type=sa.Text()), nullable=True
+            ),
+        )
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    columns = [col["name"] for col in inspector.get_columns("submissions")]
+
+    if "stage_timings" in columns:
+        op.drop_column("submissions", "stage_timings")
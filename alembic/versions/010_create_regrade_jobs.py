@@ -0,0 +1,59 @@
+"""create regrade jobs table
+
+Revision ID: 010_create_regrade_jobs
+Revises: 009_submission_stage_timings
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic
+revision = "010_create_regrade_jobs"
+down_revision = "009_submission_stage_timings"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    if "regrade_jobs" not in inspector.get_table_names():
+        op.create_table(
+            "regrade_jobs",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("challenge_id", sa.Integer(), nullable=False),
+            sa.Column("status", sa.String(20), nullable=False, server_default="queued"),
+            sa.Column("total", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("processed", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("changed", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column(
+                "last_submission_id", sa.Integer(), nullable=False, server_default="0"
+            ),
+            sa.Column("error_message", sa.Text(), nullable=True),
+            sa.Column(
+                "created_at",
+                sa.DateTime(),
+                nullable=False,
+                server_default=sa.text("CURRENT_TIMESTAMP"),
+            ),
+            sa.Column(
+                "updated_at",
+                sa.DateTime(),
+                nullable=False,
+                server_default=sa.text("CURRENT_TIMESTAMP"),
+            ),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_regrade_jobs_challenge_id", "regrade_jobs", ["challenge_id"])
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    if "regrade_jobs" in inspector.get_table_names():
+        op.drop_index("ix_regrade_jobs_challenge_id", table_name="regrade_jobs")
+        op.drop_table("regrade_jobs")
@@ -0,0 +1,40 @@
+"""add efficiency results to submissions
+
+Revision ID: 011_submission_efficiency
+Revises: 010_create_regrade_jobs
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic
+revision = "011_submission_efficiency"
+down_revision = "010_create_regrade_jobs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    columns = [col["name"] for col in inspector.get_columns("submissions")]
+
+    if "efficiency" not in columns:
+        op.add_column(
+            "submissions",
+            sa.Column(
+                "efficiency", postgresql.JSON(astext_type=sa.Text()), nullable=True
+            ),
+        )
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    columns = [col["name"] for col in inspector.get_columns("submissions")]
+
+    if "efficiency" in columns:
+        op.drop_column("submissions", "efficiency")
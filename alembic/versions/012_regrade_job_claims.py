@@ -0,0 +1,34 @@
+"""add claim tokens to regrade jobs
+
+Revision ID: 012_regrade_job_claims
+Revises: 011_submission_efficiency
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic
+revision = "012_regrade_job_claims"
+down_revision = "011_submission_efficiency"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    columns = [col["name"] for col in inspector.get_columns("regrade_jobs")]
+
+    if "claim" not in columns:
+        op.add_column("regrade_jobs", sa.Column("claim", sa.String(32), nullable=True))
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    columns = [col["name"] for col in inspector.get_columns("regrade_jobs")]
+
+    if "claim" in columns:
+        op.drop_column("regrade_jobs", "claim")
@@ -0,0 +1,37 @@
+"""add a version counter to challenges
+
+Revision ID: 013_challenge_version
+Revises: 012_regrade_job_claims
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic
+revision = "013_challenge_version"
+down_revision = "012_regrade_job_claims"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    columns = [col["name"] for col in inspector.get_columns("challenges")]
+
+    if "version" not in columns:
+        op.add_column(
+            "challenges",
+            sa.Column("version", sa.Integer(), nullable=False, server_default="1"),
+        )
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    columns = [col["name"] for col in inspector.get_columns("challenges")]
+
+    if "version" in columns:
+        op.drop_column("challenges", "version")
@@ -1,31 +1,80 @@
-from fastapi import APIRouter, Depends, HTTPException
+import random
+import re
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app.models import Challenge, Submission
 from app.schemas import (
+    DatasetRequest,
     GenerateChallengeRequest,
+    GenerateTestsRequest,
     ChallengeResponse,
     ChallengeCreateRequest,
 )
 from app.services.ai_generator import generate_challenge
+from app.services.challenge_cache import challenge_cache
+from app.services.data_generator import generate_test_cases
+from app.services.parquet_datasets import parquet_datasets
+from app.services.sql_executor import executor
+from app.services.test_stats import test_stats
 from app.config import settings
 
 router = APIRouter()
 
+ENTITY_TAG = re.compile(r'(?:W/)?("[^"]*")')
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of If-None-Match entity tags against ours."""
+    if if_none_match.strip() == "*":
+        return True
+    return etag in ENTITY_TAG.findall(if_none_match)
+
+
+def _check_generation_limits(count: int, rows: int):
+    if not 0 <= count <= settings.GENERATED_TESTS_MAX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Число тестов должно быть от 0 до {settings.GENERATED_TESTS_MAX}",
+        )
+    if not 1 <= rows <= settings.GENERATED_ROWS_MAX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Число строк должно быть от 1 до {settings.GENERATED_ROWS_MAX}",
+        )
+
 
 @router.post("/preview")
 async def preview_challenge(request: GenerateChallengeRequest):
+    _check_generation_limits(request.generated_tests, request.generated_rows)
     try:
         challenge_data = await generate_challenge(
             difficulty=request.difficulty, topics=request.topics
         )
-        return challenge_data
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Ошибка генерации задачи: {str(e)}"
         )
 
+    if request.generated_tests:
+        seed = request.seed if request.seed is not None else random.randrange(2**31)
+        try:
+            challenge_data["test_cases"] += await generate_test_cases(
+                challenge_data["schema_definition"],
+                challenge_data["solution_query"],
+                request.generated_tests,
+                request.generated_rows,
+                seed,
+                [test_case["name"] for test_case in challenge_data["test_cases"]],
+            )
+        except ValueError as ve:
+            raise HTTPException(
+                status_code=400, detail=f"Не удалось сгенерировать тесты: {str(ve)}"
+            )
+    return challenge_data
+
 
 @router.post("/approve", response_model=ChallengeResponse)
 async def approve_challenge(
@@ -34,6 +83,15 @@ async def approve_challenge(
     try:
         test_cases_dict = [test_case.dict() for test_case in request.test_cases]
 
+        try:
+            execution_plan = await executor.compile_plan(
+                request.schema_definition, test_cases_dict
+            )
+        except ValueError as ve:
+            raise HTTPException(
+                status_code=400, detail=f"Некорректная схема задачи: {str(ve)}"
+            )
+
         challenge = Challenge(
             title=request.title,
             description=request.description,
@@ -45,6 +103,7 @@ async def approve_challenge(
             solution_query=request.solution_query,
             test_cases=test_cases_dict,
             hints=request.hints or [],
+            execution_plan=execution_plan,
             user_id=settings.ADMIN_USER_ID,
         )
 
@@ -65,8 +124,13 @@ async def approve_challenge(
         db.add(submission)
         db.commit()
 
+        # A new id, so nothing is stale; warm the cache for the first /execute
+        challenge_cache.put(challenge)
+
         return challenge
 
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -74,11 +138,129 @@ async def approve_challenge(
         )
 
 
-@router.get("/{challenge_id}", response_model=ChallengeResponse)
-async def get_challenge(challenge_id: int, db: Session = Depends(get_db)):
+@router.post("/{challenge_id}/generated-tests", response_model=ChallengeResponse)
+async def add_generated_tests(
+    challenge_id: int, request: GenerateTestsRequest, db: Session = Depends(get_db)
+):
+    """Append seeded synthetic tests; expected outputs come from the solution"""
+    _check_generation_limits(request.count, request.rows)
+
     challenge = db.query(Challenge).filter(Challenge.id == challenge_id).first()
+    if not challenge:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+
+    seed = request.seed if request.seed is not None else random.randrange(2**31)
+    try:
+        generated = await generate_test_cases(
+            challenge.schema_definition,
+            challenge.solution_query,
+            request.count,
+            request.rows,
+            seed,
+            [test_case["name"] for test_case in challenge.test_cases],
+        )
+        test_cases = list(challenge.test_cases) + generated
+        execution_plan = await executor.compile_plan(
+            challenge.schema_definition, test_cases
+        )
+    except ValueError as ve:
+        raise HTTPException(
+            status_code=400, detail=f"Не удалось сгенерировать тесты: {str(ve)}"
+        )
+
+    try:
+        challenge.test_cases = test_cases
+        challenge.execution_plan = execution_plan
+        challenge.version = Challenge.version + 1
+        db.commit()
+        db.refresh(challenge)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=500, detail=f"Ошибка сохранения задачи: {str(e)}"
+        )
+
+    challenge_cache.invalidate(challenge_id)
+    test_stats.invalidate(challenge_id)
+    return challenge
 
+
+@router.post("/{challenge_id}/dataset", response_model=ChallengeResponse)
+async def add_dataset(
+    challenge_id: int, request: DatasetRequest, db: Session = Depends(get_db)
+):
+    """Append a test on a large seeded dataset stored as Parquet files"""
+    challenge = db.query(Challenge).filter(Challenge.id == challenge_id).first()
     if not challenge:
         raise HTTPException(status_code=404, detail="Задача не найдена")
 
+    tables = {table["name"] for table in challenge.schema_definition.get("tables", [])}
+    counts = request.rows if isinstance(request.rows, dict) else {"": request.rows}
+    unknown = set(counts) - tables - {""}
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Неизвестные таблицы: {', '.join(sorted(unknown))}",
+        )
+    if not all(0 <= count <= settings.DATASET_ROWS_MAX for count in counts.values()):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Число строк должно быть от 0 до {settings.DATASET_ROWS_MAX}",
+        )
+
+    seed = request.seed if request.seed is not None else random.randrange(2**31)
+    spec = parquet_datasets.spec(challenge.schema_definition, request.rows, seed)
+    try:
+        expected_output = await parquet_datasets.compute_output(
+            challenge.solution_query, challenge.schema_definition, spec
+        )
+        test_cases = list(challenge.test_cases) + [
+            {
+                "name": f"Большой набор данных #{seed}",
+                "input_data": {},
+                "expected_output": expected_output,
+                "dataset": spec,
+            }
+        ]
+        execution_plan = await executor.compile_plan(
+            challenge.schema_definition, test_cases
+        )
+    except ValueError as ve:
+        raise HTTPException(
+            status_code=400, detail=f"Не удалось создать набор данных: {str(ve)}"
+        )
+
+    try:
+        challenge.test_cases = test_cases
+        challenge.execution_plan = execution_plan
+        challenge.version = Challenge.version + 1
+        db.commit()
+        db.refresh(challenge)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=500, detail=f"Ошибка сохранения задачи: {str(e)}"
+        )
+
+    challenge_cache.invalidate(challenge_id)
+    test_stats.invalidate(challenge_id)
     return challenge
+
+
+@router.get("/{challenge_id}", response_model=ChallengeResponse)
+async def get_challenge(
+    challenge_id: int, request: Request, db: Session = Depends(get_db)
+):
+    challenge = challenge_cache.get(db, challenge_id)
+
+    if not challenge:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+
+    # Challenges can gain tests, so clients revalidate every time; the ETag
+    # keeps that to a 304
+    headers = {"ETag": challenge.etag, "Cache-Control": "no-cache"}
+
+    if _etag_matches(request.headers.get("if-none-match", ""), challenge.etag):
+        return Response(status_code=304, headers=headers)
+
+    return JSONResponse(content=challenge.response, headers=headers)
@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models import Draft
 from app.config import settings
+from app.services.draft_coalescer import draft_coalescer
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -23,39 +24,16 @@ class DraftResponse(BaseModel):
 
 
 @router.post("/save", response_model=DraftResponse)
-async def save_draft(request: DraftCreateRequest, db: Session = Depends(get_db)):
+async def save_draft(request: DraftCreateRequest):
     """Save or update draft for a challenge"""
     try:
-        # Check if draft exists for this challenge and user
-        existing_draft = (
-            db.query(Draft)
-            .filter(
-                Draft.challenge_id == request.challenge_id,
-                Draft.user_id == settings.ADMIN_USER_ID,
-            )
-            .first()
+        return await draft_coalescer.save(
+            challenge_id=request.challenge_id,
+            user_id=settings.ADMIN_USER_ID,
+            query=request.query,
         )
 
-        if existing_draft:
-            # Update existing draft
-            existing_draft.query = request.query
-            db.commit()
-            db.refresh(existing_draft)
-            return existing_draft
-        else:
-            # Create new draft
-            draft = Draft(
-                challenge_id=request.challenge_id,
-                user_id=settings.ADMIN_USER_ID,
-                query=request.query,
-            )
-            db.add(draft)
-            db.commit()
-            db.refresh(draft)
-            return draft
-
     except Exception as e:
-        db.rollback()
         raise HTTPException(
             status_code=500, detail=f"Ошибка сохранения черновика: {str(e)}"
         )
@@ -64,6 +42,10 @@ async def save_draft(request: DraftCreateRequest, db: Session = Depends(get_db))
 @router.get("/{challenge_id}", response_model=DraftResponse)
 async def get_draft(challenge_id: int, db: Session = Depends(get_db)):
     """Get draft for a challenge"""
+    pending = draft_coalescer.get_pending(challenge_id, settings.ADMIN_USER_ID)
+    if pending:
+        return pending
+
     draft = (
         db.query(Draft)
         .filter(
@@ -83,6 +65,8 @@ async def get_draft(challenge_id: int, db: Session = Depends(get_db)):
 async def delete_draft(challenge_id: int, db: Session = Depends(get_db)):
     """Delete draft for a challenge"""
     try:
+        await draft_coalescer.discard(challenge_id, settings.ADMIN_USER_ID)
+
         draft = (
             db.query(Draft)
             .filter(
@@ -1,34 +1,84 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import hmac
+import math
+import time
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any, cast
 from app.database import get_db
-from app.models import Challenge, Submission
-from app.schemas import ExecuteQueryRequest, ExecuteQueryResponse, TestResult
-from app.services.sql_executor import executor
+from app.schemas import (
+    BatchQueryResult,
+    ExecuteBatchRequest,
+    ExecuteQueryRequest,
+    ExecuteQueryResponse,
+    ExplainRequest,
+    ExplainResponse,
+    ExecutorPoolRequest,
+    ExecutorPoolResponse,
+    HiddenCheck,
+    RunQueryRequest,
+    RunQueryResponse,
+    TestResult,
+)
+from app.services.sql_executor import AdmissionRejected, executor
+from app.services.challenge_cache import challenge_cache
+from app.services.remote_executor import TOKEN_HEADER, check_token, grading_backend
+from app.services.submission_writer import submission_writer
+from app.services.test_stats import test_stats
 from app.config import settings
 
 router = APIRouter()
 
+DIAGNOSTIC_KEYS = ("timings", "profile")
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+
+def require_admin(
+    admin_token: Optional[str] = Header(None, alias=ADMIN_TOKEN_HEADER),
+    worker_token: Optional[str] = Header(None, alias=TOKEN_HEADER),
+):
+    """Operator endpoints take the admin token or the grading-node token."""
+    is_admin = (
+        bool(settings.ADMIN_TOKEN)
+        and admin_token is not None
+        and hmac.compare_digest(admin_token, settings.ADMIN_TOKEN)
+    )
+    if not (is_admin or check_token(worker_token)):
+        raise HTTPException(status_code=403, detail="Недостаточно прав")
+
+
+def _without_diagnostics(result: dict) -> dict:
+    return {key: value for key, value in result.items() if key not in DIAGNOSTIC_KEYS}
+
 
 @router.post("/execute", response_model=ExecuteQueryResponse)
 async def execute_query(request: ExecuteQueryRequest, db: Session = Depends(get_db)):
-    challenge = db.query(Challenge).filter(Challenge.id == request.challenge_id).first()
+    challenge = challenge_cache.get(db, request.challenge_id)
 
     if not challenge:
         raise HTTPException(status_code=404, detail="Задача не найдена")
 
-    schema_definition = cast(Dict[str, Any], challenge.schema_definition)
-    test_cases = cast(List[Dict[str, Any]], challenge.test_cases)
+    test_cases = challenge.test_cases
 
     try:
-        test_results_raw, execution_time, error = await executor.execute_and_test(
+        order = None
+        if request.fail_fast:
+            order = test_stats.order(
+                db, request.challenge_id, challenge.version, test_cases
+            )
+
+        test_results_raw, execution_time, error = await grading_backend.grade(
+            challenge,
             query=request.query,
-            schema_definition=schema_definition,
-            test_cases=test_cases,
+            profile=request.profile,
+            user_id=settings.ADMIN_USER_ID,
+            fail_fast=request.fail_fast,
+            order=order,
         )
 
         if error:
-            submission = Submission(
+            await submission_writer.enqueue(
                 challenge_id=request.challenge_id,
                 user_id=settings.ADMIN_USER_ID,
                 query=request.query,
@@ -39,8 +89,6 @@ async def execute_query(request: ExecuteQueryRequest, db: Session = Depends(get_
                 error_message=error,
                 test_results=[],
             )
-            db.add(submission)
-            db.commit()
 
             return ExecuteQueryResponse(
                 status="failed",
@@ -51,12 +99,42 @@ async def execute_query(request: ExecuteQueryRequest, db: Session = Depends(get_
                 error_message=error,
             )
 
-        test_results = [TestResult(**result) for result in test_results_raw]
+        checks = {"hidden": None, "efficiency": None}
+        if test_results_raw and all(result["passed"] for result in test_results_raw):
+            checks = await grading_backend.review(
+                challenge, request.query, request.efficiency
+            )
+        hidden = checks["hidden"]
+        # Reported on its own, so the test counts never depend on the check
+        hidden_error = None
+        if hidden is not None and hidden["status"] == "failed":
+            hidden_error = hidden["error"]
+
+        test_stats.record(request.challenge_id, test_results_raw)
+        stage_timings = executor.summarize_timings(test_results_raw)
+        stored_results = [_without_diagnostics(result) for result in test_results_raw]
+
+        test_results = [
+            TestResult(
+                **(
+                    result
+                    if request.timings or request.profile
+                    else _without_diagnostics(result)
+                )
+            )
+            for result in test_results_raw
+        ]
         passed_tests = sum(1 for result in test_results if result.passed)
         total_tests = len(test_results)
-        status = "solved" if passed_tests == total_tests else "failed"
+        status = (
+            "solved"
+            if passed_tests == total_tests and hidden_error is None
+            else "failed"
+        )
+
+        efficiency = checks["efficiency"] if status == "solved" else None
 
-        submission = Submission(
+        await submission_writer.enqueue(
             challenge_id=request.challenge_id,
             user_id=settings.ADMIN_USER_ID,
             query=request.query,
@@ -64,10 +142,11 @@ async def execute_query(request: ExecuteQueryRequest, db: Session = Depends(get_
             passed_tests=passed_tests,
             total_tests=total_tests,
             execution_time=execution_time,
-            test_results=test_results_raw,
+            error_message=hidden_error,
+            test_results=stored_results,
+            stage_timings=stage_timings,
+            efficiency=efficiency,
         )
-        db.add(submission)
-        db.commit()
 
         return ExecuteQueryResponse(
             status=status,
@@ -75,9 +154,192 @@ async def execute_query(request: ExecuteQueryRequest, db: Session = Depends(get_
             total_tests=total_tests,
             execution_time=execution_time,
             test_results=test_results,
-            error_message=None,
+            error_message=hidden_error,
+            stage_timings=stage_timings if request.timings else None,
+            efficiency=efficiency,
+            hidden_check=HiddenCheck(**hidden) if hidden else None,
         )
 
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+        )
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Ошибка выполнения: {str(e)}")
+
+
+@router.post("/run", response_model=RunQueryResponse)
+async def run_query(request: RunQueryRequest, db: Session = Depends(get_db)):
+    """Run a query on the sample data only: no grading, nothing is stored"""
+    challenge = challenge_cache.get(db, request.challenge_id)
+
+    if not challenge:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+
+    max_rows = settings.SAMPLE_RUN_MAX_ROWS
+    if request.max_rows is not None:
+        max_rows = max(1, min(request.max_rows, settings.SAMPLE_RUN_MAX_ROWS))
+
+    try:
+        result, execution_time = await executor.run_sample(
+            fixture_key=f"{challenge.id}:{challenge.etag}",
+            query=request.query,
+            schema_definition=challenge.schema_definition,
+            sample_data=challenge.sample_data,
+            plan=challenge.plan,
+            max_rows=max_rows,
+            user_id=settings.ADMIN_USER_ID,
+        )
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+        )
+
+    return RunQueryResponse(
+        columns=result["columns"],
+        rows=result["rows"],
+        row_count=len(result["rows"]),
+        truncated=result["truncated"],
+        execution_time=execution_time,
+        error_message=result["error"],
+    )
+
+
+@router.post("/explain", response_model=ExplainResponse)
+async def explain_query(request: ExplainRequest, db: Session = Depends(get_db)):
+    """Physical plan of a query on the sample data, with per-operator timings"""
+    challenge = challenge_cache.get(db, request.challenge_id)
+
+    if not challenge:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+
+    started = time.perf_counter()
+    try:
+        result, cached = await executor.explain_sample(
+            fixture_key=f"{challenge.id}:{challenge.etag}",
+            query=request.query,
+            schema_definition=challenge.schema_definition,
+            sample_data=challenge.sample_data,
+            plan=challenge.plan,
+            analyze=request.analyze,
+            user_id=settings.ADMIN_USER_ID,
+        )
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+        )
+
+    return ExplainResponse(
+        plan=result["plan"],
+        analyzed=request.analyze,
+        total_ms=result.get("total_ms"),
+        rows_scanned=result.get("rows_scanned"),
+        peak_memory=result.get("peak_memory"),
+        cached=cached,
+        execution_time=time.perf_counter() - started,
+        error_message=result["error"],
+    )
+
+
+@router.post("/execute-batch")
+async def execute_batch(request: ExecuteBatchRequest, db: Session = Depends(get_db)):
+    """Grade many queries for one challenge; streams one NDJSON line per query"""
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="Список запросов пуст")
+    if len(request.queries) > settings.EXECUTOR_BATCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Не более {settings.EXECUTOR_BATCH_MAX_QUERIES} запросов за раз",
+        )
+
+    challenge = challenge_cache.get(db, request.challenge_id)
+
+    if not challenge:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+
+    try:
+        batch = executor.execute_batch(
+            queries=request.queries,
+            schema_definition=challenge.schema_definition,
+            test_cases=challenge.test_cases,
+            plan=challenge.plan,
+            user_id=settings.ADMIN_USER_ID,
+        )
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+        )
+
+    async def grade(lines: asyncio.Queue):
+        rows = []
+        try:
+            async for index, test_results_raw, execution_time in batch:
+                passed_tests = sum(1 for result in test_results_raw if result["passed"])
+                total_tests = len(test_results_raw)
+                status = "solved" if passed_tests == total_tests else "failed"
+
+                rows.append(
+                    {
+                        "challenge_id": request.challenge_id,
+                        "user_id": settings.ADMIN_USER_ID,
+                        "query": request.queries[index],
+                        "status": status,
+                        "passed_tests": passed_tests,
+                        "total_tests": total_tests,
+                        "execution_time": execution_time,
+                        "error_message": None,
+                        "test_results": test_results_raw,
+                    }
+                )
+
+                line = BatchQueryResult(
+                    index=index,
+                    query=request.queries[index],
+                    status=status,
+                    passed_tests=passed_tests,
+                    total_tests=total_tests,
+                    execution_time=execution_time,
+                    test_results=[TestResult(**result) for result in test_results_raw],
+                )
+                lines.put_nowait(line.model_dump_json() + "\n")
+        finally:
+            lines.put_nowait(None)
+            await asyncio.shield(submission_writer.persist(rows))
+
+    async def stream():
+        # Grading runs in its own task, so every finished verdict is stored
+        # even if the client disconnects, which only cancels the rest
+        lines: asyncio.Queue = asyncio.Queue()
+        worker = asyncio.create_task(grade(lines))
+        try:
+            while (line := await lines.get()) is not None:
+                yield line
+            await worker
+        finally:
+            worker.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@router.get("/pool", response_model=ExecutorPoolResponse)
+async def get_pool():
+    return executor.pool_config()
+
+
+@router.put(
+    "/pool", response_model=ExecutorPoolResponse, dependencies=[Depends(require_admin)]
+)
+async def resize_pool(request: ExecutorPoolRequest):
+    """Resize the worker pool; 0 means auto-size from the CPU count"""
+    if request.workers < 0 or request.duckdb_threads < 0:
+        raise HTTPException(status_code=400, detail="Значения должны быть >= 0")
+    return executor.resize(request.workers, request.duckdb_threads)
@@ -6,10 +6,20 @@ from app.models import Challenge, Submission
 from app.schemas import HistoryItemResponse, HistoryStatsResponse, SubmissionResponse
 from app.config import settings
 from typing import List, Optional
+from datetime import datetime, timedelta
 
 router = APIRouter()
 
 
+def _recent(query, days: Optional[int]):
+    # A lower bound on submitted_at lets Postgres prune old partitions
+    if days is None:
+        return query
+    return query.filter(
+        Submission.submitted_at >= datetime.utcnow() - timedelta(days=days)
+    )
+
+
 @router.get("/submissions", response_model=List[HistoryItemResponse])
 async def get_submission_history(
     difficulty: Optional[str] = None,
@@ -17,13 +27,16 @@ async def get_submission_history(
     status: Optional[str] = None,
     limit: int = Query(50, le=100),
     offset: int = 0,
+    days: int = Query(settings.HISTORY_DAYS, ge=1),
     db: Session = Depends(get_db),
 ):
+    """Latest submissions of the last `days` days (HISTORY_DAYS by default)"""
     query = db.query(
         Submission, Challenge.title, Challenge.difficulty, Challenge.topics
     ).join(Challenge, Submission.challenge_id == Challenge.id)
 
     query = query.filter(Submission.user_id == settings.ADMIN_USER_ID)
+    query = _recent(query, days)
 
     if difficulty:
         query = query.filter(Challenge.difficulty == difficulty)
@@ -59,27 +72,32 @@ async def get_submission_history(
 
 
 @router.get("/stats", response_model=HistoryStatsResponse)
-async def get_statistics(db: Session = Depends(get_db)):
-    total_submissions = (
-        db.query(Submission)
-        .filter(Submission.user_id == settings.ADMIN_USER_ID)
-        .count()
-    )
-
-    solved_count = (
-        db.query(Submission)
-        .filter(
+async def get_statistics(
+    days: Optional[int] = Query(None, ge=1), db: Session = Depends(get_db)
+):
+    """All-time statistics, or of the last `days` days"""
+    total_submissions = _recent(
+        db.query(Submission).filter(Submission.user_id == settings.ADMIN_USER_ID),
+        days,
+    ).count()
+
+    solved_count = _recent(
+        db.query(Submission).filter(
             Submission.user_id == settings.ADMIN_USER_ID, Submission.status == "solved"
-        )
-        .count()
-    )
+        ),
+        days,
+    ).count()
 
     by_difficulty = {}
     difficulty_stats = (
-        db.query(Challenge.difficulty, func.count(Submission.id))
-        .join(Challenge, Submission.challenge_id == Challenge.id)
-        .filter(
-            Submission.user_id == settings.ADMIN_USER_ID, Submission.status == "solved"
+        _recent(
+            db.query(Challenge.difficulty, func.count(Submission.id))
+            .join(Challenge, Submission.challenge_id == Challenge.id)
+            .filter(
+                Submission.user_id == settings.ADMIN_USER_ID,
+                Submission.status == "solved",
+            ),
+            days,
         )
         .group_by(Challenge.difficulty)
         .all()
@@ -89,12 +107,12 @@ async def get_statistics(db: Session = Depends(get_db)):
         by_difficulty[diff] = count
 
     by_topic = {}
-    topic_submissions = (
+    topic_submissions = _recent(
         db.query(Challenge.topics, Submission.status)
         .join(Submission, Challenge.id == Submission.challenge_id)
-        .filter(Submission.user_id == settings.ADMIN_USER_ID)
-        .all()
-    )
+        .filter(Submission.user_id == settings.ADMIN_USER_ID),
+        days,
+    ).all()
 
     for topics, status in topic_submissions:
         if status == "solved":
@@ -117,12 +135,19 @@ async def get_statistics(db: Session = Depends(get_db)):
 @router.get(
     "/challenges/{challenge_id}/submissions", response_model=List[SubmissionResponse]
 )
-async def get_challenge_submissions(challenge_id: int, db: Session = Depends(get_db)):
+async def get_challenge_submissions(
+    challenge_id: int,
+    days: Optional[int] = Query(None, ge=1),
+    db: Session = Depends(get_db),
+):
+    """All submissions for a challenge, or those of the last `days` days"""
     submissions = (
-        db.query(Submission)
-        .filter(
-            Submission.challenge_id == challenge_id,
-            Submission.user_id == settings.ADMIN_USER_ID,
+        _recent(
+            db.query(Submission).filter(
+                Submission.challenge_id == challenge_id,
+                Submission.user_id == settings.ADMIN_USER_ID,
+            ),
+            days,
         )
         .order_by(desc(Submission.submitted_at))
         .all()
@@ -0,0 +1,78 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import desc
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.models import Challenge, RegradeJob
+from app.schemas import RegradeJobResponse
+from app.services.regrade import ACTIVE_STATUSES, regrade_service
+
+router = APIRouter()
+
+
+def _get_job(db: Session, job_id: int) -> RegradeJob:
+    job = db.query(RegradeJob).filter(RegradeJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Задание не найдено")
+    return job
+
+
+@router.post(
+    "/challenges/{challenge_id}", response_model=RegradeJobResponse, status_code=202
+)
+async def start_regrade(challenge_id: int, db: Session = Depends(get_db)):
+    """Re-grade every stored submission of a challenge in the background"""
+    if not db.query(Challenge.id).filter(Challenge.id == challenge_id).first():
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+
+    active = (
+        db.query(RegradeJob)
+        .filter(
+            RegradeJob.challenge_id == challenge_id,
+            RegradeJob.status.in_(ACTIVE_STATUSES),
+        )
+        .first()
+    )
+    if active:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Перепроверка задачи уже выполняется (задание {active.id})",
+        )
+
+    return regrade_service.create_job(db, challenge_id)
+
+
+@router.get("/jobs", response_model=List[RegradeJobResponse])
+async def list_jobs(
+    challenge_id: Optional[int] = None,
+    limit: int = Query(20, le=100),
+    db: Session = Depends(get_db),
+):
+    query = db.query(RegradeJob)
+    if challenge_id is not None:
+        query = query.filter(RegradeJob.challenge_id == challenge_id)
+    return query.order_by(desc(RegradeJob.id)).limit(limit).all()
+
+
+@router.get("/jobs/{job_id}", response_model=RegradeJobResponse)
+async def get_job(job_id: int, db: Session = Depends(get_db)):
+    return _get_job(db, job_id)
+
+
+@router.post("/jobs/{job_id}/cancel", response_model=RegradeJobResponse)
+async def cancel_job(job_id: int, db: Session = Depends(get_db)):
+    job = _get_job(db, job_id)
+    if job.status not in ACTIVE_STATUSES:
+        raise HTTPException(status_code=409, detail="Задание уже завершено")
+    return regrade_service.cancel_job(db, job)
+
+
+@router.post("/jobs/{job_id}/resume", response_model=RegradeJobResponse)
+async def resume_job(job_id: int, db: Session = Depends(get_db)):
+    """Continue a cancelled or failed job from its last committed chunk"""
+    job = _get_job(db, job_id)
+    if job.status not in ("cancelled", "failed"):
+        raise HTTPException(
+            status_code=409, detail="Возобновить можно только остановленное задание"
+        )
+    return regrade_service.resume_job(db, job)
@@ -0,0 +1,82 @@
+import math
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
+from app.schemas import (
+    GradeJobRequest,
+    GradeJobResponse,
+    ReviewJobRequest,
+    ReviewJobResponse,
+    WorkerHealthResponse,
+)
+from app.services.remote_executor import (
+    TOKEN_HEADER,
+    UnknownChallenge,
+    check_token,
+    grading_worker,
+)
+from app.services.sql_executor import AdmissionRejected, executor
+
+router = APIRouter()
+
+
+def require_token(token: Optional[str] = Header(None, alias=TOKEN_HEADER)):
+    if not check_token(token):
+        raise HTTPException(status_code=403, detail="Неверный токен узла")
+
+
+@router.get("/health", response_model=WorkerHealthResponse)
+async def worker_health():
+    return WorkerHealthResponse(
+        status="healthy",
+        workers=executor.max_workers,
+        estimated_wait=executor.estimated_wait(),
+        challenges=len(grading_worker),
+    )
+
+
+@router.post(
+    "/grade", response_model=GradeJobResponse, dependencies=[Depends(require_token)]
+)
+async def grade(request: GradeJobRequest):
+    """Grade a query sent by an API node on this node's executor"""
+    try:
+        test_results, execution_time, error = await grading_worker.grade(
+            request.model_dump()
+        )
+    except UnknownChallenge:
+        raise HTTPException(status_code=409, detail="Задача неизвестна узлу")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Некорректное задание: {str(e)}")
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка выполнения: {str(e)}")
+    return GradeJobResponse(
+        test_results=test_results, execution_time=execution_time, error=error
+    )
+
+
+@router.post(
+    "/review", response_model=ReviewJobResponse, dependencies=[Depends(require_token)]
+)
+async def review(request: ReviewJobRequest):
+    """Hidden check and benchmark of a query that passed on this node"""
+    try:
+        result = await grading_worker.review(request.model_dump())
+    except UnknownChallenge:
+        raise HTTPException(status_code=409, detail="Задача неизвестна узлу")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Некорректное задание: {str(e)}")
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка выполнения: {str(e)}")
+    return ReviewJobResponse(**result)
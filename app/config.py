@@ -1,3 +1,5 @@
+from typing import List
+
 from pydantic_settings import BaseSettings
 
 
@@ -6,6 +8,81 @@ class Settings(BaseSettings):
     GROQ_API_KEY: str
     GROQ_BASE_URL: str = "https://api.groq.com/openai/v1"
     ADMIN_USER_ID: int = 1
+    # Secret for operator endpoints such as resizing the pool; empty disables them
+    ADMIN_TOKEN: str = ""
+    SUBMISSION_BATCH_SIZE: int = 100
+    SUBMISSION_FLUSH_INTERVAL: float = 0.5
+    SUBMISSION_QUEUE_SIZE: int = 10000
+    SUBMISSION_WRITE_RETRIES: int = 3
+    SUBMISSION_RETRY_BACKOFF: float = 0.5
+    SUBMISSIONS_PARTITIONS_AHEAD: int = 3
+    SUBMISSIONS_RETENTION_MONTHS: int = 12
+    SUBMISSIONS_ARCHIVE_DIR: str = "archive/submissions"
+    # The paginated submission history looks back this far unless asked
+    # otherwise, so it only touches recent partitions
+    HISTORY_DAYS: int = 90
+    # Seconds draft saves are buffered in memory; 0 writes every save through
+    # (use 0 when running more than one worker process)
+    DRAFT_FLUSH_INTERVAL: float = 2.0
+    CHALLENGE_CACHE_SIZE: int = 256
+    # 0 = auto: one single-threaded DuckDB connection per core
+    EXECUTOR_WORKERS: int = 0
+    DUCKDB_THREADS: int = 0
+    DUCKDB_MEMORY_LIMIT: str = "256MB"
+    DUCKDB_WARM_CONNECTIONS: bool = True
+    DUCKDB_CONNECTION_MAX_USES: int = 1000
+    DUCKDB_CONNECTION_MAX_MEMORY: int = 64 * 1024 * 1024
+    EXECUTOR_MAX_QUEUED_TESTS: int = 200
+    EXECUTOR_BATCH_MAX_QUERIES: int = 500
+    EXECUTOR_MAX_WAIT_SECONDS: float = 5.0
+    # 0 disables the per-user limit; every request currently runs as ADMIN_USER_ID
+    EXECUTOR_USER_CONCURRENCY: int = 0
+    # Upper bound for a resized pool, per CPU core
+    EXECUTOR_MAX_WORKERS_PER_CPU: int = 4
+    EXECUTOR_PRECHECK: bool = True
+    SAMPLE_RUN_MAX_ROWS: int = 200
+    EXPLAIN_TIMEOUT: float = 5.0
+    EXPLAIN_CACHE_SIZE: int = 512
+    TEST_STATS_HISTORY: int = 1000
+    # Seconds before failure rates are reloaded, to pick up other processes' regrades
+    TEST_STATS_TTL: float = 300.0
+    GENERATED_TESTS_MAX: int = 100
+    GENERATED_ROWS_MAX: int = 10000
+    # Hidden randomized datasets checked after the fixed tests pass; off by default
+    DIFFERENTIAL_DATASETS: int = 0
+    DIFFERENTIAL_ROWS: int = 30
+    DIFFERENTIAL_BUDGET: float = 0.2
+    # Efficiency grading: timed rounds, warm-up runs and the time after which
+    # rounds beyond the third are skipped
+    EFFICIENCY_RUNS: int = 7
+    EFFICIENCY_WARMUP: int = 1
+    EFFICIENCY_BUDGET: float = 2.0
+    EFFICIENCY_TOLERANCE: float = 0.15
+    # Large Parquet-backed datasets, built once per host from their spec
+    DATASETS_DIR: str = "data/datasets"
+    DATASET_ROWS_MAX: int = 20_000_000
+    DATASET_OUTPUT_MAX_ROWS: int = 1000
+    # Test fixtures shared by all worker processes as read-only DuckDB files;
+    # empty disables the store
+    FIXTURE_STORE_DIR: str = "/dev/shm/sql-challenge-fixtures"
+    FIXTURE_STORE_GRACE: float = 300.0
+    FIXTURE_STORE_MAX_IDLE: float = 86400.0
+    # Remote grading nodes (base URLs); empty grades in this process.
+    # Challenges are spread over nodes by consistent hashing on their id
+    EXECUTOR_NODES: List[str] = []
+    EXECUTOR_NODE_TIMEOUT: float = 30.0
+    EXECUTOR_NODE_RETRIES: int = 2
+    EXECUTOR_HEALTH_INTERVAL: float = 5.0
+    # Shared secret for the worker endpoints; they are not served without one
+    EXECUTOR_WORKER_TOKEN: str = ""
+    SAMPLE_FIXTURE_CACHE_SIZE: int = 128
+    REGRADE_WORKERS: int = 1
+    REGRADE_WORKER_NICE: int = 10
+    REGRADE_CHUNK_SIZE: int = 200
+    REGRADE_MAX_JOBS: int = 1
+    # A running job whose owner has not committed for this long is taken over
+    REGRADE_LEASE_SECONDS: float = 600.0
+    REGRADE_POLL_SECONDS: float = 30.0
 
     class Config:
         env_file = ".env"
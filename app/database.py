@@ -2,9 +2,18 @@ from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
+from app.services import metrics
 
 engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
 
+for _state, _method in (
+    ("size", "size"),
+    ("checked_out", "checkedout"),
+    ("overflow", "overflow"),
+):
+    if hasattr(engine.pool, _method):
+        metrics.DB_POOL_CONNECTIONS.set_function(getattr(engine.pool, _method), _state)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -1,4 +1,14 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, Enum, Float
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    Text,
+    DateTime,
+    JSON,
+    Enum,
+    Float,
+    UniqueConstraint,
+)
 from datetime import datetime
 from app.database import Base
 import enum
@@ -31,6 +41,9 @@ class Challenge(Base):
     solution_query = Column(Text, nullable=False)
     test_cases = Column(JSON, nullable=False)
     hints = Column(JSON, nullable=True)
+    execution_plan = Column(JSON, nullable=True)
+    # Bumped on every change to the tests, so caches in other processes notice
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     created_at = Column(DateTime, default=datetime.utcnow)
     user_id = Column(Integer, default=1)
 
@@ -48,14 +61,36 @@ class Submission(Base):
     execution_time = Column(Float, nullable=True)
     error_message = Column(Text, nullable=True)
     test_results = Column(JSON, nullable=True)
+    stage_timings = Column(JSON, nullable=True)
+    efficiency = Column(JSON, nullable=True)
     submitted_at = Column(DateTime, default=datetime.utcnow)
 
 
 class Draft(Base):
     __tablename__ = "drafts"
+    __table_args__ = (
+        UniqueConstraint("challenge_id", "user_id", name="uq_drafts_challenge_user"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     challenge_id = Column(Integer, nullable=False)
     user_id = Column(Integer, default=1)
     query = Column(Text, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class RegradeJob(Base):
+    __tablename__ = "regrade_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    challenge_id = Column(Integer, nullable=False, index=True)
+    status = Column(String(20), nullable=False, default="queued")
+    total = Column(Integer, default=0)
+    processed = Column(Integer, default=0)
+    changed = Column(Integer, default=0)
+    last_submission_id = Column(Integer, default=0)
+    error_message = Column(Text, nullable=True)
+    # Token of the process currently running the job
+    claim = Column(String(32), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
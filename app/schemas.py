@@ -1,17 +1,34 @@
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
 from datetime import datetime
 
 
 class GenerateChallengeRequest(BaseModel):
     difficulty: str
     topics: List[str]
+    generated_tests: int = 0
+    generated_rows: int = 20
+    seed: Optional[int] = None
+
+
+class GenerateTestsRequest(BaseModel):
+    count: int = 10
+    rows: int = 20
+    seed: Optional[int] = None
+
+
+class DatasetRequest(BaseModel):
+    # One row count for every table, or a count per table name
+    rows: Union[int, Dict[str, int]] = 1_000_000
+    seed: Optional[int] = None
 
 
 class TestCase(BaseModel):
     name: str
     input_data: Dict[str, List[Dict[str, Any]]]
     expected_output: List[Dict[str, Any]]
+    generator: Optional[Dict[str, Any]] = None
+    dataset: Optional[Dict[str, Any]] = None
 
 
 class ChallengeCreateRequest(BaseModel):
@@ -47,6 +64,10 @@ class ChallengeResponse(BaseModel):
 class ExecuteQueryRequest(BaseModel):
     challenge_id: int
     query: str
+    timings: bool = False
+    profile: bool = False
+    fail_fast: bool = False
+    efficiency: bool = False
 
 
 class TestResult(BaseModel):
@@ -55,6 +76,16 @@ class TestResult(BaseModel):
     expected: List[Dict[str, Any]]
     actual: Optional[List[Dict[str, Any]]]
     error: Optional[str]
+    skipped: bool = False
+    timings: Optional[Dict[str, float]] = None
+    profile: Optional[Dict[str, Any]] = None
+
+
+class HiddenCheck(BaseModel):
+    # passed, failed, pending (hidden datasets are still being built) or
+    # skipped (server busy, out of time or no usable datasets)
+    status: str
+    error: Optional[str] = None
 
 
 class ExecuteQueryResponse(BaseModel):
@@ -64,6 +95,106 @@ class ExecuteQueryResponse(BaseModel):
     execution_time: float
     test_results: List[TestResult]
     error_message: Optional[str] = None
+    stage_timings: Optional[Dict[str, Dict[str, float]]] = None
+    efficiency: Optional[Dict[str, Any]] = None
+    # Only for queries that passed every fixed test, when hidden checks are on
+    hidden_check: Optional[HiddenCheck] = None
+
+
+class ExplainRequest(BaseModel):
+    challenge_id: int
+    query: str
+    analyze: bool = True
+
+
+class ExplainResponse(BaseModel):
+    # Operator tree: operator, timing_ms, cardinality, estimated_cardinality,
+    # rows_scanned, details and children; timings only with analyze
+    plan: Optional[Dict[str, Any]] = None
+    analyzed: bool
+    total_ms: Optional[float] = None
+    rows_scanned: Optional[int] = None
+    peak_memory: Optional[int] = None
+    cached: bool = False
+    execution_time: float
+    error_message: Optional[str] = None
+
+
+class RunQueryRequest(BaseModel):
+    challenge_id: int
+    query: str
+    max_rows: Optional[int] = None
+
+
+class RunQueryResponse(BaseModel):
+    columns: List[str]
+    rows: List[Dict[str, Any]]
+    row_count: int
+    truncated: bool
+    execution_time: float
+    error_message: Optional[str] = None
+
+
+class ExecuteBatchRequest(BaseModel):
+    challenge_id: int
+    queries: List[str]
+
+
+class BatchQueryResult(ExecuteQueryResponse):
+    index: int
+    query: str
+
+
+class ExecutorPoolRequest(BaseModel):
+    workers: int = 0
+    duckdb_threads: int = 0
+
+
+class ExecutorPoolResponse(BaseModel):
+    workers: int
+    duckdb_threads: int
+    duckdb_memory_limit: str
+    cpu_count: int
+
+
+class GradeJobRequest(BaseModel):
+    challenge_key: str
+    query: str
+    profile: bool = False
+    user_id: Optional[int] = None
+    fail_fast: bool = False
+    order: Optional[List[int]] = None
+    # Sent only when the node does not have this challenge version yet
+    schema_definition: Optional[Dict[str, Any]] = None
+    test_cases: Optional[List[Dict[str, Any]]] = None
+    solution_query: Optional[str] = None
+
+
+class GradeJobResponse(BaseModel):
+    test_results: List[Dict[str, Any]]
+    execution_time: float
+    error: Optional[str] = None
+
+
+class ReviewJobRequest(BaseModel):
+    challenge_key: str
+    query: str
+    efficiency: bool = False
+    schema_definition: Optional[Dict[str, Any]] = None
+    test_cases: Optional[List[Dict[str, Any]]] = None
+    solution_query: Optional[str] = None
+
+
+class ReviewJobResponse(BaseModel):
+    hidden: Optional[Dict[str, Any]] = None
+    efficiency: Optional[Dict[str, Any]] = None
+
+
+class WorkerHealthResponse(BaseModel):
+    status: str
+    workers: int
+    estimated_wait: float
+    challenges: int
 
 
 class SubmissionResponse(BaseModel):
@@ -73,6 +204,8 @@ class SubmissionResponse(BaseModel):
     passed_tests: int
     total_tests: int
     execution_time: Optional[float]
+    stage_timings: Optional[Dict[str, Dict[str, float]]] = None
+    efficiency: Optional[Dict[str, Any]] = None
     submitted_at: datetime
 
     class Config:
@@ -97,3 +230,19 @@ class HistoryStatsResponse(BaseModel):
     by_difficulty: Dict[str, int]
     by_topic: Dict[str, int]
     success_rate: float
+
+
+class RegradeJobResponse(BaseModel):
+    id: int
+    challenge_id: int
+    status: str
+    total: int
+    processed: int
+    changed: int
+    last_submission_id: int
+    error_message: Optional[str]
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
@@ -4,7 +4,9 @@ import json
 import logging
 from app.services.sql_executor import executor
 import asyncio
+import time
 from typing import Dict, Any, List
+from app.services import metrics
 
 logging.basicConfig(level=logging.ERROR)
 
@@ -17,52 +19,21 @@ CRITICAL: Return ONLY valid JSON with no additional text, no markdown formatting
 IMPORTANT RULES:
 1. ALL table names, column names, and SQL keywords MUST be in ENGLISH - NO Cyrillic/Russian characters in schema or queries
 2. Only descriptive text (title, description, hints, test names) should be in Russian
-3. First design solution_query, then create test cases where expected_output is EXACTLY what solution_query returns for input_data
-4. For EACH test case: mentally execute solution_query on input_data step-by-step and write that exact result as expected_output
-5. Column names in expected_output must EXACTLY match solution_query SELECT clause
-6. NEVER use NULL values in test_cases or sample_data - use 0 for numbers, empty string "" for text instead
-7. Ensure all input_data only contain keys (columns) that exist in the schema_definition.tables.columns
-8. Use appropriate column types: INTEGER for 32-bit, BIGINT for 64-bit, UBIGINT for unsigned 64-bit
-9. Ensure all numeric values fit the column type without overflow
-10. Description must accurately describe EXACTLY what solution_query does
-11. Make tasks interesting and real-world: e-commerce, healthcare, environmental monitoring scenarios
-12. CRITICAL: At least 50% of test cases MUST return non-empty results - avoid overly restrictive WHERE/HAVING conditions
-13. Keep queries practical - avoid complex nested subqueries in HAVING clauses that filter out most data
+3. Do NOT write expected outputs: they are computed by running solution_query on each input_data
+4. solution_query must be valid DuckDB SQL over the tables in schema_definition
+5. NEVER use NULL values in test_cases or sample_data - use 0 for numbers, empty string "" for text instead
+6. Ensure all input_data only contain keys (columns) that exist in the schema_definition.tables.columns
+7. Use appropriate column types: INTEGER for 32-bit, BIGINT for 64-bit, UBIGINT for unsigned 64-bit
+8. Ensure all numeric values fit the column type without overflow
+9. Description must accurately describe EXACTLY what solution_query does
+10. Make tasks interesting and real-world: e-commerce, healthcare, environmental monitoring scenarios
+11. CRITICAL: At least 50% of test cases MUST return non-empty results - avoid overly restrictive WHERE/HAVING conditions
+12. Keep queries practical - avoid complex nested subqueries in HAVING clauses that filter out most data
 
 NAMING CONVENTION EXAMPLES:
 ✓ CORRECT: table name "sales", column "manager_id", "total_amount"
 ✗ WRONG: table name "продажи", column "id_менеджера", "сумма"
 
-CONCRETE EXAMPLES:
-
-Example 1 - CORRECT test case:
-solution_query: "SELECT id, total FROM orders WHERE total > (SELECT AVG(total) FROM orders)"
-input_data: orders = [{"id": 1, "total": 10}, {"id": 2, "total": 20}, {"id": 3, "total": 30}]
-Step 1: AVG(total) = 20
-Step 2: Filter WHERE total > 20
-expected_output: [{"id": 3, "total": 30}] ✓ CORRECT
-
-Example 2 - CORRECT without NULL:
-solution_query: "SELECT u.name, COUNT(o.id) as cnt FROM users u LEFT JOIN orders o ON u.id=o.user_id GROUP BY u.name"
-input_data: users=[{"id":1,"name":"Anna"}], orders=[]
-Step 1: LEFT JOIN produces empty match
-Step 2: COUNT(o.id) = 0
-expected_output: [{"name": "Anna", "cnt": 0}] ✓ CORRECT
-
-Example 3 - CORRECT average comparison:
-solution_query: "SELECT id, val FROM items WHERE val > (SELECT AVG(val) FROM items)"
-input_data: items = [{"id": 1, "val": 10}, {"id": 2, "val": 20}, {"id": 3, "val": 30}]
-Step 1: Calculate AVG(val) = (10+20+30)/3 = 20
-Step 2: Filter WHERE val > 20
-expected_output: [{"id": 3, "val": 30}] ✓ CORRECT (only 30 > 20)
-
-Example 4 - WRONG average comparison:
-solution_query: "SELECT id, val FROM items WHERE val > (SELECT AVG(val) FROM items)"
-input_data: items = [{"id": 1, "val": 10}, {"id": 2, "val": 20}]
-expected_output: [{"id": 2, "val": 20}] ✗ WRONG
-Correct: AVG = 15, so 20 > 15 is true, but also val=10 is NOT > 15
-expected_output: [{"id": 2, "val": 20}] ✓ CORRECT
-
 Follow these rules for hints and test cases:
 - **Test Cases**: Minimum 10 diverse test cases: empty tables, edge cases, typical cases. NO NULL values anywhere.
 - **Hints**:
@@ -90,9 +61,6 @@ Response format:
       {"column1": "value1", "column2": 123}
     ]
   },
-  "expected_output": [
-    {"column1": "value1", "column2": 123}
-  ],
   "solution_query": "SELECT column1, column2 FROM table_name WHERE condition (English SQL)",
   "test_cases": [
     {
@@ -101,10 +69,7 @@ Response format:
         "table_name": [
           {"column1": "value1", "column2": 123}
         ]
-      },
-      "expected_output": [
-        {"column1": "result1", "column2": 456}
-      ]
+      }
     }
   ],
   "hints": ["Подсказка (Russian)"]
@@ -287,25 +252,16 @@ CRITICAL NAMING RULES:
 - NO Russian/Cyrillic in table names, column names, or SQL queries
 - Russian ONLY for: title, description, hints, test case names
 
-MANDATORY WORKFLOW:
+WORKFLOW:
 1. Design solution_query first (using English table/column names)
-2. Create input_data for each test case
-3. CRITICAL: For EACH test case, execute solution_query MANUALLY step-by-step:
-   a. Write down all intermediate calculations (AVG, SUM, COUNT, etc.)
-   b. Apply WHERE/HAVING filters with exact values
-   c. Write ONLY the rows that pass all conditions as expected_output
-   d. Double-check: re-execute mentally to verify
-4. Common mistakes to AVOID:
-   - DO NOT guess expected_output
-   - DO NOT include rows that don't match WHERE/HAVING conditions
-   - DO NOT forget that > means strictly greater (20 is NOT > 20)
-   - DO NOT use different logic in expected_output than in solution_query
-5. NEVER use NULL values - use 0 for numbers, "" for text
-6. Ensure numeric values fit column types
-7. Create 10+ diverse test cases where at least 50% return non-empty results
-8. Use creative English table/column names
-9. Use Russian for title, description, hints, test names
-10. Base task on real-world scenarios
+2. Create input_data for each test case that exercises the query: empty tables, edge cases, typical cases
+3. Do NOT include expected_output anywhere - it is computed from solution_query
+4. NEVER use NULL values - use 0 for numbers, "" for text
+5. Ensure numeric values fit column types
+6. Create 10+ diverse test cases where at least 50% return non-empty results
+7. Use creative English table/column names
+8. Use Russian for title, description, hints, test names
+9. Base task on real-world scenarios
 
 Return ONLY the JSON object with no additional text."""
 
@@ -314,16 +270,29 @@ Return ONLY the JSON object with no additional text."""
 
     for attempt in range(max_retries):
         try:
-            response = await client.chat.completions.create(
-                model="openai/gpt-oss-120b",
-                messages=[
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "user", "content": user_prompt},
-                ],
-                response_format={"type": "json_object"},
-                temperature=0.7 if attempt == 0 else 0.5,
-                max_tokens=6000,
-            )
+            started = time.perf_counter()
+            try:
+                response = await client.chat.completions.create(
+                    model="openai/gpt-oss-120b",
+                    messages=[
+                        {"role": "system", "content": SYSTEM_PROMPT},
+                        {"role": "user", "content": user_prompt},
+                    ],
+                    response_format={"type": "json_object"},
+                    temperature=0.7 if attempt == 0 else 0.5,
+                    max_tokens=6000,
+                )
+            except Exception:
+                metrics.LLM_REQUEST_SECONDS.observe(
+                    time.perf_counter() - started, "error"
+                )
+                raise
+            metrics.LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, "ok")
+            if response.usage:
+                metrics.LLM_TOKENS.inc(response.usage.prompt_tokens or 0, "prompt")
+                metrics.LLM_TOKENS.inc(
+                    response.usage.completion_tokens or 0, "completion"
+                )
 
             content = response.choices[0].message.content.strip()
 
@@ -347,17 +316,18 @@ Return ONLY the JSON object with no additional text."""
                 "description",
                 "schema_definition",
                 "sample_data",
-                "expected_output",
                 "solution_query",
                 "test_cases",
                 "hints",
             ]
             if not all(field in challenge_data for field in required_fields):
                 last_error = "Отсутствуют обязательные поля в ответе"
+                metrics.LLM_RETRIES.inc(1, "missing_fields")
                 continue
 
             if len(challenge_data.get("test_cases", [])) < 10:
                 last_error = f"Недостаточно тест-кейсов: {len(challenge_data.get('test_cases', []))}/10"
+                metrics.LLM_RETRIES.inc(1, "too_few_tests")
                 continue
 
             if difficulty == "easy" and len(challenge_data.get("hints", [])) > 0:
@@ -365,10 +335,12 @@ Return ONLY the JSON object with no additional text."""
 
             if has_null_values(challenge_data.get("test_cases", [])):
                 last_error = "Test cases содержат NULL значения"
+                metrics.LLM_RETRIES.inc(1, "null_values")
                 continue
 
             if has_null_values(challenge_data.get("sample_data", {})):
                 last_error = "Sample data содержит NULL значения"
+                metrics.LLM_RETRIES.inc(1, "null_values")
                 continue
 
             schema_columns = {}
@@ -412,30 +384,30 @@ Return ONLY the JSON object with no additional text."""
                                     ):
                                         raise ValueError(f"Overflow for UBIGINT: {val}")
 
-            schema_def = challenge_data["schema_definition"]
-            failed_tests = []
-            for test in challenge_data["test_cases"]:
-                try:
-                    results, _, err = await executor.execute_and_test(
-                        challenge_data["solution_query"],
-                        schema_def,
-                        [test],
-                    )
-                    if err:
-                        failed_tests.append(f"{test['name']}: execution error - {err}")
-                    elif not results[0]["passed"]:
-                        actual = results[0].get("actual_output", "unknown")
-                        expected = test.get("expected_output", "unknown")
-                        failed_tests.append(
-                            f"{test['name']}: expected {expected}, got {actual}"
-                        )
-                except Exception as ve:
-                    failed_tests.append(f"{test['name']}: {str(ve)}")
-
-            if failed_tests:
-                last_error = f"Tests failed: {'; '.join(failed_tests[:3])}"
+            # Expected outputs come from the solution itself, never from the model
+            test_cases = challenge_data["test_cases"]
+            outputs = await executor.compute_outputs(
+                challenge_data["solution_query"],
+                challenge_data["schema_definition"],
+                [challenge_data["sample_data"]]
+                + [test["input_data"] for test in test_cases],
+            )
+            errors = [
+                f"{name}: {err}"
+                for name, (_, err) in zip(
+                    ["sample_data"] + [test["name"] for test in test_cases], outputs
+                )
+                if err
+            ]
+            if errors:
+                last_error = f"Solution query failed: {'; '.join(errors[:3])}"
+                metrics.LLM_RETRIES.inc(1, "solution_error")
                 continue
 
+            challenge_data["expected_output"] = outputs[0][0]
+            for test, (rows, _) in zip(test_cases, outputs[1:]):
+                test["expected_output"] = rows
+
             for table_name, rows in challenge_data["sample_data"].items():
                 if rows:
                     for row in rows:
@@ -447,26 +419,31 @@ Return ONLY the JSON object with no additional text."""
                                 f"Extra columns in sample_data: {extra_cols}"
                             )
 
+            metrics.LLM_GENERATIONS.inc(1, "success")
             return challenge_data
 
         except json.JSONDecodeError as e:
             last_error = (
                 f"Ошибка парсинга JSON (попытка {attempt + 1}/{max_retries}): {str(e)}"
             )
+            metrics.LLM_RETRIES.inc(1, "invalid_json")
             if attempt < max_retries - 1:
                 await asyncio.sleep(0.5)
                 continue
         except ValueError as ve:
             last_error = f"Validation error: {str(ve)}"
+            metrics.LLM_RETRIES.inc(1, "validation")
             if attempt < max_retries - 1:
                 await asyncio.sleep(0.5)
                 continue
         except Exception as e:
             last_error = f"Ошибка API (попытка {attempt + 1}/{max_retries}): {str(e)}"
+            metrics.LLM_RETRIES.inc(1, "api_error")
             if attempt < max_retries - 1:
                 await asyncio.sleep(0.5)
                 continue
 
+    metrics.LLM_GENERATIONS.inc(1, "failed")
     raise ValueError(
         f"Не удалось сгенерировать задачу после {max_retries} попыток. Последняя ошибка: {last_error}"
     )
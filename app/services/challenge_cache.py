@@ -0,0 +1,120 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Challenge
+from app.schemas import ChallengeResponse
+from app.services import metrics
+from app.services.sql_executor import PLAN_VERSION, executor
+
+
+class CachedChallenge:
+    """Parsed challenge plus artifacts derived from it. Treat as read-only."""
+
+    def __init__(self, challenge: Challenge):
+        self.id: int = challenge.id
+        self.schema_definition: Dict[str, Any] = challenge.schema_definition
+        self.test_cases: List[Dict[str, Any]] = challenge.test_cases
+        self.sample_data: Dict[str, List[Dict[str, Any]]] = challenge.sample_data
+        self.solution_query: str = challenge.solution_query
+        self.version: int = challenge.version
+
+        plan = challenge.execution_plan
+        if not plan or plan.get("version") != PLAN_VERSION:
+            # Challenges approved before plans existed are compiled on load
+            plan = executor.build_plan(challenge.schema_definition, challenge.test_cases)
+        self.plan: Dict[str, Any] = plan
+
+        self.response: Dict[str, Any] = ChallengeResponse.model_validate(
+            challenge
+        ).model_dump(mode="json")
+        body = json.dumps(self.response, sort_keys=True, ensure_ascii=False)
+        self.etag = '"' + hashlib.sha256(body.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+class ChallengeCache:
+    """In-process read-through LRU cache of challenges keyed by id.
+
+    Other processes change challenges too, so a hit is only served after
+    checking the stored version, which is a primary-key lookup of one column.
+    """
+
+    def __init__(self, max_size: int = settings.CHALLENGE_CACHE_SIZE):
+        self.max_size = max_size
+        self._items: "OrderedDict[int, CachedChallenge]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, db: Session, challenge_id: int) -> Optional[CachedChallenge]:
+        with self._lock:
+            cached = self._items.get(challenge_id)
+        if cached is not None:
+            version = (
+                db.query(Challenge.version).filter(Challenge.id == challenge_id).scalar()
+            )
+            if version == cached.version:
+                with self._lock:
+                    if challenge_id in self._items:
+                        self._items.move_to_end(challenge_id)
+                    self.hits += 1
+                metrics.CACHE_REQUESTS.inc(1, "challenge", "hit")
+                return cached
+            self._drop(challenge_id, cached)
+            if version is None:
+                return None
+
+        with self._lock:
+            self.misses += 1
+        metrics.CACHE_REQUESTS.inc(1, "challenge", "miss")
+
+        challenge = db.query(Challenge).filter(Challenge.id == challenge_id).first()
+        if not challenge:
+            return None
+        return self.put(challenge)
+
+    def put(self, challenge: Challenge) -> CachedChallenge:
+        """Cache a challenge just written, so its first read skips the database."""
+        cached = CachedChallenge(challenge)
+        with self._lock:
+            self._items[challenge.id] = cached
+            self._items.move_to_end(challenge.id)
+            evicted = []
+            while len(self._items) > self.max_size:
+                evicted.append(self._items.popitem(last=False)[1])
+        for item in evicted:
+            self._release(item)
+        return cached
+
+    def _release(self, cached: CachedChallenge):
+        if executor.store is not None:
+            executor.store.evict(executor.fixture_keys(cached.plan))
+
+    def _drop(self, challenge_id: int, cached: CachedChallenge):
+        """Remove a stale entry unless another request already replaced it."""
+        with self._lock:
+            if self._items.get(challenge_id) is not cached:
+                return
+            del self._items[challenge_id]
+        self._release(cached)
+
+    def invalidate(self, challenge_id: int):
+        with self._lock:
+            cached = self._items.pop(challenge_id, None)
+        if cached is not None:
+            self._release(cached)
+
+    def clear(self):
+        with self._lock:
+            evicted = list(self._items.values())
+            self._items.clear()
+        for item in evicted:
+            self._release(item)
+
+
+challenge_cache = ChallengeCache()
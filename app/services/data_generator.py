@@ -0,0 +1,413 @@
+"""Seeded synthetic input_data from a challenge's schema_definition.
+
+Rows are produced inside DuckDB from range(n): every value is an expression
+over the hash of the row number mixed with a per-(seed, column) constant, so
+generation is vectorized and the same seed always yields the same data for
+the pinned DuckDB version. Primary keys and UNIQUE columns are derived from
+the row number; foreign keys pick a row of the parent table and reuse the
+parent's key expression for it, so they always point at an existing row.
+"""
+
+import asyncio
+import hashlib
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+import duckdb
+
+from app.services.sql_executor import executor
+
+PROFILES = ("uniform", "skewed", "extremes", "single", "empty")
+
+INTEGER_RANGES = {
+    "TINYINT": (-128, 127),
+    "SMALLINT": (-32768, 32767),
+    "INTEGER": (-(2**31), 2**31 - 1),
+    "INT": (-(2**31), 2**31 - 1),
+    "INT4": (-(2**31), 2**31 - 1),
+    "INT2": (-32768, 32767),
+    "UTINYINT": (0, 255),
+    "USMALLINT": (0, 65535),
+    "UINTEGER": (0, 2**32 - 1),
+    # Wider types stay within 32 bits so values survive JSON round trips
+    "BIGINT": (-(2**31), 2**31 - 1),
+    "UBIGINT": (0, 2**32 - 1),
+    "HUGEINT": (-(2**31), 2**31 - 1),
+    "INT8": (-(2**31), 2**31 - 1),
+}
+
+FLOAT_TYPES = ("REAL", "FLOAT", "DOUBLE", "FLOAT4", "FLOAT8")
+
+FOREIGN_KEY_PATTERN = re.compile(
+    r"FOREIGN\s+KEY\s*\(([^)]+)\)\s*REFERENCES\s+(\w+)\s*(?:\(([^)]+)\))?",
+    re.IGNORECASE,
+)
+REFERENCES_PATTERN = re.compile(r"REFERENCES\s+(\w+)\s*(?:\((\w+)\))?", re.IGNORECASE)
+KEY_LIST_PATTERN = re.compile(r"(PRIMARY\s+KEY|UNIQUE)\s*\(([^)]+)\)", re.IGNORECASE)
+
+
+def _names(column_list: str) -> List[str]:
+    return [name.strip().strip('"') for name in column_list.split(",")]
+
+
+def _column_key(seed: int, table: str, column: str) -> int:
+    """Per-column 63-bit constant mixed into the row number before hashing."""
+    digest = hashlib.sha256(f"{seed}:{table}.{column}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") >> 1
+
+
+def _literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+class TableSpec:
+    def __init__(self, table: dict):
+        self.name: str = table["name"]
+        self.columns: List[Tuple[str, str]] = []
+        self.keys: List[str] = []
+        self.unique: List[str] = []
+        # column -> (parent table, parent column, declared)
+        self.references: Dict[str, Tuple[str, Optional[str], bool]] = {}
+
+        for col in table.get("columns", []):
+            constraints = col.get("constraints") or ""
+            if "type" not in col:
+                self._table_constraint(col.get("name", ""))
+                continue
+            self.columns.append((col["name"], col["type"].upper()))
+            upper = constraints.upper()
+            if "PRIMARY KEY" in upper:
+                self.keys.append(col["name"])
+            elif "UNIQUE" in upper:
+                self.unique.append(col["name"])
+            match = REFERENCES_PATTERN.search(constraints)
+            if match:
+                self.references[col["name"]] = (match.group(1), match.group(2), True)
+
+    def _table_constraint(self, text: str):
+        for match in FOREIGN_KEY_PATTERN.finditer(text):
+            parents = _names(match.group(3)) if match.group(3) else []
+            for i, name in enumerate(_names(match.group(1))):
+                parent_col = parents[i] if i < len(parents) else None
+                self.references[name] = (match.group(2), parent_col, True)
+        for match in KEY_LIST_PATTERN.finditer(text):
+            names = _names(match.group(2))
+            if match.group(1).upper().startswith("PRIMARY"):
+                self.keys.extend(names)
+            elif len(names) == 1:
+                self.unique.append(names[0])
+
+    def type_of(self, column: str) -> str:
+        return next((t for name, t in self.columns if name == column), "INTEGER")
+
+
+def _kind(col_type: str) -> str:
+    if col_type in INTEGER_RANGES or col_type.startswith(("DECIMAL", "NUMERIC")):
+        return "number"
+    if col_type.startswith(("DATE", "TIMESTAMP")):
+        return col_type.split("(")[0]
+    return "text"
+
+
+def parse_schema(schema_definition: dict) -> Dict[str, TableSpec]:
+    tables = {t["name"]: TableSpec(t) for t in schema_definition.get("tables", [])}
+
+    # user_id -> users.id style columns are treated as (undeclared) references
+    for spec in tables.values():
+        for name, _ in spec.columns:
+            if name in spec.references or name in spec.keys or not name.endswith("_id"):
+                continue
+            stem = name[:-3]
+            candidates = [stem, stem + "s", stem + "es"]
+            if stem.endswith("y"):
+                candidates.append(stem[:-1] + "ies")
+            parent = next(
+                (c for c in candidates if c in tables and c != spec.name), None
+            )
+            if parent is None or len(tables[parent].keys) != 1:
+                continue
+            parent_type = tables[parent].type_of(tables[parent].keys[0])
+            if _kind(parent_type) == _kind(spec.type_of(name)):
+                spec.references[name] = (parent, None, False)
+    return tables
+
+
+def _table_order(tables: Dict[str, TableSpec]) -> List[str]:
+    """Parents before children; reference cycles are broken arbitrarily."""
+    order: List[str] = []
+    state: Dict[str, int] = {}
+
+    def visit(name: str):
+        if state.get(name):
+            return
+        state[name] = 1
+        for parent, _, _ in tables[name].references.values():
+            if parent in tables and not state.get(parent):
+                visit(parent)
+        state[name] = 2
+        order.append(name)
+
+    for name in tables:
+        visit(name)
+    return order
+
+
+def _cast(expression: str, col_type: str) -> str:
+    if col_type.startswith(("DATE", "TIMESTAMP", "TIME")):
+        return f"CAST({expression} AS VARCHAR)"
+    if col_type.startswith(("DECIMAL", "NUMERIC")):
+        return f"CAST({expression} AS DOUBLE)"
+    return expression
+
+
+def _key_expression(spec: TableSpec, column: str, index: str) -> str:
+    """Value of a key column for row `index` (0-based) of its table."""
+    col_type = spec.type_of(column)
+    if col_type in INTEGER_RANGES or col_type.startswith(("DECIMAL", "NUMERIC")):
+        return f"({index} + 1)"
+    if col_type == "DATE":
+        return f"(DATE '2000-01-01' + CAST({index} AS INTEGER))"
+    if col_type.startswith("TIMESTAMP"):
+        return f"(TIMESTAMP '2000-01-01' + to_seconds(CAST({index} AS BIGINT)))"
+    return f"({_literal(column + '_')} || ({index} + 1))"
+
+
+def _pick(values: str, h: str, count: int) -> str:
+    return f"[{values}][CAST(1 + {h} % {count} AS BIGINT)]"
+
+
+def _value_expression(
+    col_type: str, column: str, h: str, rows: int, profile: str
+) -> str:
+    domain = 3 if profile == "skewed" else max(rows, 1)
+
+    if col_type in INTEGER_RANGES:
+        low, high = INTEGER_RANGES[col_type]
+        if profile == "extremes":
+            choices = sorted({low, -1 if low < 0 else 0, 0, 1, high})
+            return _pick(", ".join(map(str, choices)), h, len(choices))
+        return f"CAST(1 + {h} % {min(domain * 10, high)} AS {col_type})"
+    if col_type in FLOAT_TYPES or col_type.startswith(("DECIMAL", "NUMERIC")):
+        if profile == "extremes":
+            return f"CAST({_pick('0.0, 0.01, -1.5, 99999.99', h, 4)} AS DOUBLE)"
+        return f"round(({h} % {domain * 1000}) / 100.0, 2)"
+    if col_type == "BOOLEAN":
+        return f"({h} % 2 = 0)"
+    if col_type == "DATE":
+        if profile == "extremes":
+            dates = "DATE '1970-01-01', DATE '2000-02-29', DATE '2099-12-31'"
+            return _pick(dates, h, 3)
+        return f"(DATE '2024-01-01' + CAST({h} % {domain * 30} AS INTEGER))"
+    if col_type.startswith("TIMESTAMP"):
+        return f"(TIMESTAMP '2024-01-01' + to_seconds(CAST({h} % 63072000 AS BIGINT)))"
+    if profile == "extremes":
+        return _pick(f"'', ' ', {_literal(column)}, {_literal(column * 8)}", h, 4)
+    return f"({_literal(column + '_')} || (1 + {h} % {domain}))"
+
+
+def _column_expressions(
+    tables: Dict[str, TableSpec],
+    spec: TableSpec,
+    counts: Dict[str, int],
+    rows: int,
+    seed: int,
+    profile: str,
+) -> Tuple[Dict[str, str], int]:
+    """SQL expression per column over row number `i`, and the row count."""
+    count = rows
+    expressions: Dict[str, str] = {}
+
+    def parent_of(column: str):
+        reference = spec.references.get(column)
+        if reference is None or reference[0] not in counts:
+            return None
+        parent = tables[reference[0]]
+        if not parent.keys:
+            return None
+        parent_col = reference[1] or parent.keys[0]
+        return parent, parent_col, counts[reference[0]], reference[2]
+
+    # Keys: one plain key column numbered by row keeps the key unique. A key
+    # made only of references (junction or 1:1 tables) walks the combinations
+    # of parent rows instead, so there can be no more rows than combinations.
+    plain = [c for c in spec.keys if parent_of(c) is None]
+    if plain:
+        expressions[plain[0]] = _key_expression(spec, plain[0], "i")
+    elif spec.keys:
+        stride = 1
+        for column in spec.keys:
+            parent, parent_col, parent_rows, _ = parent_of(column)
+            index = f"((i // {stride}) % {max(parent_rows, 1)})"
+            expressions[column] = _key_expression(parent, parent_col, index)
+            stride *= parent_rows
+        count = min(count, stride)
+
+    for column in spec.unique:
+        if column in expressions:
+            continue
+        found = parent_of(column)
+        if found is None:
+            expressions[column] = _key_expression(spec, column, "i")
+        else:
+            parent, parent_col, parent_rows, _ = found
+            expressions[column] = _key_expression(parent, parent_col, "i")
+            count = min(count, parent_rows)
+
+    for column, col_type in spec.columns:
+        if column in expressions:
+            continue
+        h = f"hash(xor(i, {_column_key(seed, spec.name, column)}))"
+        found = parent_of(column)
+        if found is None:
+            expressions[column] = _value_expression(col_type, column, h, rows, profile)
+            continue
+
+        parent, parent_col, parent_rows, declared = found
+        if parent_rows == 0:
+            if declared:
+                # Declared references cannot point at nothing
+                count = 0
+            expressions[column] = f"(1 + {h} % {max(rows, 1)})"
+            continue
+        expressions[column] = _key_expression(
+            parent, parent_col, f"({h} % {parent_rows})"
+        )
+
+    return expressions, count
+
+
+def table_selects(
+    schema_definition: dict,
+    rows: Union[int, Dict[str, int]],
+    seed: int,
+    profile: str = "uniform",
+    typed: bool = False,
+) -> List[Tuple[str, str, int]]:
+    """(table, SELECT producing its rows over `i`, row count), parents first.
+
+    `rows` is one count for every table or a count per table name; tables
+    missing from the mapping get no rows. With `typed` every column has its
+    declared type (for Parquet files); otherwise dates and decimals come out
+    as JSON-friendly strings and doubles.
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown profile: {profile}")
+
+    tables = parse_schema(schema_definition)
+    counts: Dict[str, int] = {}
+    selects = []
+    for name in _table_order(tables):
+        table_rows = rows.get(name, 0) if isinstance(rows, dict) else rows
+        if profile == "empty":
+            table_rows = 0
+        elif profile == "single":
+            table_rows = min(table_rows, 1)
+
+        spec = tables[name]
+        expressions, count = _column_expressions(
+            tables, spec, counts, table_rows, seed, profile
+        )
+        counts[name] = count
+        if not spec.columns:
+            continue
+        select = ", ".join(
+            (
+                f"CAST({expressions[column]} AS {col_type})"
+                if typed
+                else _cast(expressions[column], col_type)
+            )
+            + f' AS "{column}"'
+            for column, col_type in spec.columns
+        )
+        selects.append((name, f"SELECT {select} FROM range({count}) t(i)", count))
+    return selects
+
+
+def generate_input_data(
+    schema_definition: dict, rows: int, seed: int, profile: str = "uniform"
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Deterministic rows for every table; `profile` picks the value distribution."""
+    data: Dict[str, List[Dict[str, Any]]] = {}
+    conn = duckdb.connect(":memory:", config={"threads": 1})
+    try:
+        for name, select, count in table_selects(
+            schema_definition, rows, seed, profile
+        ):
+            if count == 0:
+                data[name] = []
+                continue
+            result = conn.execute(f"{select} ORDER BY i")
+            columns = [desc[0] for desc in result.description]
+            data[name] = [dict(zip(columns, row)) for row in result.fetchall()]
+    finally:
+        conn.close()
+
+    return {
+        table["name"]: data.get(table["name"], [])
+        for table in schema_definition.get("tables", [])
+    }
+
+
+async def generate_test_cases(
+    schema_definition: dict,
+    solution_query: str,
+    count: int,
+    rows: int,
+    seed: int,
+    taken_names: Iterable[str] = (),
+) -> List[Dict[str, Any]]:
+    """`count` tests cycling through PROFILES, with expected outputs computed
+    from the solution. Datasets where its result changes when the input rows
+    are reversed (ties under LIMIT and the like) are dropped, since other
+    correct queries could legitimately return different rows there.
+
+    Raises ValueError if the solution fails on a dataset or no dataset is
+    left. Names are made unique against `taken_names`.
+    """
+    specs = [
+        {"seed": seed + i, "rows": rows, "profile": PROFILES[i % len(PROFILES)]}
+        for i in range(count)
+    ]
+    datasets = await asyncio.to_thread(
+        lambda: [
+            generate_input_data(
+                schema_definition, spec["rows"], spec["seed"], spec["profile"]
+            )
+            for spec in specs
+        ]
+    )
+    reversed_datasets = [
+        {table: rows[::-1] for table, rows in input_data.items()}
+        for input_data in datasets
+    ]
+    outputs, reruns = await asyncio.gather(
+        executor.compute_outputs(solution_query, schema_definition, datasets),
+        executor.compute_outputs(solution_query, schema_definition, reversed_datasets),
+    )
+
+    taken = set(taken_names)
+    test_cases = []
+    for spec, input_data, (expected, error), (rerun, rerun_error) in zip(
+        specs, datasets, outputs, reruns
+    ):
+        if error or rerun_error:
+            raise ValueError(f"решение не выполняется: {error or rerun_error}")
+        if not executor._compare_results(expected, rerun):
+            continue
+        name = base = f"Сгенерированный тест {spec['profile']} #{spec['seed']}"
+        copy = 1
+        while name in taken:
+            copy += 1
+            name = f"{base} ({copy})"
+        taken.add(name)
+        test_cases.append(
+            {
+                "name": name,
+                "input_data": input_data,
+                "expected_output": expected,
+                "generator": spec,
+            }
+        )
+    if count and not test_cases:
+        raise ValueError("результат решения зависит от порядка строк")
+    return test_cases
@@ -0,0 +1,122 @@
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from app.config import settings
+from app.services import metrics
+from app.services.data_generator import generate_test_cases
+from app.services.sql_executor import executor
+
+HIDDEN_MISMATCH = "Запрос возвращает неверный результат на скрытых данных"
+HIDDEN_ERROR = "Запрос завершается с ошибкой на скрытых данных"
+
+
+class DifferentialTester:
+    """Checks queries that pass the fixed tests against randomized hidden data.
+
+    Each challenge version gets `datasets` generated datasets, seeded from the
+    challenge, with the solution's outputs computed once and kept alongside a
+    compiled plan, built in the background on first use. A submission then
+    runs on all of them in one worker job and one connection, within
+    `budget` seconds; datasets it does not reach in time are simply not
+    checked. Neither the data nor the outputs are ever returned.
+    """
+
+    def __init__(
+        self,
+        datasets: int = settings.DIFFERENTIAL_DATASETS,
+        rows: int = settings.DIFFERENTIAL_ROWS,
+        budget: float = settings.DIFFERENTIAL_BUDGET,
+        max_challenges: int = settings.CHALLENGE_CACHE_SIZE,
+    ):
+        self.datasets = datasets
+        self.rows = rows
+        self.budget = budget
+        self.max_challenges = max_challenges
+        self._items: "OrderedDict[str, asyncio.Future]" = OrderedDict()
+
+    async def _build(self, challenge) -> Optional[Dict[str, Any]]:
+        digest = hashlib.sha256(
+            f"{challenge.id}:{challenge.solution_query}".encode("utf-8")
+        ).hexdigest()
+        try:
+            test_cases = await generate_test_cases(
+                challenge.schema_definition,
+                challenge.solution_query,
+                self.datasets,
+                self.rows,
+                int(digest[:8], 16),
+            )
+            if not test_cases:
+                return None
+            plan = await asyncio.to_thread(
+                executor.build_plan, challenge.schema_definition, test_cases
+            )
+        except Exception as e:
+            # Generation is seeded, so this version would fail the same way again
+            logging.error(f"Hidden datasets for challenge {challenge.id} failed: {str(e)}")
+            return None
+        return {
+            "plan": plan,
+            "expected": [test_case["expected_output"] for test_case in test_cases],
+        }
+
+    def _get(self, challenge) -> asyncio.Future:
+        """Build of the challenge's hidden datasets, started on first use."""
+        key = f"{challenge.id}:{challenge.etag}"
+        future = self._items.get(key)
+        if future is None:
+            metrics.CACHE_REQUESTS.inc(1, "differential", "miss")
+            future = self._items[key] = asyncio.ensure_future(self._build(challenge))
+            while len(self._items) > self.max_challenges:
+                self._items.popitem(last=False)
+            return future
+        self._items.move_to_end(key)
+        metrics.CACHE_REQUESTS.inc(1, "differential", "hit")
+        return future
+
+    async def check(self, challenge, query: str) -> Optional[Dict[str, Any]]:
+        """Hidden check of a query that passed every fixed test.
+
+        Returns {"status", "error"} with status passed, failed, pending
+        (datasets still being built) or skipped (no usable datasets, the
+        queue is too long to fit the budget, or nothing ran in time); None
+        when hidden checks are off. Only "failed" rejects the query.
+        """
+        if self.datasets <= 0 or not challenge.solution_query:
+            return None
+
+        future = self._get(challenge)
+        if not future.done():
+            metrics.DIFFERENTIAL_CHECKS.inc(1, "pending")
+            return {"status": "pending", "error": None}
+        hidden = future.result()
+        if hidden is None:
+            metrics.DIFFERENTIAL_CHECKS.inc(1, "unavailable")
+            return {"status": "skipped", "error": None}
+        if executor.estimated_wait() > self.budget:
+            metrics.DIFFERENTIAL_CHECKS.inc(1, "busy")
+            return {"status": "skipped", "error": None}
+
+        checked, mismatch, error = await executor.execute_hidden(
+            query, hidden["plan"], hidden["expected"], self.budget
+        )
+        if not mismatch and not checked:
+            metrics.DIFFERENTIAL_CHECKS.inc(1, "timeout")
+            return {"status": "skipped", "error": None}
+        metrics.DIFFERENTIAL_CHECKS.inc(1, "failed" if mismatch else "passed")
+
+        if mismatch:
+            return {
+                "status": "failed",
+                "error": HIDDEN_ERROR if error else HIDDEN_MISMATCH,
+            }
+        return {"status": "passed", "error": None}
+
+    def clear(self):
+        self._items.clear()
+
+
+differential_tester = DifferentialTester()
@@ -0,0 +1,189 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import Draft
+
+DraftKey = Tuple[int, int]
+
+
+def _upsert_statement(db: Session):
+    dialect_insert = (
+        sqlite.insert if db.get_bind().dialect.name == "sqlite" else postgresql.insert
+    )
+    stmt = dialect_insert(Draft)
+    return stmt.on_conflict_do_update(
+        index_elements=[Draft.challenge_id, Draft.user_id],
+        set_={"query": stmt.excluded.query, "updated_at": stmt.excluded.updated_at},
+    )
+
+
+def upsert_draft(
+    db: Session, challenge_id: int, user_id: int, query: str
+) -> Dict[str, Any]:
+    """Insert or update a draft with a single INSERT ... ON CONFLICT ... RETURNING.
+
+    Returns plain columns rather than an ORM object, which the commit would
+    expire and reload with another SELECT.
+    """
+    stmt = _upsert_statement(db).returning(Draft.id, Draft.challenge_id, Draft.query)
+    draft = db.execute(
+        stmt,
+        {
+            "challenge_id": challenge_id,
+            "user_id": user_id,
+            "query": query,
+            "updated_at": datetime.utcnow(),
+        },
+    ).one()
+    db.commit()
+    return dict(draft._mapping)
+
+
+def update_drafts(db: Session, rows: List[Dict[str, Any]]) -> Set[int]:
+    """Update existing drafts by id and return the ids that still exist.
+
+    Never inserts, so a draft deleted after its text was queued stays deleted.
+    """
+    table = Draft.__table__
+    db.execute(
+        update(table)
+        .where(table.c.id == bindparam("draft_id"))
+        .values(query=bindparam("new_query"), updated_at=bindparam("new_updated_at")),
+        rows,
+    )
+    ids = [row["draft_id"] for row in rows]
+    existing = {draft_id for (draft_id,) in db.query(Draft.id).filter(Draft.id.in_(ids))}
+    db.commit()
+    return existing
+
+
+class DraftCoalescer:
+    """Keeps only the latest draft per (challenge_id, user_id) and flushes in batches.
+
+    The first save for a key goes straight to the database so the caller gets
+    a real draft id; later saves inside the flush window only replace the
+    pending text in memory. The buffer is per process: with several worker
+    processes set DRAFT_FLUSH_INTERVAL to 0, which writes every save through.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = settings.DRAFT_FLUSH_INTERVAL,
+        max_known_ids: int = 10000,
+    ):
+        self.flush_interval = flush_interval
+        self.max_known_ids = max_known_ids
+        # key -> (draft id, latest text)
+        self._pending: Dict[DraftKey, Tuple[int, str]] = {}
+        self._ids: "OrderedDict[DraftKey, int]" = OrderedDict()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None and self.flush_interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.flush()
+
+    def _remember(self, key: DraftKey, draft_id: int):
+        self._ids[key] = draft_id
+        self._ids.move_to_end(key)
+        while len(self._ids) > self.max_known_ids:
+            self._ids.popitem(last=False)
+
+    async def save(self, challenge_id: int, user_id: int, query: str) -> Dict[str, Any]:
+        key = (challenge_id, user_id)
+        draft_id = self._ids.get(key)
+
+        if draft_id is not None and self._task is not None:
+            self._pending[key] = (draft_id, query)
+            self._ids.move_to_end(key)
+            return {"id": draft_id, "challenge_id": challenge_id, "query": query}
+
+        self._pending.pop(key, None)
+        draft = await asyncio.to_thread(self._write_one, challenge_id, user_id, query)
+        self._remember(key, draft["id"])
+        return draft
+
+    def get_pending(self, challenge_id: int, user_id: int) -> Optional[Dict[str, Any]]:
+        pending = self._pending.get((challenge_id, user_id))
+        if pending is None:
+            return None
+        return {"id": pending[0], "challenge_id": challenge_id, "query": pending[1]}
+
+    async def discard(self, challenge_id: int, user_id: int):
+        """Drop any pending write for a key, waiting out a flush in progress."""
+        key = (challenge_id, user_id)
+        async with self._lock:
+            self._pending.pop(key, None)
+            self._ids.pop(key, None)
+
+    def _write_one(self, challenge_id: int, user_id: int, query: str) -> Dict[str, Any]:
+        db = SessionLocal()
+        try:
+            return upsert_draft(db, challenge_id, user_id, query)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _write_batch(self, rows: List[Dict[str, Any]]) -> Set[int]:
+        db = SessionLocal()
+        try:
+            return update_drafts(db, rows)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def flush(self):
+        async with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            now = datetime.utcnow()
+            rows = [
+                {"draft_id": draft_id, "new_query": query, "new_updated_at": now}
+                for draft_id, query in pending.values()
+            ]
+            try:
+                existing = await asyncio.to_thread(self._write_batch, rows)
+            except Exception as e:
+                logging.error(f"Failed to flush {len(rows)} drafts: {str(e)}")
+                for key, entry in pending.items():
+                    self._pending.setdefault(key, entry)
+                return
+            # Deleted elsewhere (e.g. by another worker); the next save recreates it
+            for key, (draft_id, _) in pending.items():
+                if draft_id not in existing and self._ids.get(key) == draft_id:
+                    self._ids.pop(key)
+                    # Text queued meanwhile targets the same deleted row
+                    self._pending.pop(key, None)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+
+draft_coalescer = DraftCoalescer()
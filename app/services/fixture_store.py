@@ -0,0 +1,169 @@
+import fcntl
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+import duckdb
+
+LOCK_FILE = ".lock"
+SUFFIX = ".duckdb"
+
+
+class FixtureStore:
+    """Test fixtures written once as DuckDB files shared by every process.
+
+    Files live in a shared-memory or tmpfs directory, named by a hash of the
+    fixture's DDL and data, so all uvicorn workers (and the regrade pool)
+    reuse one copy instead of each rebuilding and caching its own. Tests
+    attach them READ_ONLY, so a query can never change what others see.
+
+    A missing file is built by the first test that needs it while other
+    callers wait, so no test ever sees a writable fixture; builders and
+    cleanup serialize on an flock, and files are written under a temporary
+    name and renamed into place.
+    Files of evicted challenges are removed once nothing has used them for
+    `grace` seconds; `sweep` drops anything idle longer than `max_idle`.
+    """
+
+    def __init__(self, root: str, grace: float, max_idle: float):
+        self.root = root
+        self.grace = grace
+        self.max_idle = max_idle
+        # key -> when this process last refreshed the file's mtime
+        self._ready: Dict[str, float] = {}
+        self._building: Dict[str, threading.Event] = {}
+        # Keys this process could not store; their tests build in memory
+        self._failed: Set[str] = set()
+        self._last_sweep = 0.0
+        self._lock = threading.Lock()
+        self._builder = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="fixture-store"
+        )
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key + SUFFIX)
+
+    def lookup(
+        self, key: str, build: Callable[[duckdb.DuckDBPyConnection], None]
+    ) -> Optional[str]:
+        """Path of the stored fixture, building it first on a miss.
+
+        Concurrent callers wait for one build. None only if the file could
+        not be written, in which case the caller builds the fixture in memory.
+        """
+        path = self.path(key)
+        now = time.monotonic()
+        with self._lock:
+            if key in self._failed:
+                return None
+            touched = self._ready.get(key)
+        try:
+            if touched is None or now - touched > self.grace / 4:
+                # Keep the mtime fresh so other processes see it is in use
+                os.utime(path)
+                with self._lock:
+                    self._ready[key] = now
+            return path
+        except OSError:
+            pass
+
+        with self._lock:
+            self._ready.pop(key, None)
+            done = self._building.get(key)
+            owner = done is None
+            if owner:
+                done = self._building[key] = threading.Event()
+        if owner:
+            try:
+                self._build(key, build)
+            finally:
+                with self._lock:
+                    self._building.pop(key, None)
+                done.set()
+        else:
+            done.wait()
+
+        with self._lock:
+            if key in self._failed:
+                return None
+            self._ready[key] = time.monotonic()
+        return path
+
+    def _locked(self):
+        os.makedirs(self.root, exist_ok=True)
+        lock_file = open(os.path.join(self.root, LOCK_FILE), "a")
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def _build(self, key: str, build: Callable[[duckdb.DuckDBPyConnection], None]):
+        path = self.path(key)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        try:
+            with self._locked():
+                # Another process may have stored it while this one waited
+                if not os.path.exists(path):
+                    conn = duckdb.connect(temporary, config={"threads": 1})
+                    try:
+                        build(conn)
+                        conn.execute("CHECKPOINT")
+                    finally:
+                        conn.close()
+                    os.replace(temporary, path)
+        except Exception as e:
+            # Not retried by this process
+            logging.error(f"Fixture {key} could not be stored: {str(e)}")
+            with self._lock:
+                self._failed.add(key)
+        finally:
+            for leftover in (temporary, temporary + ".wal"):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+
+    def _remove_idle(self, keys: Iterable[str], idle: float):
+        cutoff = time.time() - idle
+        with self._locked():
+            for key in keys:
+                path = self.path(key)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                except OSError:
+                    pass
+
+    def evict(self, keys: Iterable[str]):
+        """Remove fixtures of a challenge dropped from the cache, unless some
+        process used them within the grace period. Runs in the background."""
+        keys = [key for key in keys if key]
+        with self._lock:
+            for key in keys:
+                self._ready.pop(key, None)
+        if keys:
+            self._builder.submit(self._evict, keys)
+
+    def _evict(self, keys: List[str]):
+        if not os.path.isdir(self.root):
+            return
+        try:
+            self._remove_idle(keys, self.grace)
+            if time.monotonic() - self._last_sweep > self.grace:
+                self.sweep()
+        except OSError as e:
+            logging.error(f"Fixture store cleanup failed: {str(e)}")
+
+    def sweep(self):
+        """Remove every fixture idle for longer than max_idle."""
+        self._last_sweep = time.monotonic()
+        if not os.path.isdir(self.root):
+            return
+        keys = [
+            name[: -len(SUFFIX)]
+            for name in os.listdir(self.root)
+            if name.endswith(SUFFIX)
+        ]
+        try:
+            self._remove_idle(keys, self.max_idle)
+        except OSError as e:
+            logging.error(f"Fixture store cleanup failed: {str(e)}")
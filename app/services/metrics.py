@@ -0,0 +1,306 @@
+"""Minimal Prometheus-compatible metrics (text exposition format 0.0.4).
+
+Metrics are per process; with several uvicorn workers each one serves its
+own /metrics. Recording is a dict lookup and an add under a lock.
+"""
+
+import bisect
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labelvalues: Sequence[str]) -> LabelValues:
+        if len(labelvalues) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(str(value) for value in labelvalues)
+
+    def header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, *labelvalues: str):
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def labels(self, *labelvalues: str) -> "_Bound":
+        return _Bound(self, labelvalues)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._functions: Dict[LabelValues, Callable[[], float]] = {}
+
+    def set(self, value: float, *labelvalues: str):
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, *labelvalues: str):
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, *labelvalues: str):
+        self.inc(-amount, *labelvalues)
+
+    def set_function(self, function: Callable[[], float], *labelvalues: str):
+        """Evaluate `function` at scrape time instead of storing a value."""
+        key = self._key(labelvalues)
+        with self._lock:
+            self._functions[key] = function
+
+    def labels(self, *labelvalues: str) -> "_Bound":
+        return _Bound(self, labelvalues)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = dict(self._values)
+            functions = list(self._functions.items())
+        for key, function in functions:
+            try:
+                items[key] = function()
+            except Exception:
+                continue
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items.items()
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, *labelvalues: str):
+        key = self._key(labelvalues)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # per-bucket counts, then +Inf count, then sum
+                state = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            state[index] += 1
+            state[-1] += value
+
+    def labels(self, *labelvalues: str) -> "_Bound":
+        return _Bound(self, labelvalues)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+
+        lines = []
+        for key, state in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), state[:-1]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} "
+                    f"{_format_value(cumulative)}"
+                )
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_count{labels} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{labels} {_format_value(state[-1])}")
+        return lines
+
+
+class _Bound:
+    def __init__(self, metric: _Metric, labelvalues: Sequence[str]):
+        self._metric = metric
+        self._labelvalues = tuple(labelvalues)
+
+    def inc(self, amount: float = 1.0):
+        self._metric.inc(amount, *self._labelvalues)
+
+    def dec(self, amount: float = 1.0):
+        self._metric.dec(amount, *self._labelvalues)
+
+    def set(self, value: float):
+        self._metric.set(value, *self._labelvalues)
+
+    def set_function(self, function: Callable[[], float]):
+        self._metric.set_function(function, *self._labelvalues)
+
+    def observe(self, value: float):
+        self._metric.observe(value, *self._labelvalues)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric):
+        self._metrics.append(metric)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return next((m for m in self._metrics if m.name == name), None)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+)
+
+EXECUTOR_QUEUE_DEPTH = Gauge(
+    "executor_queue_depth", "Test jobs waiting for an executor worker"
+)
+EXECUTOR_ACTIVE_WORKERS = Gauge(
+    "executor_active_workers", "Executor workers currently running a test"
+)
+EXECUTOR_STAGE_SECONDS = Histogram(
+    "executor_stage_duration_seconds",
+    "Per-test executor stage duration (queue_wait, setup, load, query, fetch, compare)",
+    ["stage"],
+)
+
+EXECUTOR_POOL_WORKERS = Gauge("executor_pool_workers", "Executor worker pool size")
+DUCKDB_THREADS = Gauge(
+    "duckdb_threads_per_connection", "DuckDB threads configured per test connection"
+)
+DUCKDB_CONNECTIONS_CREATED = Counter(
+    "duckdb_connections_created_total", "Warm DuckDB connections opened"
+)
+DUCKDB_CONNECTIONS_RECYCLED = Counter(
+    "duckdb_connections_recycled_total",
+    "Warm DuckDB connections closed and replaced",
+    ["reason"],
+)
+EXECUTOR_ESTIMATED_WAIT = Gauge(
+    "executor_estimated_wait_seconds", "Estimated queue wait for a new test job"
+)
+EXECUTOR_REJECTIONS = Counter(
+    "executor_rejections_total", "Submissions rejected by admission control", ["reason"]
+)
+EXECUTOR_SKIPPED_TESTS = Counter(
+    "executor_skipped_tests_total", "Test runs skipped by fail-fast grading"
+)
+EXECUTOR_PRECHECK_REJECTIONS = Counter(
+    "executor_precheck_rejections_total",
+    "Queries failed by static analysis before building fixtures",
+    ["reason"],
+)
+EXECUTOR_EFFICIENCY_VERDICTS = Counter(
+    "executor_efficiency_verdicts_total",
+    "Efficiency comparisons against the reference solution by verdict",
+    ["verdict"],
+)
+DIFFERENTIAL_CHECKS = Counter(
+    "executor_differential_checks_total",
+    "Hidden randomized checks of queries that passed the fixed tests",
+    ["result"],
+)
+EXECUTOR_NODE_REQUESTS = Counter(
+    "executor_node_requests_total",
+    "Grading jobs sent to remote executor nodes by node and outcome",
+    ["node", "outcome"],
+)
+EXECUTOR_NODE_HEALTHY = Gauge(
+    "executor_node_healthy", "Whether a remote executor node passes health checks", ["node"]
+)
+
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Cache lookups by cache and result", ["cache", "result"]
+)
+
+LLM_REQUEST_SECONDS = Histogram(
+    "llm_request_duration_seconds",
+    "Latency of chat completion calls",
+    ["outcome"],
+    buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0),
+)
+LLM_RETRIES = Counter(
+    "llm_generation_retries_total", "Challenge generation retries by reason", ["reason"]
+)
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens used by the LLM", ["type"])
+LLM_GENERATIONS = Counter(
+    "llm_generations_total", "Challenge generations by result", ["result"]
+)
+
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections", "SQLAlchemy pool connections by state", ["state"]
+)
+
+SUBMISSION_QUEUE_DEPTH = Gauge(
+    "submission_writer_queue_depth", "Submissions waiting for the write-behind flush"
+)
+SUBMISSION_DROPPED = Counter(
+    "submission_writer_dropped_total",
+    "Submission rows the write-behind queue gave up on",
+    ["reason"],
+)
+
+REGRADE_ACTIVE_JOBS = Gauge("regrade_active_jobs", "Regrade jobs running or waiting for a slot")
+REGRADE_SUBMISSIONS = Counter(
+    "regrade_submissions_total", "Stored submissions re-graded by regrade jobs"
+)
@@ -0,0 +1,151 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional, Union
+
+import duckdb
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import Challenge
+from app.services.data_generator import table_selects
+from app.services.sql_executor import dataset_dir, executor
+
+# Bump when generated data changes, so old files are not reused
+DATASET_VERSION = 2
+
+
+class ParquetDatasets:
+    """Large challenge datasets stored as Parquet files on local disk.
+
+    A dataset is fully described by a small spec (rows per table and a seed)
+    kept in its test case; the files live in a directory named by the hash
+    of the spec and the schema, so any host can rebuild them and each is
+    built at most once. Builders write into a private temporary directory
+    and rename it into place, so nobody ever reads a partial dataset.
+    Tests see the tables as views over read_parquet: DuckDB scans row groups
+    from disk (and the page cache) instead of copying the data into every
+    connection.
+    """
+
+    def __init__(self):
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._restore: Optional[asyncio.Task] = None
+
+    def spec(
+        self,
+        schema_definition: dict,
+        rows: Union[int, Dict[str, int]],
+        seed: int,
+    ) -> Dict[str, Any]:
+        body = json.dumps(
+            {
+                "version": DATASET_VERSION,
+                "schema": schema_definition,
+                "rows": rows,
+                "seed": seed,
+            },
+            sort_keys=True,
+        )
+        key = hashlib.sha256(body.encode("utf-8")).hexdigest()[:16]
+        return {"key": key, "rows": rows, "seed": seed}
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _connect(self) -> duckdb.DuckDBPyConnection:
+        return duckdb.connect(":memory:", config={"threads": os.cpu_count() or 1})
+
+    def ensure(self, schema_definition: dict, spec: Dict[str, Any]) -> str:
+        """Directory with one Parquet file per table, built if missing."""
+        directory = dataset_dir(spec["key"])
+        if os.path.isdir(directory):
+            return directory
+
+        with self._key_lock(spec["key"]):
+            if os.path.isdir(directory):
+                return directory
+            root = os.path.dirname(directory)
+            os.makedirs(root, exist_ok=True)
+            staging = tempfile.mkdtemp(prefix=f".{spec['key']}-", dir=root)
+            try:
+                conn = self._connect()
+                try:
+                    for name, select, _ in table_selects(
+                        schema_definition, spec["rows"], spec["seed"], typed=True
+                    ):
+                        path = os.path.join(staging, f"{name}.parquet")
+                        conn.execute(
+                            f"COPY ({select}) TO '{path}' "
+                            "(FORMAT PARQUET, COMPRESSION ZSTD)"
+                        )
+                finally:
+                    conn.close()
+                try:
+                    os.rename(staging, directory)
+                except OSError:
+                    # Another process finished the same dataset first
+                    if not os.path.isdir(directory):
+                        raise
+                logging.info(f"Built dataset {spec['key']}")
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+        return directory
+
+    async def compute_output(
+        self,
+        query: str,
+        schema_definition: dict,
+        spec: Dict[str, Any],
+        max_rows: int = settings.DATASET_OUTPUT_MAX_ROWS,
+    ) -> List[Dict[str, Any]]:
+        """Normalized result of a reference query; raises ValueError if it
+        fails or returns more than `max_rows` rows."""
+        await asyncio.to_thread(self.ensure, schema_definition, spec)
+        rows, error = await executor.compute_dataset_output(
+            query, schema_definition, spec["key"], max_rows
+        )
+        if error:
+            raise ValueError(error)
+        return rows
+
+    def _restore_all(self):
+        db = SessionLocal()
+        try:
+            challenges = db.query(
+                Challenge.id, Challenge.schema_definition, Challenge.test_cases
+            ).all()
+        finally:
+            db.close()
+
+        for challenge_id, schema_definition, test_cases in challenges:
+            for test_case in test_cases or []:
+                spec = test_case.get("dataset")
+                if not spec:
+                    continue
+                try:
+                    self.ensure(schema_definition, spec)
+                except Exception as e:
+                    logging.error(
+                        f"Dataset {spec.get('key')} of challenge {challenge_id} "
+                        f"could not be built: {str(e)}"
+                    )
+
+    async def start(self):
+        """Rebuild, in the background, datasets this host does not have yet."""
+        if self._restore is None:
+            self._restore = asyncio.create_task(asyncio.to_thread(self._restore_all))
+
+    async def stop(self):
+        # A build already running in its thread finishes on its own
+        self._restore = None
+
+
+parquet_datasets = ParquetDatasets()
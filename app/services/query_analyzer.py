@@ -0,0 +1,206 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Iterator, List, Optional, Tuple
+
+import duckdb
+
+from app.services import metrics
+
+# Table functions that read files or remote data
+FILE_FUNCTION_PREFIXES = ("read_", "parquet_", "iceberg_", "delta_")
+FILE_FUNCTIONS = {"glob", "sniff_csv", "csv_scan", "parquet_scan", "json_scan"}
+
+DISALLOWED_STATEMENT = "Разрешены только запросы SELECT"
+DISALLOWED_FILES = "Чтение файлов запрещено"
+MULTIPLE_STATEMENTS = "Разрешён только один запрос"
+PRECHECK_FAILED = "Не удалось проверить запрос"
+
+EXPLAIN_PREFIX = "EXPLAIN "
+# Error context of a query bound as "EXPLAIN <query>": first line and caret
+EXPLAIN_CONTEXT_PATTERN = re.compile(
+    r"(LINE 1: )EXPLAIN (.*\n *)" + " " * len(EXPLAIN_PREFIX) + r"\^"
+)
+
+
+def _walk(node: Any) -> Iterator[dict]:
+    if isinstance(node, dict):
+        yield node
+        for value in node.values():
+            yield from _walk(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _walk(value)
+
+
+def _reads_files(statements: List[dict]) -> bool:
+    for node in _walk(statements):
+        name = node.get("function_name")
+        if isinstance(name, str):
+            name = name.lower()
+            if name in FILE_FUNCTIONS or name.startswith(FILE_FUNCTION_PREFIXES):
+                return True
+        # FROM 'data.csv' is a replacement scan over a file
+        if node.get("type") == "BASE_TABLE":
+            table = node.get("table_name") or ""
+            if "." in table or "/" in table:
+                return True
+    return False
+
+
+def _strip_explain(message: str) -> str:
+    """Error message as if the query had been run on its own."""
+    return EXPLAIN_CONTEXT_PATTERN.sub(r"\1\2^", message)
+
+
+class QueryAnalyzer:
+    """Rejects broken or disallowed queries before any fixture is built.
+
+    Every challenge's tables are created once, empty, in their own attached
+    in-memory database; a query is parsed with json_serialize_sql and then
+    bound with EXPLAIN against those tables, which never executes it. The
+    connection has external access disabled, so nothing a query names can
+    reach the filesystem. Queries the serializer does not support (PIVOT)
+    fall back to checking statement types. Anything the analyzer cannot
+    decide rejects the query.
+    """
+
+    def __init__(self, max_schemas: int = 256):
+        self.max_schemas = max_schemas
+        self._conn = duckdb.connect(
+            ":memory:", config={"threads": 1, "enable_external_access": False}
+        )
+        self._schemas: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _catalog(self, ddl: List[str]) -> str:
+        key = hashlib.sha256("\n".join(ddl).encode("utf-8")).hexdigest()[:16]
+        with self._lock:
+            name = self._schemas.get(key)
+            if name is not None:
+                self._schemas.move_to_end(key)
+                return name
+
+            name = f"challenge_{key}"
+            self._conn.execute(f"ATTACH ':memory:' AS {name}")
+            try:
+                cursor = self._conn.cursor()
+                cursor.execute(f"USE {name}")
+                for statement in ddl:
+                    cursor.execute(statement)
+                cursor.close()
+            except Exception:
+                self._conn.execute(f"DETACH DATABASE IF EXISTS {name}")
+                raise
+            self._schemas[key] = name
+            while len(self._schemas) > self.max_schemas:
+                _, evicted = self._schemas.popitem(last=False)
+                self._conn.execute(f"DETACH DATABASE IF EXISTS {evicted}")
+            return name
+
+    @staticmethod
+    def _statement_types(
+        cursor: duckdb.DuckDBPyConnection, query: str
+    ) -> Optional[Tuple[str, str]]:
+        statements = cursor.extract_statements(query)
+        selects = [s for s in statements if s.type == duckdb.StatementType.SELECT]
+        # PIVOT expands into helper statements without query text of their own
+        others = [
+            s
+            for s in statements
+            if s.type != duckdb.StatementType.SELECT and s.query.strip()
+        ]
+        if others or not selects:
+            return "disallowed", DISALLOWED_STATEMENT
+        if len(selects) > 1:
+            return "disallowed", MULTIPLE_STATEMENTS
+        return None
+
+    def analyze(
+        self, query: str, ddl: List[str], retry: bool = True
+    ) -> Optional[Tuple[str, str]]:
+        """Return (reason, error) if the query must not run, else None.
+
+        Only errors that do not depend on the data are reported as parse or
+        binder errors; anything else is left for the real run.
+        """
+        try:
+            catalog = self._catalog(ddl)
+        except Exception as e:
+            logging.error(f"Precheck catalog could not be built: {str(e)}")
+            return "internal", PRECHECK_FAILED
+
+        cursor = self._conn.cursor()
+        try:
+            serialized = json.loads(
+                cursor.execute("SELECT json_serialize_sql(?)", [query]).fetchone()[0]
+            )
+            if serialized.get("error"):
+                if serialized.get("error_type") == "parser":
+                    return "parse", f"Parser Error: {serialized.get('error_message')}"
+                # Only plain SELECTs serialize; file access is then left to
+                # the disabled external access of this and the test connections
+                verdict = self._statement_types(cursor, query)
+                if verdict is not None:
+                    return verdict
+            else:
+                statements = serialized.get("statements") or []
+                if len(statements) > 1:
+                    return "disallowed", MULTIPLE_STATEMENTS
+                if _reads_files(statements):
+                    return "disallowed", DISALLOWED_FILES
+
+            cursor.execute(f"USE {catalog}")
+            cursor.execute(f"{EXPLAIN_PREFIX}{query}").fetchall()
+            return None
+        except duckdb.PermissionException:
+            return "disallowed", DISALLOWED_FILES
+        except (
+            duckdb.ParserException,
+            duckdb.BinderException,
+            duckdb.CatalogException,
+        ) as e:
+            if isinstance(e, duckdb.ParserException):
+                return "parse", _strip_explain(str(e))
+            with self._lock:
+                evicted = catalog not in self._schemas.values()
+            if evicted and retry:
+                # Another challenge pushed this catalog out mid-check
+                return self.analyze(query, ddl, retry=False)
+            if evicted:
+                return "internal", PRECHECK_FAILED
+            return "binder", _strip_explain(str(e))
+        except duckdb.InternalException as e:
+            logging.error(f"Precheck failed: {str(e)}")
+            return "internal", PRECHECK_FAILED
+        except duckdb.Error as e:
+            # Raised while planning the query, so every run would raise it too
+            return "binder", _strip_explain(str(e))
+        except Exception as e:
+            logging.error(f"Precheck failed: {str(e)}")
+            return "internal", PRECHECK_FAILED
+        finally:
+            cursor.close()
+
+    def normalize(self, query: str) -> str:
+        """Canonical text of a query: case, spacing and comments do not matter."""
+        cursor = self._conn.cursor()
+        try:
+            return cursor.execute(
+                "SELECT json_deserialize_sql(json_serialize_sql(?))", [query]
+            ).fetchone()[0]
+        except duckdb.Error:
+            return " ".join(query.split())
+        finally:
+            cursor.close()
+
+    def check(self, query: str, ddl: List[str]) -> Optional[str]:
+        verdict = self.analyze(query, ddl)
+        if verdict is None:
+            return None
+        reason, error = verdict
+        metrics.EXECUTOR_PRECHECK_REJECTIONS.inc(1, reason)
+        return error
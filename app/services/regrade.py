@@ -0,0 +1,386 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import Challenge, RegradeJob, Submission
+from app.services import metrics
+from app.services.sql_executor import PLAN_VERSION, SQLExecutor
+from app.services.test_stats import test_stats
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# Approval rows record the reference solution, not an attempt to grade
+REGRADED_STATUSES = ("solved", "failed")
+
+
+class RegradeService:
+    """Background jobs that recompute verdicts of stored submissions.
+
+    Jobs walk a challenge's submissions in id order, one chunk at a time.
+    Every chunk is graded as a batch (each distinct query once, on fixtures
+    built once per test case) and written back with one bulk UPDATE in the
+    same transaction as the job's progress, so a restarted job resumes after
+    the last committed chunk. Grading runs on its own small, low-priority
+    worker pool and never queues behind or ahead of live /execute traffic.
+
+    Every process polls for jobs and claims one with a conditional UPDATE
+    that stores its own token, so each job runs in exactly one process.
+    Chunks commit only while the token is still the job's; a job whose
+    owner died is taken over once it has made no progress for the lease.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = settings.REGRADE_CHUNK_SIZE,
+        max_jobs: int = settings.REGRADE_MAX_JOBS,
+        executor: Optional[SQLExecutor] = None,
+    ):
+        self.chunk_size = chunk_size
+        self.max_jobs = max_jobs
+        self.executor = executor or SQLExecutor(
+            max_workers=settings.REGRADE_WORKERS,
+            duckdb_threads=1,
+            worker_nice=settings.REGRADE_WORKER_NICE,
+        )
+        self._tasks: Dict[int, asyncio.Task] = {}
+        # job id -> claim token, for jobs this process is running
+        self._claims: Dict[int, str] = {}
+        # Jobs resumed while their previous task was still winding down
+        self._respawn: Set[int] = set()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._watcher: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start polling for jobs queued here or left behind by other processes."""
+        if self._slots is not None:
+            return
+        self._slots = asyncio.Semaphore(self.max_jobs)
+        self._watcher = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        """Stop running jobs and hand them back to the queue for any process."""
+        if self._watcher is not None:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+            self._watcher = None
+        claims = dict(self._claims)
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._claims.clear()
+        self._respawn.clear()
+        self._slots = None
+        if claims:
+            await asyncio.to_thread(self._release, claims)
+
+    async def _watch(self):
+        while True:
+            try:
+                for job_id in await asyncio.to_thread(self._claimable_job_ids):
+                    if job_id not in self._tasks:
+                        self._spawn(job_id)
+            except Exception as e:
+                logging.error(f"Regrade job poll failed: {str(e)}")
+            await asyncio.sleep(settings.REGRADE_POLL_SECONDS)
+
+    def create_job(self, db: Session, challenge_id: int) -> RegradeJob:
+        total = (
+            db.query(func.count(Submission.id))
+            .filter(
+                Submission.challenge_id == challenge_id,
+                Submission.status.in_(REGRADED_STATUSES),
+            )
+            .scalar()
+        )
+        job = RegradeJob(challenge_id=challenge_id, status="queued", total=total)
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        self._spawn(job.id)
+        return job
+
+    def resume_job(self, db: Session, job: RegradeJob) -> RegradeJob:
+        job.status = "queued"
+        job.error_message = None
+        db.commit()
+        db.refresh(job)
+        self._spawn(job.id, again=True)
+        return job
+
+    def cancel_job(self, db: Session, job: RegradeJob) -> RegradeJob:
+        # The runner checks the status between chunks, so the chunk in flight
+        # still commits and the job can be resumed from there later
+        job.status = "cancelled"
+        db.commit()
+        db.refresh(job)
+        return job
+
+    def _spawn(self, job_id: int, again: bool = False):
+        if self._slots is None:
+            return
+        if job_id in self._tasks:
+            # A cancelled task only stops at its next chunk; with `again`
+            # the job is picked up as soon as it has
+            if again:
+                self._respawn.add(job_id)
+            return
+        task = asyncio.create_task(self._run(job_id))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._done(job_id))
+
+    def _done(self, job_id: int):
+        self._tasks.pop(job_id, None)
+        self._claims.pop(job_id, None)
+        if job_id in self._respawn:
+            self._respawn.discard(job_id)
+            self._spawn(job_id)
+
+    async def _run(self, job_id: int):
+        async with self._slots:
+            token = uuid.uuid4().hex
+            try:
+                job = await asyncio.to_thread(self._begin, job_id, token)
+                if job is None:
+                    return
+                self._claims[job_id] = token
+                while True:
+                    chunk = await asyncio.to_thread(self._next_chunk, job_id, token)
+                    if chunk is None:
+                        return
+                    if not chunk:
+                        await asyncio.to_thread(self._finish, job_id, token, "completed")
+                        # Stored verdicts changed, so reload failure rates
+                        test_stats.invalidate(job["challenge_id"])
+                        return
+                    updates = await self._grade(job, chunk)
+                    committed = await asyncio.to_thread(
+                        self._commit_chunk, job_id, token, chunk, updates
+                    )
+                    if not committed:
+                        return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Regrade job {job_id} failed: {str(e)}")
+                await asyncio.to_thread(self._finish, job_id, token, "failed", str(e))
+
+    async def _grade(
+        self, job: Dict[str, Any], chunk: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        queries = list(dict.fromkeys(row["query"] for row in chunk))
+        graded: Dict[str, List[dict]] = {}
+        elapsed: Dict[str, float] = {}
+        batch = self.executor.execute_batch(
+            queries=queries,
+            schema_definition=job["schema_definition"],
+            test_cases=job["test_cases"],
+            plan=job["plan"],
+        )
+        async for index, test_results, seconds in batch:
+            graded[queries[index]] = test_results
+            elapsed[queries[index]] = seconds
+
+        updates = []
+        for row in chunk:
+            test_results = graded[row["query"]]
+            passed_tests = sum(1 for result in test_results if result["passed"])
+            total_tests = len(test_results)
+            updates.append(
+                {
+                    "id": row["id"],
+                    "status": "solved" if passed_tests == total_tests else "failed",
+                    "passed_tests": passed_tests,
+                    "total_tests": total_tests,
+                    "error_message": None,
+                    "test_results": test_results,
+                    # Batch grading times the batch, not the stages of each query
+                    "execution_time": elapsed[row["query"]],
+                    "stage_timings": None,
+                }
+            )
+        metrics.REGRADE_SUBMISSIONS.inc(len(updates))
+        return updates
+
+    @staticmethod
+    def _claimable():
+        stale = datetime.utcnow() - timedelta(seconds=settings.REGRADE_LEASE_SECONDS)
+        return or_(
+            RegradeJob.status == "queued",
+            and_(RegradeJob.status == "running", RegradeJob.updated_at < stale),
+        )
+
+    def _claimable_job_ids(self) -> List[int]:
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(RegradeJob.id)
+                .filter(self._claimable())
+                .order_by(RegradeJob.id)
+                .all()
+            )
+            return [row.id for row in rows]
+        finally:
+            db.close()
+
+    def _begin(self, job_id: int, token: str) -> Optional[Dict[str, Any]]:
+        """Claim the job and load the challenge as it is now.
+
+        None if the job is finished, cancelled or claimed by another process.
+        """
+        db = SessionLocal()
+        try:
+            claimed = (
+                db.query(RegradeJob)
+                .filter(RegradeJob.id == job_id, self._claimable())
+                .update(
+                    {
+                        RegradeJob.status: "running",
+                        RegradeJob.claim: token,
+                        RegradeJob.updated_at: datetime.utcnow(),
+                    },
+                    synchronize_session=False,
+                )
+            )
+            db.commit()
+            if not claimed:
+                return None
+            job = db.query(RegradeJob).filter(RegradeJob.id == job_id).first()
+            challenge = (
+                db.query(Challenge).filter(Challenge.id == job.challenge_id).first()
+            )
+            if challenge is None:
+                job.status = "failed"
+                job.error_message = "Задача не найдена"
+                db.commit()
+                return None
+
+            plan = challenge.execution_plan
+            if not plan or plan.get("version") != PLAN_VERSION:
+                plan = self.executor.build_plan(
+                    challenge.schema_definition, challenge.test_cases
+                )
+            return {
+                "challenge_id": challenge.id,
+                "schema_definition": challenge.schema_definition,
+                "test_cases": challenge.test_cases,
+                "plan": plan,
+            }
+        finally:
+            db.close()
+
+    def _next_chunk(self, job_id: int, token: str) -> Optional[List[Dict[str, Any]]]:
+        """The next submissions after the job's cursor, or None if it was
+        cancelled or is no longer this process's."""
+        db = SessionLocal()
+        try:
+            job = db.query(RegradeJob).filter(RegradeJob.id == job_id).first()
+            if job is None or job.status != "running" or job.claim != token:
+                return None
+            rows = (
+                db.query(
+                    Submission.id,
+                    Submission.query,
+                    Submission.status,
+                    Submission.passed_tests,
+                )
+                .filter(
+                    Submission.challenge_id == job.challenge_id,
+                    Submission.status.in_(REGRADED_STATUSES),
+                    Submission.id > job.last_submission_id,
+                )
+                .order_by(Submission.id)
+                .limit(self.chunk_size)
+                .all()
+            )
+            return [row._asdict() for row in rows]
+        finally:
+            db.close()
+
+    def _commit_chunk(
+        self,
+        job_id: int,
+        token: str,
+        chunk: List[Dict[str, Any]],
+        updates: List[Dict[str, Any]],
+    ) -> bool:
+        """Write a graded chunk; False if another process took the job over."""
+        changed = sum(
+            1
+            for row, new in zip(chunk, updates)
+            if (row["status"], row["passed_tests"]) != (new["status"], new["passed_tests"])
+        )
+        db = SessionLocal()
+        try:
+            # A cancelled job still commits its chunk in flight
+            owned = (
+                db.query(RegradeJob)
+                .filter(RegradeJob.id == job_id, RegradeJob.claim == token)
+                .update(
+                    {
+                        RegradeJob.processed: RegradeJob.processed + len(chunk),
+                        RegradeJob.changed: RegradeJob.changed + changed,
+                        RegradeJob.last_submission_id: chunk[-1]["id"],
+                        RegradeJob.updated_at: datetime.utcnow(),
+                    },
+                    synchronize_session=False,
+                )
+            )
+            if not owned:
+                db.rollback()
+                return False
+            db.execute(update(Submission), updates)
+            db.commit()
+            return True
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _finish(
+        self, job_id: int, token: str, status: str, error: Optional[str] = None
+    ):
+        db = SessionLocal()
+        try:
+            db.query(RegradeJob).filter(
+                RegradeJob.id == job_id,
+                RegradeJob.claim == token,
+                RegradeJob.status.in_(ACTIVE_STATUSES),
+            ).update(
+                {RegradeJob.status: status, RegradeJob.error_message: error},
+                synchronize_session=False,
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _release(self, claims: Dict[int, str]):
+        """Put jobs this process was running back in the queue."""
+        db = SessionLocal()
+        try:
+            for job_id, token in claims.items():
+                db.query(RegradeJob).filter(
+                    RegradeJob.id == job_id,
+                    RegradeJob.claim == token,
+                    RegradeJob.status == "running",
+                ).update(
+                    {RegradeJob.status: "queued", RegradeJob.claim: None},
+                    synchronize_session=False,
+                )
+            db.commit()
+        finally:
+            db.close()
+
+
+regrade_service = RegradeService()
+
+metrics.REGRADE_ACTIVE_JOBS.set_function(lambda: len(regrade_service._tasks))
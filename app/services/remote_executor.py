@@ -0,0 +1,482 @@
+import asyncio
+import bisect
+import hashlib
+import hmac
+import json
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Protocol, Tuple
+
+import httpx
+
+from app.config import settings
+from app.services import metrics
+from app.services.differential import differential_tester
+from app.services.parquet_datasets import parquet_datasets
+from app.services.sql_executor import AdmissionRejected, executor
+
+GradeResult = Tuple[List[dict], float, Optional[str]]
+# {"hidden": hidden check or None, "efficiency": benchmark or None}
+ReviewResult = Dict[str, Optional[dict]]
+
+WORKER_PREFIX = "/api/worker"
+TOKEN_HEADER = "X-Worker-Token"
+
+
+def content_key(
+    challenge_id: int,
+    schema_definition: dict,
+    test_cases: List[dict],
+    solution_query: str,
+) -> str:
+    """Key of a challenge version that a node can check against the body."""
+    body = json.dumps(
+        [schema_definition, test_cases, solution_query], sort_keys=True, default=str
+    )
+    return f"{challenge_id}:{hashlib.sha256(body.encode('utf-8')).hexdigest()[:32]}"
+
+
+def check_token(token: Optional[str]) -> bool:
+    # Without a configured token the worker endpoints are never served
+    if not settings.EXECUTOR_WORKER_TOKEN:
+        return False
+    return token is not None and hmac.compare_digest(
+        token, settings.EXECUTOR_WORKER_TOKEN
+    )
+
+
+async def review(challenge, query: str, efficiency: bool = False) -> ReviewResult:
+    """Checks for a query that passed every fixed test, on this process's
+    executor: the hidden differential check and, if asked for and the query
+    still passes, the benchmark against the reference solution."""
+    hidden = await differential_tester.check(challenge, query)
+    benchmark = None
+    if efficiency and (hidden is None or hidden["status"] != "failed"):
+        benchmark = await executor.benchmark(
+            query=query,
+            reference_query=challenge.solution_query,
+            schema_definition=challenge.schema_definition,
+            test_cases=challenge.test_cases,
+            plan=challenge.plan,
+        )
+    return {"hidden": hidden, "efficiency": benchmark}
+
+
+class GradingBackend(Protocol):
+    """Where /execute submissions are graded."""
+
+    async def start(self): ...
+
+    async def stop(self): ...
+
+    async def grade(
+        self,
+        challenge,
+        query: str,
+        profile: bool = False,
+        user_id: Optional[int] = None,
+        fail_fast: bool = False,
+        order: Optional[List[int]] = None,
+    ) -> GradeResult:
+        """Same result and AdmissionRejected semantics as execute_and_test."""
+        ...
+
+    async def review(
+        self, challenge, query: str, efficiency: bool = False
+    ) -> ReviewResult:
+        """Hidden check and benchmark of a query that passed, where it was graded."""
+        ...
+
+
+class LocalExecutor:
+    """Grades in this process's worker pool."""
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def grade(
+        self,
+        challenge,
+        query: str,
+        profile: bool = False,
+        user_id: Optional[int] = None,
+        fail_fast: bool = False,
+        order: Optional[List[int]] = None,
+    ) -> GradeResult:
+        return await executor.execute_and_test(
+            query=query,
+            schema_definition=challenge.schema_definition,
+            test_cases=challenge.test_cases,
+            plan=challenge.plan,
+            profile=profile,
+            user_id=user_id,
+            fail_fast=fail_fast,
+            order=order,
+        )
+
+    async def review(
+        self, challenge, query: str, efficiency: bool = False
+    ) -> ReviewResult:
+        return await review(challenge, query, efficiency)
+
+
+class RemoteExecutor:
+    """Grades on a fleet of executor nodes over HTTP.
+
+    Challenges map to nodes on a consistent-hash ring keyed by challenge id,
+    so each challenge's plan and fixtures stay warm on one node and adding
+    or removing a node only moves the challenges that hashed to it. A job
+    carries the query and the challenge version; the schema, test cases and
+    reference solution are sent only when the node answers that it does not
+    have them yet, and the node compiles its own plan from them. Hidden
+    checks and benchmarks of passing queries run on the same node too.
+
+    Nodes failing a request or the periodic health check are skipped until
+    they pass one again. A job that fails to reach its node, fails on it or
+    is rejected by a full node is retried on the next nodes of the ring;
+    a job that timed out may still be running, so it is not retried.
+    `transport` replaces the network, e.g. with httpx.ASGITransport to
+    grade in-process.
+    """
+
+    def __init__(
+        self,
+        nodes: List[str],
+        timeout: float = settings.EXECUTOR_NODE_TIMEOUT,
+        retries: int = settings.EXECUTOR_NODE_RETRIES,
+        health_interval: float = settings.EXECUTOR_HEALTH_INTERVAL,
+        replicas: int = 64,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        if not nodes:
+            raise ValueError("RemoteExecutor needs at least one node")
+        self.nodes = [node.rstrip("/") for node in nodes]
+        self.timeout = timeout
+        self.retries = retries
+        self.health_interval = health_interval
+        self.transport = transport
+        ring = sorted(
+            (self._hash(f"{node}#{i}"), node)
+            for node in self.nodes
+            for i in range(replicas)
+        )
+        self._ring_hashes = [point for point, _ in ring]
+        self._ring_nodes = [node for _, node in ring]
+        self._healthy: Dict[str, bool] = {}
+        for node in self.nodes:
+            self._set_healthy(node, True)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._health_task: Optional[asyncio.Task] = None
+        # challenge id -> (etag, content key), so the key is hashed once per version
+        self._keys: Dict[int, Tuple[str, str]] = {}
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int(hashlib.sha256(value.encode("utf-8")).hexdigest()[:16], 16)
+
+    def _set_healthy(self, node: str, healthy: bool):
+        if self._healthy.get(node) != healthy:
+            if not healthy:
+                logging.warning(f"Executor node {node} is unavailable")
+            self._healthy[node] = healthy
+            metrics.EXECUTOR_NODE_HEALTHY.set(1 if healthy else 0, node)
+
+    def nodes_for(self, challenge_id: int) -> List[str]:
+        """Nodes in the order a challenge's jobs try them: its ring
+        successors, healthy ones first."""
+        start = bisect.bisect(self._ring_hashes, self._hash(str(challenge_id)))
+        ordered: List[str] = []
+        for i in range(len(self._ring_nodes)):
+            node = self._ring_nodes[(start + i) % len(self._ring_nodes)]
+            if node not in ordered:
+                ordered.append(node)
+                if len(ordered) == len(self.nodes):
+                    break
+        return [node for node in ordered if self._healthy[node]] + [
+            node for node in ordered if not self._healthy[node]
+        ]
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            headers = {}
+            if settings.EXECUTOR_WORKER_TOKEN:
+                headers[TOKEN_HEADER] = settings.EXECUTOR_WORKER_TOKEN
+            self._client = httpx.AsyncClient(
+                transport=self.transport, timeout=self.timeout, headers=headers
+            )
+        return self._client
+
+    def _key(self, challenge) -> str:
+        cached = self._keys.get(challenge.id)
+        if cached is None or cached[0] != challenge.etag:
+            if len(self._keys) >= settings.CHALLENGE_CACHE_SIZE:
+                self._keys.clear()
+            cached = self._keys[challenge.id] = (
+                challenge.etag,
+                content_key(
+                    challenge.id,
+                    challenge.schema_definition,
+                    challenge.test_cases,
+                    challenge.solution_query,
+                ),
+            )
+        return cached[1]
+
+    async def _post(self, node: str, path: str, job: Dict[str, Any]) -> httpx.Response:
+        return await self._get_client().post(f"{node}{WORKER_PREFIX}{path}", json=job)
+
+    async def _send(self, challenge, path: str, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Run a job on the challenge's node, falling over along the ring."""
+        job = {"challenge_key": self._key(challenge), **job}
+        rejected: Optional[AdmissionRejected] = None
+        failure = None
+        for node in self.nodes_for(challenge.id)[: self.retries + 1]:
+            try:
+                response = await self._post(node, path, job)
+                if response.status_code == 409:
+                    # The node has not seen this challenge version yet
+                    response = await self._post(
+                        node,
+                        path,
+                        {
+                            **job,
+                            "schema_definition": challenge.schema_definition,
+                            "test_cases": challenge.test_cases,
+                            "solution_query": challenge.solution_query,
+                        },
+                    )
+            except httpx.ReadTimeout:
+                # The node may still be running it; another node would run it again
+                metrics.EXECUTOR_NODE_REQUESTS.inc(1, node, "timeout")
+                raise RuntimeError(f"узел проверки {node} не ответил вовремя")
+            except httpx.HTTPError as e:
+                metrics.EXECUTOR_NODE_REQUESTS.inc(1, node, "unavailable")
+                self._set_healthy(node, False)
+                failure = f"{node}: {type(e).__name__}"
+                continue
+
+            if response.status_code == 200:
+                metrics.EXECUTOR_NODE_REQUESTS.inc(1, node, "ok")
+                self._set_healthy(node, True)
+                return response.json()
+
+            detail = self._detail(response)
+            if response.status_code in (429, 503):
+                metrics.EXECUTOR_NODE_REQUESTS.inc(1, node, "rejected")
+                rejected = AdmissionRejected(
+                    detail,
+                    response.status_code,
+                    float(response.headers.get("Retry-After", 1)),
+                )
+                if response.status_code == 429:
+                    # Per-user limit: another node would only hide it
+                    raise rejected
+                continue
+            metrics.EXECUTOR_NODE_REQUESTS.inc(1, node, "error")
+            if response.status_code < 500:
+                raise RuntimeError(f"{node}: {detail}")
+            failure = f"{node}: {detail}"
+
+        if rejected is not None:
+            raise rejected
+        raise RuntimeError(f"нет доступных узлов проверки ({failure})")
+
+    async def grade(
+        self,
+        challenge,
+        query: str,
+        profile: bool = False,
+        user_id: Optional[int] = None,
+        fail_fast: bool = False,
+        order: Optional[List[int]] = None,
+    ) -> GradeResult:
+        body = await self._send(
+            challenge,
+            "/grade",
+            {
+                "query": query,
+                "profile": profile,
+                "user_id": user_id,
+                "fail_fast": fail_fast,
+                "order": order,
+            },
+        )
+        return body["test_results"], body["execution_time"], body["error"]
+
+    async def review(
+        self, challenge, query: str, efficiency: bool = False
+    ) -> ReviewResult:
+        """Runs on the node that graded the query, where its fixtures are warm."""
+        body = await self._send(
+            challenge, "/review", {"query": query, "efficiency": efficiency}
+        )
+        return {"hidden": body["hidden"], "efficiency": body["efficiency"]}
+
+    @staticmethod
+    def _detail(response: httpx.Response) -> str:
+        try:
+            return str(response.json().get("detail"))
+        except ValueError:
+            return f"HTTP {response.status_code}"
+
+    async def check_health(self):
+        async def check(node: str):
+            try:
+                response = await self._get_client().get(
+                    f"{node}{WORKER_PREFIX}/health",
+                    timeout=min(self.timeout, self.health_interval),
+                )
+                self._set_healthy(node, response.status_code == 200)
+            except httpx.HTTPError:
+                self._set_healthy(node, False)
+
+        await asyncio.gather(*(check(node) for node in self.nodes))
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            try:
+                await self.check_health()
+            except Exception as e:
+                logging.error(f"Executor health check failed: {str(e)}")
+
+    async def start(self):
+        if self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def stop(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class UnknownChallenge(Exception):
+    """The job does not carry its challenge and this node has not seen it."""
+
+
+class NodeChallenge:
+    """A challenge as a node knows it; same attributes as CachedChallenge
+    where the grading and review code reads them."""
+
+    def __init__(
+        self,
+        key: str,
+        schema_definition: dict,
+        test_cases: List[dict],
+        solution_query: str,
+        plan: Dict[str, Any],
+    ):
+        self.id = int(key.split(":", 1)[0])
+        # The content key already changes with every version
+        self.etag = key
+        self.schema_definition = schema_definition
+        self.test_cases = test_cases
+        self.solution_query = solution_query
+        self.plan = plan
+
+
+class GradingWorker:
+    """Node side of RemoteExecutor: runs jobs on this process's executor.
+
+    Keeps the challenges it was sent in an LRU keyed by challenge version,
+    so jobs after the first carry only the query. A challenge is accepted
+    only if its key matches its content, and the plan is always compiled
+    here; dataset specs must match their key and stay within the row limit
+    before anything is written to disk. Invalid jobs raise ValueError.
+    """
+
+    def __init__(self, max_challenges: int = settings.CHALLENGE_CACHE_SIZE):
+        self.max_challenges = max_challenges
+        self._challenges: "OrderedDict[str, NodeChallenge]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._challenges)
+
+    @staticmethod
+    def _check_dataset(schema_definition: dict, spec: Dict[str, Any]):
+        rows = spec.get("rows")
+        counts = rows if isinstance(rows, dict) else {"": rows}
+        if not all(
+            isinstance(count, int) and 0 <= count <= settings.DATASET_ROWS_MAX
+            for count in counts.values()
+        ):
+            raise ValueError("недопустимое число строк набора данных")
+        expected = parquet_datasets.spec(schema_definition, rows, spec.get("seed"))
+        if expected["key"] != spec.get("key"):
+            raise ValueError("ключ набора данных не совпадает с его описанием")
+
+    def _prepare(self, job: Dict[str, Any]) -> NodeChallenge:
+        schema_definition = job["schema_definition"]
+        test_cases = job["test_cases"]
+        solution_query = job.get("solution_query") or ""
+        challenge_id = job["challenge_key"].split(":", 1)[0]
+        if not challenge_id.isdigit() or job["challenge_key"] != content_key(
+            int(challenge_id), schema_definition, test_cases, solution_query
+        ):
+            raise ValueError("ключ задачи не совпадает с её содержимым")
+        for test_case in test_cases:
+            if test_case.get("dataset"):
+                self._check_dataset(schema_definition, test_case["dataset"])
+        plan = executor.build_plan(schema_definition, test_cases)
+        for test_case in test_cases:
+            if test_case.get("dataset"):
+                parquet_datasets.ensure(schema_definition, test_case["dataset"])
+        return NodeChallenge(
+            job["challenge_key"], schema_definition, test_cases, solution_query, plan
+        )
+
+    async def _get(self, job: Dict[str, Any]) -> NodeChallenge:
+        key = job["challenge_key"]
+        challenge = self._challenges.get(key)
+        if challenge is not None:
+            self._challenges.move_to_end(key)
+            metrics.CACHE_REQUESTS.inc(1, "worker", "hit")
+            return challenge
+        if job.get("schema_definition") is None or job.get("test_cases") is None:
+            raise UnknownChallenge(key)
+        metrics.CACHE_REQUESTS.inc(1, "worker", "miss")
+
+        challenge = await asyncio.to_thread(self._prepare, job)
+        self._challenges[key] = challenge
+        while len(self._challenges) > self.max_challenges:
+            _, evicted = self._challenges.popitem(last=False)
+            if executor.store is not None:
+                executor.store.evict(executor.fixture_keys(evicted.plan))
+        return challenge
+
+    async def grade(self, job: Dict[str, Any]) -> GradeResult:
+        challenge = await self._get(job)
+        return await executor.execute_and_test(
+            query=job["query"],
+            schema_definition=challenge.schema_definition,
+            test_cases=challenge.test_cases,
+            plan=challenge.plan,
+            profile=job.get("profile", False),
+            user_id=job.get("user_id"),
+            fail_fast=job.get("fail_fast", False),
+            order=job.get("order"),
+        )
+
+    async def review(self, job: Dict[str, Any]) -> ReviewResult:
+        challenge = await self._get(job)
+        return await review(challenge, job["query"], job.get("efficiency", False))
+
+
+def _backend() -> GradingBackend:
+    if settings.EXECUTOR_NODES:
+        return RemoteExecutor(settings.EXECUTOR_NODES)
+    return LocalExecutor()
+
+
+grading_backend: GradingBackend = _backend()
+grading_worker = GradingWorker()
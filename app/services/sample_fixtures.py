@@ -0,0 +1,75 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import duckdb
+
+from app.services import metrics
+
+
+class SampleFixtures:
+    """Challenge sample data, loaded once per challenge and shared by every run.
+
+    All fixtures live in one DuckDB instance, each in its own attached
+    in-memory database. Runs get their own cursor, so they can proceed in
+    parallel, and the LRU bound keeps memory in check.
+    """
+
+    def __init__(self, max_fixtures: int, threads: int, memory_limit: str):
+        self.max_fixtures = max_fixtures
+        self.threads = threads
+        self.memory_limit = memory_limit
+        self._conn: Optional[duckdb.DuckDBPyConnection] = None
+        self._fixtures: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counter = 0
+
+    def cursor(
+        self, key: str, load: Callable[[duckdb.DuckDBPyConnection], None]
+    ) -> duckdb.DuckDBPyConnection:
+        """Cursor whose default database is the fixture for `key`.
+
+        `load` builds the fixture on a miss; it runs under the lock, so
+        concurrent first runs of one challenge load it once.
+        """
+        with self._lock:
+            if self._conn is None:
+                self._conn = duckdb.connect(
+                    ":memory:",
+                    config={
+                        "threads": self.threads,
+                        "memory_limit": self.memory_limit,
+                        "enable_external_access": False,
+                    },
+                )
+            name = self._fixtures.get(key)
+            if name is not None:
+                self._fixtures.move_to_end(key)
+                metrics.CACHE_REQUESTS.inc(1, "sample_fixture", "hit")
+            else:
+                metrics.CACHE_REQUESTS.inc(1, "sample_fixture", "miss")
+                self._counter += 1
+                name = f"sample_{self._counter}"
+                self._conn.execute(f"ATTACH ':memory:' AS {name}")
+                try:
+                    loader = self._conn.cursor()
+                    loader.execute(f"USE {name}")
+                    load(loader)
+                    loader.close()
+                except Exception:
+                    self._conn.execute(f"DETACH DATABASE IF EXISTS {name}")
+                    raise
+                self._fixtures[key] = name
+                while len(self._fixtures) > self.max_fixtures:
+                    _, evicted = self._fixtures.popitem(last=False)
+                    self._conn.execute(f"DETACH DATABASE IF EXISTS {evicted}")
+
+            cursor = self._conn.cursor()
+            cursor.execute(f"USE {name}")
+            return cursor
+
+    def clear(self):
+        with self._lock:
+            for name in self._fixtures.values():
+                self._conn.execute(f"DETACH DATABASE IF EXISTS {name}")
+            self._fixtures.clear()
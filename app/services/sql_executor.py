@@ -1,20 +1,421 @@
 import duckdb
+import json
 import time
-from typing import List, Dict, Any, Tuple
+from typing import AsyncIterator, Callable, List, Dict, Any, Optional, Tuple
 from datetime import date, datetime
 from decimal import Decimal
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import os
+import re
+import statistics
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from app.config import settings
+from app.services import metrics
+from app.services.fixture_store import FixtureStore
+from app.services.query_analyzer import QueryAnalyzer
+from app.services.sample_fixtures import SampleFixtures
+
+PLAN_VERSION = 3
+
+MACRO_PATTERN = re.compile(r"\b(macro|function)\b", re.IGNORECASE)
+SETTING_PATTERN = re.compile(r"\b(set|reset|pragma|call)\b", re.IGNORECASE)
+SETTINGS_QUERY = "SELECT name, value FROM duckdb_settings()"
+CONNECTION_ATTEMPTS = 3
+DATASET_KEY_PATTERN = re.compile(r"^[0-9a-f]{16}$")
+
+
+def dataset_dir(key: str) -> str:
+    """Directory holding the Parquet files of one large dataset."""
+    return os.path.join(settings.DATASETS_DIR, key)
+
+
+def dataset_path(key: str, table: str) -> str:
+    return os.path.join(dataset_dir(key), f"{table}.parquet")
+
+
+def schema_column_types(schema_definition: dict) -> Dict[str, Dict[str, str]]:
+    """Declared column types per table: {table: {column: type}}."""
+    return {
+        table.get("name", "unknown"): {
+            col["name"]: col["type"]
+            for col in table.get("columns", [])
+            if "type" in col and "name" in col
+        }
+        for table in schema_definition.get("tables", [])
+    }
+
+
+def dataset_views(key: str, column_types: Dict[str, Dict[str, str]]) -> List[str]:
+    """Views exposing a dataset's Parquet files with the declared column types.
+
+    Files written before types were kept hold dates as text and decimals as
+    doubles; the casts make those read like the schema too.
+    """
+    views = []
+    for table, types in column_types.items():
+        path = dataset_path(key, table).replace("'", "''")
+        columns = ", ".join(
+            f'CAST("{column}" AS {col_type}) AS "{column}"'
+            for column, col_type in types.items()
+        )
+        views.append(
+            f"CREATE VIEW {table} AS SELECT {columns or '*'} FROM read_parquet('{path}')"
+        )
+    return views
+
+
+class AdmissionRejected(Exception):
+    """Raised before any work is queued when the executor cannot take a submission."""
+
+    def __init__(self, message: str, status_code: int, retry_after: float):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def auto_pool_size(duckdb_threads: int = 0) -> Tuple[int, int]:
+    """Pick (workers, threads per connection) for the available cores.
+
+    Challenge tables are tiny, so many single-threaded connections running
+    side by side beat a few connections each fanning out over every core.
+    """
+    cores = os.cpu_count() or 1
+    threads = duckdb_threads if duckdb_threads > 0 else 1
+    return max(1, cores // threads), threads
+
+
+class WorkerPool(ThreadPoolExecutor):
+    """Thread pool that counts submitted jobs no worker has picked up yet."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._waiting = 0
+        self._waiting_lock = threading.Lock()
+
+    def waiting(self) -> int:
+        return self._waiting
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        queued = [True]
+
+        def dequeue():
+            with self._waiting_lock:
+                if queued[0]:
+                    queued[0] = False
+                    self._waiting -= 1
+
+        def run():
+            dequeue()
+            return fn(*args, **kwargs)
+
+        with self._waiting_lock:
+            self._waiting += 1
+        try:
+            future = super().submit(run)
+        except BaseException:
+            dequeue()
+            raise
+        # Cancelled jobs never reach run()
+        future.add_done_callback(lambda _: dequeue())
+        return future
 
 
 class SQLExecutor:
-    def __init__(self):
-        self.executor = ThreadPoolExecutor(max_workers=4)
+    def __init__(
+        self,
+        max_workers: int = settings.EXECUTOR_WORKERS,
+        duckdb_threads: int = settings.DUCKDB_THREADS,
+        duckdb_memory_limit: str = settings.DUCKDB_MEMORY_LIMIT,
+        max_queued_tests: int = settings.EXECUTOR_MAX_QUEUED_TESTS,
+        max_wait_seconds: float = settings.EXECUTOR_MAX_WAIT_SECONDS,
+        user_concurrency: int = settings.EXECUTOR_USER_CONCURRENCY,
+        warm_connections: bool = settings.DUCKDB_WARM_CONNECTIONS,
+        connection_max_uses: int = settings.DUCKDB_CONNECTION_MAX_USES,
+        connection_max_memory: int = settings.DUCKDB_CONNECTION_MAX_MEMORY,
+        worker_nice: int = 0,
+        precheck: bool = settings.EXECUTOR_PRECHECK,
+        fixture_store_dir: str = settings.FIXTURE_STORE_DIR,
+    ):
+        auto_workers, auto_threads = auto_pool_size(duckdb_threads)
+        self.max_workers = max_workers if max_workers > 0 else auto_workers
+        self.duckdb_threads = auto_threads
+        self.duckdb_memory_limit = duckdb_memory_limit
+        self.worker_nice = worker_nice
+        self.executor = self._create_pool()
+        self.warm_connections = warm_connections
+        self.connection_max_uses = connection_max_uses
+        self.connection_max_memory = connection_max_memory
+        self._local = threading.local()
+        self.max_queued_tests = max_queued_tests
+        self.max_wait_seconds = max_wait_seconds
+        self.user_concurrency = user_concurrency
+        self.analyzer = QueryAnalyzer() if precheck else None
+        self.samples = SampleFixtures(
+            settings.SAMPLE_FIXTURE_CACHE_SIZE,
+            self.duckdb_threads,
+            self.duckdb_memory_limit,
+        )
+        self.store = (
+            FixtureStore(
+                fixture_store_dir,
+                settings.FIXTURE_STORE_GRACE,
+                settings.FIXTURE_STORE_MAX_IDLE,
+            )
+            if fixture_store_dir
+            else None
+        )
+
+        self._explains: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._explain_lock = threading.Lock()
+
+        self._admission_lock = threading.Lock()
+        self._pending_tests = 0
+        self._user_active: Dict[int, int] = {}
+        # Moving average of one test's worker time, used to estimate queue wait
+        self._avg_test_seconds = 0.05
+
+    def resize(self, max_workers: int = 0, duckdb_threads: int = 0) -> dict:
+        """Swap in a new worker pool; tests already queued finish on the old one.
+
+        Sizes are clamped to the machine: at most one DuckDB thread per core
+        and EXECUTOR_MAX_WORKERS_PER_CPU workers per core.
+        """
+        cores = os.cpu_count() or 1
+        max_workers = min(max_workers, settings.EXECUTOR_MAX_WORKERS_PER_CPU * cores)
+        duckdb_threads = min(duckdb_threads, cores)
+        auto_workers, auto_threads = auto_pool_size(duckdb_threads)
+        old_pool = self.executor
+        self.duckdb_threads = auto_threads
+        self.max_workers = max_workers if max_workers > 0 else auto_workers
+        self.executor = self._create_pool()
+        old_pool.shutdown(wait=False)
+        return self.pool_config()
+
+    def _create_pool(self) -> WorkerPool:
+        return WorkerPool(
+            max_workers=self.max_workers, initializer=self._init_worker
+        )
+
+    def _init_worker(self):
+        """Lower the scheduling priority of this worker thread (Linux only)."""
+        if not self.worker_nice:
+            return
+        try:
+            thread_id = threading.get_native_id()
+            current = os.getpriority(os.PRIO_PROCESS, thread_id)
+            os.setpriority(os.PRIO_PROCESS, thread_id, current + self.worker_nice)
+        except (AttributeError, OSError):
+            pass
+
+    def pool_config(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "duckdb_threads": self.duckdb_threads,
+            "duckdb_memory_limit": self.duckdb_memory_limit,
+            "cpu_count": os.cpu_count() or 1,
+        }
+
+    def estimated_wait(self) -> float:
+        return self._pending_tests / self.max_workers * self._avg_test_seconds
+
+    def _admit(self, user_id: Optional[int], tests: int):
+        with self._admission_lock:
+            if user_id is not None:
+                active = self._user_active.get(user_id, 0)
+                if self.user_concurrency and active >= self.user_concurrency:
+                    metrics.EXECUTOR_REJECTIONS.inc(1, "user_limit")
+                    raise AdmissionRejected(
+                        "Слишком много одновременных запусков",
+                        429,
+                        tests / self.max_workers * self._avg_test_seconds,
+                    )
+
+                wait = self.estimated_wait()
+                # Work larger than the whole queue is only taken alone
+                if (
+                    self._pending_tests
+                    and self._pending_tests + tests > self.max_queued_tests
+                ):
+                    metrics.EXECUTOR_REJECTIONS.inc(1, "queue_full")
+                    raise AdmissionRejected("Сервер перегружен", 503, wait)
+                if wait > self.max_wait_seconds:
+                    metrics.EXECUTOR_REJECTIONS.inc(1, "wait_too_long")
+                    raise AdmissionRejected("Сервер перегружен", 503, wait)
+
+                self._user_active[user_id] = active + 1
+
+            self._pending_tests += tests
+
+    def _release(self, user_id: Optional[int], tests: int):
+        """Undo an _admit; called by the admitting coroutine whether or not
+        its tests ever reached a worker."""
+        with self._admission_lock:
+            self._pending_tests -= tests
+            if user_id is None:
+                return
+            remaining = self._user_active.get(user_id, 0) - 1
+            if remaining > 0:
+                self._user_active[user_id] = remaining
+            else:
+                self._user_active.pop(user_id, None)
+
+    def _record_test(self, worker_seconds: float):
+        with self._admission_lock:
+            self._avg_test_seconds += 0.1 * (worker_seconds - self._avg_test_seconds)
 
     def _create_connection(self):
-        return duckdb.connect(":memory:")
+        conn = duckdb.connect(
+            ":memory:",
+            config={
+                "threads": self.duckdb_threads,
+                "memory_limit": self.duckdb_memory_limit,
+            },
+        )
+        # Queries may read the stored fixtures and datasets and nothing else;
+        # the allow list can only be set while external access is still on
+        allowed = [os.path.abspath(settings.DATASETS_DIR) + os.sep]
+        if self.store is not None:
+            allowed.append(os.path.abspath(self.store.root) + os.sep)
+        conn.execute("SET allowed_directories = ?", [allowed])
+        conn.execute("SET enable_external_access = false")
+        return conn
+
+    def _acquire_connection(self) -> duckdb.DuckDBPyConnection:
+        """Warm per-worker connection with an empty `fixture` database attached.
+
+        Each test builds its tables inside `fixture`; releasing detaches it,
+        which is far cheaper than creating a new DuckDB instance.
+        """
+        if not self.warm_connections:
+            return self._create_connection()
+
+        for attempt in range(CONNECTION_ATTEMPTS):
+            warm = getattr(self._local, "warm", None)
+            if warm is not None and warm["uses"] >= self.connection_max_uses:
+                self._discard_connection("max_uses")
+                warm = None
+            if warm is None:
+                conn = self._create_connection()
+                # Releasing leaves `memory` in use; take the baseline in that state
+                conn.execute("USE memory")
+                warm = self._local.warm = {
+                    "conn": conn,
+                    "uses": 0,
+                    "baseline": conn.execute(
+                        "SELECT current_setting('threads'), current_setting('memory_limit')"
+                    ).fetchone(),
+                    "settings": conn.execute(SETTINGS_QUERY).fetchall(),
+                }
+                metrics.DUCKDB_CONNECTIONS_CREATED.inc()
+
+            warm["uses"] += 1
+            conn = warm["conn"]
+            try:
+                conn.execute("ATTACH ':memory:' AS fixture")
+                conn.execute("USE fixture")
+                return conn
+            except Exception:
+                self._discard_connection("unhealthy")
+                if attempt == CONNECTION_ATTEMPTS - 1:
+                    raise
+
+    def _release_connection(
+        self, conn: duckdb.DuckDBPyConnection, query: Optional[str] = None
+    ):
+        warm = getattr(self._local, "warm", None)
+        if warm is None or warm["conn"] is not conn:
+            conn.close()
+            return
+
+        try:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            conn.execute("USE memory")
+            conn.execute("DETACH DATABASE IF EXISTS fixture")
+            reason = self._check_connection(
+                conn, warm["baseline"], query, warm["settings"]
+            )
+        except Exception:
+            reason = "unhealthy"
+
+        if reason:
+            self._discard_connection(reason)
+
+    def _check_connection(
+        self,
+        conn: duckdb.DuckDBPyConnection,
+        baseline,
+        query: Optional[str] = None,
+        settings_baseline: Optional[list] = None,
+    ) -> Optional[str]:
+        """Return why the connection must be recycled, or None if it is clean."""
+        leftovers, threads, memory_limit = conn.execute(
+            """
+            SELECT
+                (SELECT count(*) FROM duckdb_databases()
+                 WHERE NOT internal AND database_name <> 'memory')
+                + (SELECT count(*) FROM duckdb_tables()
+                   WHERE database_name IN ('memory', 'temp'))
+                + (SELECT count(*) FROM duckdb_views()
+                   WHERE NOT internal AND database_name IN ('memory', 'temp'))
+                + (SELECT count(*) FROM duckdb_sequences()
+                   WHERE database_name IN ('memory', 'temp')),
+                current_setting('threads'),
+                current_setting('memory_limit')
+            """
+        ).fetchone()
+        if leftovers or (threads, memory_limit) != tuple(baseline):
+            return "unhealthy"
+
+        # duckdb_functions() is slow to scan, so only look for leaked macros
+        # when the query could have created one
+        if query is not None and MACRO_PATTERN.search(query):
+            macros = conn.execute(
+                "SELECT count(*) FROM duckdb_functions() "
+                "WHERE NOT internal AND database_name IN ('memory', 'temp')"
+            ).fetchone()[0]
+            if macros:
+                return "unhealthy"
+
+        # Comparing every setting costs about a millisecond, so only when the
+        # query could have changed one (SET integer_division, PRAGMA ...)
+        if (
+            settings_baseline is not None
+            and query is not None
+            and SETTING_PATTERN.search(query)
+            and conn.execute(SETTINGS_QUERY).fetchall() != settings_baseline
+        ):
+            return "unhealthy"
+
+        if self.connection_max_memory:
+            try:
+                used = conn.execute(
+                    "SELECT coalesce(sum(memory_usage_bytes), 0) FROM duckdb_memory()"
+                ).fetchone()[0]
+            except duckdb.Error:
+                used = 0
+            if used > self.connection_max_memory:
+                return "memory"
+        return None
 
-    def _setup_schema(self, conn: duckdb.DuckDBPyConnection, schema_definition: dict):
+    def _discard_connection(self, reason: str):
+        warm = getattr(self._local, "warm", None)
+        self._local.warm = None
+        if warm is not None:
+            metrics.DUCKDB_CONNECTIONS_RECYCLED.inc(1, reason)
+            try:
+                warm["conn"].close()
+            except Exception:
+                pass
+
+    def build_ddl(self, schema_definition: dict) -> List[str]:
+        statements = []
         tables = schema_definition.get("tables", [])
         for table in tables:
             table_name = table.get("name", "unknown")
@@ -35,7 +436,18 @@ class SQLExecutor:
                 column_defs.append(col_def)
 
             all_defs = column_defs + constraints
-            create_table_sql = f"CREATE TABLE {table_name} ({', '.join(all_defs)})"
+            statements.append(f"CREATE TABLE {table_name} ({', '.join(all_defs)})")
+        return statements
+
+    def _setup_schema(
+        self,
+        conn: duckdb.DuckDBPyConnection,
+        schema_definition: dict,
+        ddl: Optional[List[str]] = None,
+    ):
+        if ddl is None:
+            ddl = self.build_ddl(schema_definition)
+        for create_table_sql in ddl:
             conn.execute(create_table_sql)
 
     def _insert_data(
@@ -57,14 +469,226 @@ class SQLExecutor:
                 )
                 conn.execute(insert_sql, values)
 
-    def _execute_query(
-        self, conn: duckdb.DuckDBPyConnection, query: str
+    def build_plan(self, schema_definition: dict, test_cases: List[dict]) -> dict:
+        column_types = schema_column_types(schema_definition)
+        ddl = self.build_ddl(schema_definition)
+        return {
+            "version": PLAN_VERSION,
+            "ddl": ddl,
+            "tables": column_types,
+            "test_cases": [
+                self._plan_test_case(column_types, ddl, test_case)
+                for test_case in test_cases
+            ],
+        }
+
+    def _plan_test_case(
+        self, column_types: Dict[str, Dict[str, str]], ddl: List[str], test_case: dict
+    ) -> dict:
+        dataset = test_case.get("dataset")
+        if dataset:
+            # Large datasets stay on disk; their tables become views over the files
+            if not DATASET_KEY_PATTERN.match(str(dataset.get("key", ""))):
+                raise ValueError(f"{test_case['name']}: неверный ключ набора данных")
+            return {"name": test_case["name"], "inserts": [], "dataset": dataset["key"]}
+        inserts = self._build_inserts(column_types, test_case["input_data"])
+        return {
+            "name": test_case["name"],
+            "inserts": inserts,
+            "fixture_key": self._fixture_key(ddl, inserts),
+        }
+
+    @staticmethod
+    def _fixture_key(ddl: List[str], inserts: List[dict]) -> str:
+        body = json.dumps([ddl, inserts], sort_keys=True, default=str)
+        return hashlib.sha256(body.encode("utf-8")).hexdigest()[:32]
+
+    def fixture_keys(self, plan: Optional[dict]) -> List[str]:
+        """Stored-fixture keys of a plan's test cases."""
+        if not plan:
+            return []
+        return [
+            test_plan.get("fixture_key")
+            or self._fixture_key(plan["ddl"], test_plan["inserts"])
+            for test_plan in plan["test_cases"]
+            if test_plan.get("dataset") is None
+        ]
+
+    def _stored_fixture(self, ddl: List[str], test_plan: dict) -> Optional[str]:
+        if self.store is None:
+            return None
+        key = test_plan.get("fixture_key")
+        if key is None:
+            # Plans compiled before the store existed; the cached plan keeps it
+            key = test_plan["fixture_key"] = self._fixture_key(ddl, test_plan["inserts"])
+
+        def build(conn: duckdb.DuckDBPyConnection):
+            self._setup_schema(conn, {}, ddl)
+            self._load_inserts(conn, test_plan["inserts"])
+
+        return self.store.lookup(key, build)
+
+    def _plan_fixture(
+        self, plan: Optional[dict], index: int
+    ) -> Tuple[Optional[List[str]], Optional[List[dict]]]:
+        """(ddl, inserts) building the fixture of one test case."""
+        if not plan:
+            return None, None
+        test_plan = plan["test_cases"][index]
+        key = test_plan.get("dataset")
+        if key is None:
+            path = self._stored_fixture(plan["ddl"], test_plan)
+            if path is None:
+                return plan["ddl"], test_plan["inserts"]
+            # Swap the empty in-memory fixture for the shared file; attached
+            # read-only, so nothing a query does can reach other tests
+            path = path.replace("'", "''")
+            return [
+                "USE memory",
+                "DETACH DATABASE IF EXISTS fixture",
+                f"ATTACH '{path}' AS fixture (READ_ONLY)",
+                "USE fixture",
+            ], []
+        return dataset_views(key, plan["tables"]), []
+
+    def _build_inserts(
+        self,
+        column_types: Dict[str, Dict[str, str]],
+        data: Dict[str, List[Dict[str, Any]]],
+    ) -> List[dict]:
+        inserts = []
+        for table_name, rows in data.items():
+            if not rows:
+                continue
+
+            declared = column_types.get(table_name, {})
+            # Columns a row leaves out must get their DEFAULT, not NULL, so
+            # each run of rows with the same columns gets its own statement
+            runs: List[Tuple[List[str], List[Dict[str, Any]]]] = []
+            for row in rows:
+                columns = [col for col in declared if col in row]
+                columns += [col for col in row if col not in declared]
+                if runs and runs[-1][0] == columns:
+                    runs[-1][1].append(row)
+                else:
+                    runs.append((columns, [row]))
+
+            for columns, run in runs:
+                if not columns:
+                    inserts += [
+                        {
+                            "table": table_name,
+                            "sql": f"INSERT INTO {table_name} DEFAULT VALUES",
+                            "columns": [],
+                            "values": [],
+                        }
+                    ] * len(run)
+                    continue
+                selects = ", ".join(
+                    f"UNNEST(?::{declared.get(col, 'VARCHAR')}[])" for col in columns
+                )
+                inserts.append(
+                    {
+                        "table": table_name,
+                        "sql": f"INSERT INTO {table_name} ({', '.join(columns)}) SELECT {selects}",
+                        "columns": columns,
+                        "values": [[row[col] for row in run] for col in columns],
+                    }
+                )
+        return inserts
+
+    def _load_inserts(self, conn: duckdb.DuckDBPyConnection, inserts: List[dict]):
+        for insert in inserts:
+            conn.execute(insert["sql"], insert["values"])
+
+    def validate_plan(self, plan: dict):
+        conn = self._create_connection()
+        try:
+            try:
+                self._setup_schema(conn, {}, plan["ddl"])
+            except Exception as e:
+                raise ValueError(f"schema: {str(e)}")
+
+            for test_plan in plan["test_cases"]:
+                key = test_plan.get("dataset")
+                if key is not None:
+                    missing = [
+                        table
+                        for table in plan["tables"]
+                        if not os.path.exists(dataset_path(key, table))
+                    ]
+                    if missing:
+                        raise ValueError(
+                            f"{test_plan['name']}: нет файлов набора данных {key}"
+                        )
+                    continue
+                conn.begin()
+                try:
+                    self._load_inserts(conn, test_plan["inserts"])
+                except Exception as e:
+                    raise ValueError(f"{test_plan['name']}: {str(e)}")
+                finally:
+                    conn.rollback()
+        finally:
+            conn.close()
+
+    async def compile_plan(self, schema_definition: dict, test_cases: List[dict]) -> dict:
+        """Build the execution plan and dry-run it; raises ValueError if broken."""
+        plan = self.build_plan(schema_definition, test_cases)
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(self.executor, self.validate_plan, plan)
+        return plan
+
+    def check_query(
+        self, query: str, schema_definition: dict, plan: Optional[dict] = None
+    ) -> Optional[str]:
+        """Error every test would fail with (parse, binder, disallowed), or None."""
+        if self.analyzer is None:
+            return None
+        ddl = plan["ddl"] if plan else self.build_ddl(schema_definition)
+        return self.analyzer.check(query, ddl)
+
+    def _run_query(self, conn: duckdb.DuckDBPyConnection, query: str):
+        conn.execute(query)
+
+    def _fetch_result(
+        self, conn: duckdb.DuckDBPyConnection, limit: Optional[int] = None
     ) -> List[Dict[str, Any]]:
-        result = conn.execute(query).fetchall()
+        result = conn.fetchall() if limit is None else conn.fetchmany(limit)
         columns = [desc[0] for desc in conn.description]
 
         return [dict(zip(columns, row)) for row in result]
 
+    def _fetch_limit(self, test_case: dict) -> Optional[int]:
+        # One extra row is enough to fail a query on a large dataset, and
+        # keeps a stray SELECT * from pulling millions of rows into Python
+        if test_case.get("dataset"):
+            return len(test_case["expected_output"]) + 1
+        return None
+
+    def _execute_query(
+        self, conn: duckdb.DuckDBPyConnection, query: str
+    ) -> List[Dict[str, Any]]:
+        self._run_query(conn, query)
+        return self._fetch_result(conn)
+
+    def _profile_query(self, conn: duckdb.DuckDBPyConnection, query: str) -> Any:
+        conn.execute("PRAGMA enable_profiling='json'")
+        try:
+            rows = conn.execute(f"EXPLAIN ANALYZE {query}").fetchall()
+        finally:
+            # Fails inside an aborted transaction; the original error matters more
+            try:
+                conn.execute("PRAGMA disable_profiling")
+            except duckdb.Error:
+                pass
+
+        output = rows[0][1] if rows else ""
+        try:
+            return json.loads(output)
+        except ValueError:
+            return {"text": output}
+
     def _normalize_result(self, result: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         if not result:
             return []
@@ -109,47 +733,976 @@ class SQLExecutor:
         return expected_sorted == actual_sorted
 
     def _execute_single_test(
-        self, query: str, schema_definition: dict, test_case: dict
+        self,
+        query: str,
+        schema_definition: dict,
+        test_case: dict,
+        ddl: Optional[List[str]] = None,
+        inserts: Optional[List[dict]] = None,
+        submitted_ns: Optional[int] = None,
+        profile: bool = False,
     ) -> dict:
-        conn = self._create_connection()
+        timings: Dict[str, float] = {}
+        mark = time.perf_counter_ns()
+        if submitted_ns is not None:
+            timings["queue_wait"] = (mark - submitted_ns) / 1e6
+
+        def lap(stage: str):
+            nonlocal mark
+            now = time.perf_counter_ns()
+            timings[stage] = (now - mark) / 1e6
+            mark = now
 
+        conn = None
         try:
-            self._setup_schema(conn, schema_definition)
-            self._insert_data(conn, test_case["input_data"])
+            metrics.EXECUTOR_ACTIVE_WORKERS.inc()
+            conn = self._acquire_connection()
+            self._setup_schema(conn, schema_definition, ddl)
+            lap("setup")
+
+            if inserts is None:
+                self._insert_data(conn, test_case["input_data"])
+            else:
+                self._load_inserts(conn, inserts)
+            lap("load")
+
+            self._run_query(conn, query)
+            lap("query")
+
+            actual_result = self._fetch_result(conn, self._fetch_limit(test_case))
+            lap("fetch")
 
-            actual_result = self._execute_query(conn, query)
             expected_result = test_case["expected_output"]
 
             passed = self._compare_results(expected_result, actual_result)
 
             normalized_actual = self._normalize_result(actual_result)
+            lap("compare")
 
-            return {
+            result = {
                 "test_name": test_case["name"],
                 "passed": passed,
                 "expected": expected_result,
                 "actual": normalized_actual,
                 "error": None,
+                "timings": timings,
             }
+            if profile:
+                # Diagnostics only: a failing EXPLAIN ANALYZE keeps the verdict
+                try:
+                    result["profile"] = self._profile_query(conn, query)
+                except Exception:
+                    result["profile"] = None
+            return result
+
+        except Exception as e:
+            result = self._error_result(test_case, str(e))
+            result["timings"] = timings
+            return result
+
+        finally:
+            if conn is not None:
+                self._release_connection(conn, query)
+            metrics.EXECUTOR_ACTIVE_WORKERS.dec()
+            for stage, ms in timings.items():
+                metrics.EXECUTOR_STAGE_SECONDS.observe(ms / 1000, stage)
+            self._record_test(
+                sum(ms for stage, ms in timings.items() if stage != "queue_wait") / 1000
+            )
+
+    def _error_result(self, test_case: dict, error: str) -> dict:
+        return {
+            "test_name": test_case["name"],
+            "passed": False,
+            "expected": test_case["expected_output"],
+            "actual": None,
+            "error": error,
+        }
+
+    def _execute_batch_test(
+        self,
+        queries: List[str],
+        schema_definition: dict,
+        test_case: dict,
+        ddl: Optional[List[str]],
+        inserts: Optional[List[dict]],
+        report: Callable[[int, dict], None],
+    ):
+        """Build one test fixture and run every query against it.
+
+        Each query runs in a transaction that is rolled back, so one query
+        cannot change the data the next one sees.
+        """
+        started = time.perf_counter()
+        reported = 0
+        conn = None
+        try:
+            metrics.EXECUTOR_ACTIVE_WORKERS.inc()
+            conn = self._acquire_connection()
+            try:
+                self._setup_schema(conn, schema_definition, ddl)
+                if inserts is None:
+                    self._insert_data(conn, test_case["input_data"])
+                else:
+                    self._load_inserts(conn, inserts)
+            except Exception as e:
+                for index in range(len(queries)):
+                    report(index, self._error_result(test_case, str(e)))
+                reported = len(queries)
+                return
+
+            for index, query in enumerate(queries):
+                try:
+                    conn.begin()
+                    self._run_query(conn, query)
+                    actual_result = self._fetch_result(
+                        conn, self._fetch_limit(test_case)
+                    )
+                    expected_result = test_case["expected_output"]
+                    result = {
+                        "test_name": test_case["name"],
+                        "passed": self._compare_results(expected_result, actual_result),
+                        "expected": expected_result,
+                        "actual": self._normalize_result(actual_result),
+                        "error": None,
+                    }
+                except Exception as e:
+                    result = self._error_result(test_case, str(e))
+                finally:
+                    try:
+                        conn.rollback()
+                    except Exception:
+                        pass
+                report(index, result)
+                reported += 1
 
         except Exception as e:
+            for index in range(reported, len(queries)):
+                report(index, self._error_result(test_case, str(e)))
+
+        finally:
+            if conn is not None:
+                self._release_connection(conn, "\n".join(queries))
+            metrics.EXECUTOR_ACTIVE_WORKERS.dec()
+            self._record_test((time.perf_counter() - started) / max(1, len(queries)))
+
+    @contextmanager
+    def _interrupt_after(self, conn: duckdb.DuckDBPyConnection, seconds: float):
+        """Interrupt whatever `conn` is running once `seconds` have passed."""
+        # The timer must never fire once the connection is back in use
+        lock = threading.Lock()
+        finished = False
+
+        def interrupt():
+            with lock:
+                if not finished:
+                    conn.interrupt()
+
+        timer = threading.Timer(seconds, interrupt)
+        timer.start()
+        try:
+            yield
+        finally:
+            with lock:
+                finished = True
+            timer.cancel()
+
+    def _execute_hidden(
+        self,
+        query: str,
+        plan: dict,
+        expected_outputs: List[List[Dict[str, Any]]],
+        budget: float,
+    ) -> Tuple[int, bool, Optional[str]]:
+        """Run a query on hidden datasets until one disagrees with its expected output.
+
+        Tables are created once; each dataset is loaded and queried in a
+        transaction that is rolled back. When `budget` seconds run out the
+        running query is interrupted and the remaining datasets are left
+        unchecked. Returns (datasets checked, mismatch found, query error).
+        """
+        started = time.perf_counter()
+        checked = 0
+        conn = None
+        try:
+            metrics.EXECUTOR_ACTIVE_WORKERS.inc()
+            conn = self._acquire_connection()
+            with self._interrupt_after(conn, budget):
+                self._setup_schema(conn, {}, plan["ddl"])
+                for test_case, expected in zip(plan["test_cases"], expected_outputs):
+                    if time.perf_counter() - started >= budget:
+                        break
+                    try:
+                        conn.begin()
+                        self._load_inserts(conn, test_case["inserts"])
+                        try:
+                            self._run_query(conn, query)
+                            actual = self._fetch_result(conn)
+                        except duckdb.InterruptException:
+                            break
+                        except Exception as e:
+                            return checked + 1, True, str(e)
+                    finally:
+                        try:
+                            conn.rollback()
+                        except Exception:
+                            pass
+                    checked += 1
+                    if not self._compare_results(expected, actual):
+                        return checked, True, None
+                return checked, False, None
+
+        except Exception:
+            # Fixture problems are ours, not the query's
+            return checked, False, None
+
+        finally:
+            if conn is not None:
+                self._release_connection(conn, query)
+            metrics.EXECUTOR_ACTIVE_WORKERS.dec()
+            self._record_test(time.perf_counter() - started)
+
+    async def execute_hidden(
+        self,
+        query: str,
+        plan: dict,
+        expected_outputs: List[List[Dict[str, Any]]],
+        budget: float,
+    ) -> Tuple[int, bool, Optional[str]]:
+        """Check a query against hidden datasets in a single worker job.
+
+        Runs as a follow-up of an already admitted submission, so it is never
+        rejected.
+        """
+        self._admit(None, 1)
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                self.executor,
+                self._execute_hidden,
+                query,
+                plan,
+                expected_outputs,
+                budget,
+            )
+        finally:
+            self._release(None, 1)
+
+    def execute_batch(
+        self,
+        queries: List[str],
+        schema_definition: dict,
+        test_cases: List[dict],
+        plan: Optional[dict] = None,
+        user_id: Optional[int] = None,
+    ) -> AsyncIterator[Tuple[int, List[dict], float]]:
+        """Grade many queries against one challenge, building each fixture once.
+
+        Admission happens immediately (so rejection can be turned into an
+        HTTP error) and is charged one test per query and test case; the work
+        starts right away and the returned iterator yields (query index, test
+        results, seconds since start) as soon as a query has been run on every
+        test case. Queries failing the static pre-check are answered without
+        touching a fixture. Leaving the iterator early cancels the work.
+        """
+        cost = len(queries) * len(test_cases)
+        self._admit(user_id, cost)
+        loop = asyncio.get_running_loop()
+        start_time = time.perf_counter()
+
+        results: List[List[Optional[dict]]] = [[None] * len(test_cases) for _ in queries]
+        remaining = [len(test_cases)] * len(queries)
+        ready: asyncio.Queue = asyncio.Queue()
+
+        def on_result(test_index: int, query_index: int, result: dict):
+            results[query_index][test_index] = result
+            remaining[query_index] -= 1
+            if remaining[query_index] == 0:
+                ready.put_nowait(query_index)
+
+        def reporter(
+            test_index: int, indexes: List[int]
+        ) -> Callable[[int, dict], None]:
+            return lambda position, result: loop.call_soon_threadsafe(
+                on_result, test_index, indexes[position], result
+            )
+
+        def precheck() -> List[Optional[str]]:
+            try:
+                return [
+                    self.check_query(query, schema_definition, plan) for query in queries
+                ]
+            except Exception:
+                return [None] * len(queries)
+
+        async def run():
+            if not test_cases:
+                for index in range(len(queries)):
+                    ready.put_nowait(index)
+                return
+
+            errors = await loop.run_in_executor(None, precheck)
+            indexes = []
+            for index, error in enumerate(errors):
+                if error is None:
+                    indexes.append(index)
+                    continue
+                results[index] = [
+                    self._error_result(test_case, error) for test_case in test_cases
+                ]
+                remaining[index] = 0
+                ready.put_nowait(index)
+
+            if not indexes:
+                return
+
+            valid = [queries[index] for index in indexes]
+            await asyncio.gather(
+                *[
+                    loop.run_in_executor(
+                        self.executor,
+                        self._execute_batch_test,
+                        valid,
+                        schema_definition,
+                        test_case,
+                        *self._plan_fixture(plan, i),
+                        reporter(i, indexes),
+                    )
+                    for i, test_case in enumerate(test_cases)
+                ]
+            )
+
+        task = asyncio.ensure_future(run())
+        # Releases however the work ends: even a task cancelled before its
+        # first step, or one whose iterator was never started
+        task.add_done_callback(lambda _: self._release(user_id, cost))
+
+        async def collect():
+            try:
+                for _ in queries:
+                    index = await ready.get()
+                    yield index, results[index], time.perf_counter() - start_time
+                await task
+            finally:
+                # The consumer went away (e.g. the client disconnected)
+                task.cancel()
+
+        return collect()
+
+    def _sample_loader(
+        self,
+        schema_definition: dict,
+        sample_data: Dict[str, List[Dict[str, Any]]],
+        ddl: Optional[List[str]],
+    ) -> Callable[[duckdb.DuckDBPyConnection], None]:
+        def load(conn: duckdb.DuckDBPyConnection):
+            self._setup_schema(conn, schema_definition, ddl)
+            self._insert_data(conn, sample_data or {})
+
+        return load
+
+    def _run_sample(
+        self,
+        fixture_key: str,
+        query: str,
+        schema_definition: dict,
+        sample_data: Dict[str, List[Dict[str, Any]]],
+        ddl: Optional[List[str]],
+        max_rows: int,
+    ) -> dict:
+        started = time.perf_counter()
+        conn = None
+        try:
+            metrics.EXECUTOR_ACTIVE_WORKERS.inc()
+            conn = self.samples.cursor(
+                fixture_key, self._sample_loader(schema_definition, sample_data, ddl)
+            )
+            # The fixture is shared, so nothing a query does may outlive it
+            conn.begin()
+            conn.execute(query)
+            columns = [desc[0] for desc in conn.description or []]
+            rows = conn.fetchmany(max_rows + 1)
             return {
-                "test_name": test_case["name"],
-                "passed": False,
-                "expected": test_case["expected_output"],
-                "actual": None,
-                "error": str(e),
+                "columns": columns,
+                "rows": self._normalize_result(
+                    [dict(zip(columns, row)) for row in rows[:max_rows]]
+                ),
+                "truncated": len(rows) > max_rows,
+                "error": None,
             }
+        except Exception as e:
+            return {"columns": [], "rows": [], "truncated": False, "error": str(e)}
+        finally:
+            if conn is not None:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+                conn.close()
+            metrics.EXECUTOR_ACTIVE_WORKERS.dec()
+            self._record_test(time.perf_counter() - started)
+
+    async def run_sample(
+        self,
+        fixture_key: str,
+        query: str,
+        schema_definition: dict,
+        sample_data: Dict[str, List[Dict[str, Any]]],
+        plan: Optional[dict] = None,
+        max_rows: int = settings.SAMPLE_RUN_MAX_ROWS,
+        user_id: Optional[int] = None,
+    ) -> Tuple[dict, float]:
+        """Run a query on the challenge's sample data only, without grading.
+
+        `fixture_key` identifies the challenge version; its sample fixture is
+        built on first use and reused until evicted.
+        """
+        start_time = time.perf_counter()
+        error = await asyncio.to_thread(self.check_query, query, schema_definition, plan)
+        if error:
+            result = {"columns": [], "rows": [], "truncated": False, "error": error}
+            return result, time.perf_counter() - start_time
 
+        self._admit(user_id, 1)
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                self.executor,
+                self._run_sample,
+                fixture_key,
+                query,
+                schema_definition,
+                sample_data,
+                plan["ddl"] if plan else None,
+                max_rows,
+            )
+            return result, time.perf_counter() - start_time
         finally:
-            conn.close()
+            self._release(user_id, 1)
+
+    @staticmethod
+    def _plan_tree(node: dict) -> Dict[str, Any]:
+        """Operator tree for the frontend; profiled nodes carry timings."""
+        details = dict(node.get("extra_info") or {})
+        estimated = details.pop("Estimated Cardinality", None)
+        timing = node.get("operator_timing")
+        return {
+            "operator": node.get("operator_name") or node.get("name"),
+            "timing_ms": None if timing is None else round(timing * 1000, 3),
+            "cardinality": node.get("operator_cardinality"),
+            "estimated_cardinality": int(estimated) if str(estimated).isdigit() else None,
+            "rows_scanned": node.get("operator_rows_scanned"),
+            "details": details,
+            "children": [SQLExecutor._plan_tree(child) for child in node.get("children") or []],
+        }
+
+    def _explain_sample(
+        self,
+        fixture_key: str,
+        query: str,
+        schema_definition: dict,
+        sample_data: Dict[str, List[Dict[str, Any]]],
+        ddl: Optional[List[str]],
+        analyze: bool,
+        timeout: float,
+    ) -> dict:
+        started = time.perf_counter()
+        conn = None
+        try:
+            metrics.EXECUTOR_ACTIVE_WORKERS.inc()
+            conn = self.samples.cursor(
+                fixture_key, self._sample_loader(schema_definition, sample_data, ddl)
+            )
+            conn.begin()
+            with self._interrupt_after(conn, timeout):
+                if not analyze:
+                    rows = conn.execute(f"EXPLAIN (FORMAT JSON) {query}").fetchall()
+                    nodes = json.loads(rows[0][1]) if rows else []
+                    return {
+                        "plan": self._plan_tree(nodes[0]) if nodes else None,
+                        "error": None,
+                    }
+
+                profile = self._profile_query(conn, query)
+                root = profile
+                # Skip the query node and the EXPLAIN ANALYZE operator above the plan
+                while root is not None and root.get("operator_type") in (
+                    None,
+                    "EXPLAIN_ANALYZE",
+                ):
+                    children = root.get("children") or []
+                    root = children[0] if children else None
+                return {
+                    "plan": self._plan_tree(root) if root is not None else None,
+                    "total_ms": round((profile.get("latency") or 0) * 1000, 3),
+                    "rows_scanned": profile.get("cumulative_rows_scanned"),
+                    "peak_memory": profile.get("system_peak_buffer_memory"),
+                    "error": None,
+                }
+        except duckdb.InterruptException:
+            return {"plan": None, "error": f"Превышено время выполнения ({timeout:g} с)"}
+        except Exception as e:
+            return {"plan": None, "error": str(e)}
+        finally:
+            if conn is not None:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+                conn.close()
+            metrics.EXECUTOR_ACTIVE_WORKERS.dec()
+            self._record_test(time.perf_counter() - started)
+
+    async def explain_sample(
+        self,
+        fixture_key: str,
+        query: str,
+        schema_definition: dict,
+        sample_data: Dict[str, List[Dict[str, Any]]],
+        plan: Optional[dict] = None,
+        analyze: bool = True,
+        user_id: Optional[int] = None,
+    ) -> Tuple[dict, bool]:
+        """Physical plan of a query on the sample data, as (result, cached).
+
+        With `analyze` the query is run under EXPLAIN ANALYZE and every
+        operator carries its timing and cardinality. Successful plans are
+        cached per challenge version and normalized query text.
+        """
+        if self.analyzer is not None:
+            normalized = await asyncio.to_thread(self.analyzer.normalize, query)
+        else:
+            normalized = " ".join(query.split())
+        cache_key = (fixture_key, normalized, analyze)
+        with self._explain_lock:
+            cached = self._explains.get(cache_key)
+            if cached is not None:
+                self._explains.move_to_end(cache_key)
+        metrics.CACHE_REQUESTS.inc(1, "explain", "miss" if cached is None else "hit")
+        if cached is not None:
+            return cached, True
+
+        error = await asyncio.to_thread(self.check_query, query, schema_definition, plan)
+        if error:
+            return {"plan": None, "error": error}, False
+
+        self._admit(user_id, 1)
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                self.executor,
+                self._explain_sample,
+                fixture_key,
+                query,
+                schema_definition,
+                sample_data,
+                plan["ddl"] if plan else None,
+                analyze,
+                settings.EXPLAIN_TIMEOUT,
+            )
+        finally:
+            self._release(user_id, 1)
+
+        if result["error"] is None:
+            with self._explain_lock:
+                self._explains[cache_key] = result
+                while len(self._explains) > settings.EXPLAIN_CACHE_SIZE:
+                    self._explains.popitem(last=False)
+        return result, False
+
+    def summarize_timings(self, test_results: List[dict]) -> Dict[str, Dict[str, float]]:
+        """Total and max milliseconds per stage across all tests."""
+        summary: Dict[str, Dict[str, float]] = {}
+        for result in test_results:
+            for stage, ms in (result.get("timings") or {}).items():
+                entry = summary.setdefault(stage, {"total_ms": 0.0, "max_ms": 0.0})
+                entry["total_ms"] = round(entry["total_ms"] + ms, 3)
+                entry["max_ms"] = round(max(entry["max_ms"], ms), 3)
+        return summary
+
+    def _compute_output(
+        self,
+        query: str,
+        schema_definition: dict,
+        input_data: Dict[str, List[Dict[str, Any]]],
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+        started = time.perf_counter()
+        conn = None
+        try:
+            metrics.EXECUTOR_ACTIVE_WORKERS.inc()
+            conn = self._acquire_connection()
+            self._setup_schema(conn, schema_definition)
+            self._insert_data(conn, input_data or {})
+            return self._normalize_result(self._execute_query(conn, query)), None
+        except Exception as e:
+            return None, str(e)
+        finally:
+            if conn is not None:
+                self._release_connection(conn, query)
+            metrics.EXECUTOR_ACTIVE_WORKERS.dec()
+            self._record_test(time.perf_counter() - started)
+
+    async def compute_outputs(
+        self,
+        query: str,
+        schema_definition: dict,
+        datasets: List[Dict[str, List[Dict[str, Any]]]],
+    ) -> List[Tuple[Optional[List[Dict[str, Any]]], Optional[str]]]:
+        """Run a reference query on each dataset and return (rows, error) pairs.
+
+        Rows are normalized the same way graded results are, so they can be
+        stored as expected_output directly.
+        """
+        error = await asyncio.to_thread(self.check_query, query, schema_definition)
+        if error:
+            return [(None, error)] * len(datasets)
+
+        self._admit(None, len(datasets))
+        loop = asyncio.get_running_loop()
+        try:
+            return await asyncio.gather(
+                *[
+                    loop.run_in_executor(
+                        self.executor,
+                        self._compute_output,
+                        query,
+                        schema_definition,
+                        input_data,
+                    )
+                    for input_data in datasets
+                ]
+            )
+        finally:
+            self._release(None, len(datasets))
+
+    def _compute_dataset_output(
+        self,
+        query: str,
+        column_types: Dict[str, Dict[str, str]],
+        key: str,
+        max_rows: int,
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+        started = time.perf_counter()
+        conn = None
+        try:
+            metrics.EXECUTOR_ACTIVE_WORKERS.inc()
+            conn = self._acquire_connection()
+            for view in dataset_views(key, column_types):
+                conn.execute(view)
+            self._run_query(conn, query)
+            rows = self._fetch_result(conn, max_rows + 1)
+            if len(rows) > max_rows:
+                return None, f"решение возвращает больше {max_rows} строк"
+            return self._normalize_result(rows), None
+        except Exception as e:
+            return None, str(e)
+        finally:
+            if conn is not None:
+                self._release_connection(conn, query)
+            metrics.EXECUTOR_ACTIVE_WORKERS.dec()
+            self._record_test(time.perf_counter() - started)
+
+    async def compute_dataset_output(
+        self,
+        query: str,
+        schema_definition: dict,
+        key: str,
+        max_rows: int = settings.DATASET_OUTPUT_MAX_ROWS,
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+        """Run a reference query on a built dataset; (rows, error) like
+        compute_outputs, with an error if it returns more than `max_rows` rows."""
+        self._admit(None, 1)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor,
+                self._compute_dataset_output,
+                query,
+                schema_column_types(schema_definition),
+                key,
+                max_rows,
+            )
+        finally:
+            self._release(None, 1)
+
+    def _benchmark_fixture(self, test_cases: List[dict]) -> int:
+        """Index of the test case with the most data: a large dataset if any."""
+
+        def size(index: int) -> Tuple[bool, int]:
+            test_case = test_cases[index]
+            rows = sum(len(table) for table in (test_case.get("input_data") or {}).values())
+            return bool(test_case.get("dataset")), rows
+
+        return max(range(len(test_cases)), key=size)
+
+    @staticmethod
+    def _summarize_profile(profile: Any) -> Dict[str, Any]:
+        operators = []
+
+        def walk(node: dict):
+            if node.get("operator_type") not in (None, "EXPLAIN_ANALYZE"):
+                operators.append(
+                    {
+                        "operator": node.get("operator_name"),
+                        "timing_ms": round((node.get("operator_timing") or 0) * 1000, 3),
+                        "rows": node.get("operator_cardinality"),
+                        "rows_scanned": node.get("operator_rows_scanned"),
+                    }
+                )
+            for child in node.get("children") or []:
+                walk(child)
+
+        if not isinstance(profile, dict):
+            return {"operators": []}
+        walk(profile)
+        return {
+            "rows_scanned": profile.get("cumulative_rows_scanned"),
+            "peak_memory": profile.get("system_peak_buffer_memory"),
+            "cpu_ms": round((profile.get("cpu_time") or 0) * 1000, 3),
+            "operators": operators,
+        }
+
+    @staticmethod
+    def _robust_timing(samples: List[float]) -> Dict[str, Any]:
+        """Mean of the samples left after dropping those more than three
+        scaled MADs from the median (the usual noisy-neighbour spikes)."""
+        median = statistics.median(samples)
+        mad = statistics.median(abs(x - median) for x in samples) * 1.4826
+        kept = [x for x in samples if mad == 0 or abs(x - median) <= 3 * mad]
+        return {
+            "mean_ms": round(statistics.fmean(kept) * 1000, 3),
+            "median_ms": round(median * 1000, 3),
+            "mad_ms": round(mad * 1000, 3),
+            "runs": len(kept),
+            "rejected": len(samples) - len(kept),
+        }
+
+    def _run_benchmark(
+        self,
+        queries: List[str],
+        schema_definition: dict,
+        test_case: dict,
+        ddl: Optional[List[str]],
+        inserts: Optional[List[dict]],
+        runs: int,
+        warmup: int,
+        budget: float,
+    ) -> List[Dict[str, Any]]:
+        """Time several queries on one fixture.
+
+        Rounds run every query once, in an order that rotates each round, so
+        slow drifts in machine load hit all of them alike. Rounds after the
+        third stop once `budget` seconds are spent, and whatever is still
+        running when they are is interrupted. Raises if a query fails or
+        does not finish in time.
+        """
+        started = time.perf_counter()
+        conn = None
+        try:
+            metrics.EXECUTOR_ACTIVE_WORKERS.inc()
+            conn = self._acquire_connection()
+            with self._interrupt_after(conn, budget):
+                self._setup_schema(conn, schema_definition, ddl)
+                if inserts is None:
+                    self._insert_data(conn, test_case["input_data"])
+                else:
+                    self._load_inserts(conn, inserts)
+
+                for query in queries:
+                    for _ in range(warmup):
+                        self._execute_query(conn, query)
+
+                samples: List[List[float]] = [[] for _ in queries]
+                for round_index in range(runs):
+                    if round_index >= 3 and time.perf_counter() - started > budget:
+                        break
+                    for offset in range(len(queries)):
+                        index = (round_index + offset) % len(queries)
+                        mark = time.perf_counter()
+                        self._execute_query(conn, queries[index])
+                        samples[index].append(time.perf_counter() - mark)
+
+                return [
+                    {
+                        **self._robust_timing(query_samples),
+                        **self._summarize_profile(self._profile_query(conn, query)),
+                    }
+                    for query, query_samples in zip(queries, samples)
+                ]
+        finally:
+            if conn is not None:
+                self._release_connection(conn, "\n".join(queries))
+            metrics.EXECUTOR_ACTIVE_WORKERS.dec()
+            self._record_test(time.perf_counter() - started)
+
+    async def benchmark(
+        self,
+        query: str,
+        reference_query: str,
+        schema_definition: dict,
+        test_cases: List[dict],
+        plan: Optional[dict] = None,
+        runs: int = settings.EFFICIENCY_RUNS,
+        warmup: int = settings.EFFICIENCY_WARMUP,
+        budget: float = settings.EFFICIENCY_BUDGET,
+        tolerance: float = settings.EFFICIENCY_TOLERANCE,
+    ) -> Optional[Dict[str, Any]]:
+        """Compare a query's speed with the reference on the largest fixture.
+
+        score is reference time over query time (above 1 means faster). The
+        verdict is "comparable" when the difference is within `tolerance` or
+        within the measured noise of either side. None if a query fails or
+        runs out of budget, or the queue is full.
+        """
+        if not test_cases:
+            return None
+        index = self._benchmark_fixture(test_cases)
+        # Grading already succeeded: under load only the verdict is dropped,
+        # since admission never turns internal callers away
+        if (
+            self._pending_tests + 1 > self.max_queued_tests
+            or self.estimated_wait() > self.max_wait_seconds
+        ):
+            return None
+        self._admit(None, 1)
+        loop = asyncio.get_running_loop()
+        try:
+            student, reference = await loop.run_in_executor(
+                self.executor,
+                self._run_benchmark,
+                [query, reference_query],
+                schema_definition,
+                test_cases[index],
+                *self._plan_fixture(plan, index),
+                runs,
+                warmup,
+                budget,
+            )
+        except Exception:
+            return None
+        finally:
+            self._release(None, 1)
+
+        score = reference["mean_ms"] / max(student["mean_ms"], 1e-3)
+        noise = 2 * max(student["mad_ms"], reference["mad_ms"])
+        difference = student["mean_ms"] - reference["mean_ms"]
+        if abs(score - 1) <= tolerance or abs(difference) <= noise:
+            verdict = "comparable"
+        else:
+            verdict = "faster" if difference < 0 else "slower"
+        metrics.EXECUTOR_EFFICIENCY_VERDICTS.inc(1, verdict)
+
+        return {
+            "score": round(score, 3),
+            "verdict": verdict,
+            "fixture": test_cases[index]["name"],
+            "query": student,
+            "solution": reference,
+        }
+
+    def _skipped_result(self, test_case: dict) -> dict:
+        return {
+            "test_name": test_case["name"],
+            "passed": False,
+            "expected": test_case["expected_output"],
+            "actual": None,
+            "error": None,
+            "skipped": True,
+        }
+
+    async def _run_fail_fast(
+        self,
+        query: str,
+        schema_definition: dict,
+        test_cases: List[dict],
+        plan: Optional[dict],
+        profile: bool,
+        order: List[int],
+    ) -> List[dict]:
+        """Run the test most likely to fail alone, then the rest in parallel,
+        skipping whatever has not started once any test fails."""
+        loop = asyncio.get_running_loop()
+        results: List[Optional[dict]] = [None] * len(test_cases)
+
+        def submit(i: int):
+            return self.executor.submit(
+                self._execute_single_test,
+                query,
+                schema_definition,
+                test_cases[i],
+                *self._plan_fixture(plan, i),
+                time.perf_counter_ns(),
+                profile,
+            )
+
+        first, rest = order[0], order[1:]
+        results[first] = await asyncio.wrap_future(submit(first), loop=loop)
+
+        jobs = {}
+        if results[first]["passed"] and rest:
+            jobs = {i: submit(i) for i in rest}
+            pending = {asyncio.wrap_future(job, loop=loop): i for i, job in jobs.items()}
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                failed = False
+                for future in done:
+                    i = pending.pop(future)
+                    results[i] = future.result()
+                    failed = failed or not results[i]["passed"]
+                if failed:
+                    break
+
+        for i, test_case in enumerate(test_cases):
+            if results[i] is not None:
+                continue
+            job = jobs.get(i)
+            if job is not None and job.done() and not job.cancelled():
+                results[i] = job.result()
+                continue
+            # Jobs already running finish on their own
+            if job is None or job.cancel():
+                metrics.EXECUTOR_SKIPPED_TESTS.inc()
+            results[i] = self._skipped_result(test_case)
+        return results
 
     async def execute_and_test(
-        self, query: str, schema_definition: dict, test_cases: List[dict]
+        self,
+        query: str,
+        schema_definition: dict,
+        test_cases: List[dict],
+        plan: Optional[dict] = None,
+        profile: bool = False,
+        user_id: Optional[int] = None,
+        fail_fast: bool = False,
+        order: Optional[List[int]] = None,
     ) -> Tuple[List[dict], float, str]:
-        start_time = time.time()
+        """Run every test case in the worker pool.
+
+        With a user_id the submission goes through admission control and may
+        raise AdmissionRejected; internal callers pass None and are never
+        rejected, but still count towards the queue. With fail_fast, tests
+        run in `order` and stop at the first failure; the rest are returned
+        with skipped=True.
+        """
+        start_time = time.perf_counter()
+        error = await asyncio.to_thread(self.check_query, query, schema_definition, plan)
+        if error:
+            test_results = [
+                self._error_result(test_case, error) for test_case in test_cases
+            ]
+            return test_results, time.perf_counter() - start_time, None
+
+        self._admit(user_id, len(test_cases))
 
         try:
+            if fail_fast and test_cases:
+                test_results = await self._run_fail_fast(
+                    query,
+                    schema_definition,
+                    test_cases,
+                    plan,
+                    profile,
+                    order or list(range(len(test_cases))),
+                )
+                return test_results, time.perf_counter() - start_time, None
+
             loop = asyncio.get_event_loop()
             tasks = [
                 loop.run_in_executor(
@@ -158,18 +1711,29 @@ class SQLExecutor:
                     query,
                     schema_definition,
                     test_case,
+                    *self._plan_fixture(plan, i),
+                    time.perf_counter_ns(),
+                    profile,
                 )
-                for test_case in test_cases
+                for i, test_case in enumerate(test_cases)
             ]
 
             test_results = await asyncio.gather(*tasks)
 
-            execution_time = time.time() - start_time
+            execution_time = time.perf_counter() - start_time
             return list(test_results), execution_time, None
 
         except Exception as e:
-            execution_time = time.time() - start_time
+            execution_time = time.perf_counter() - start_time
             return [], execution_time, str(e)
 
+        finally:
+            self._release(user_id, len(test_cases))
+
 
 executor = SQLExecutor()
+
+metrics.EXECUTOR_QUEUE_DEPTH.set_function(lambda: executor.executor.waiting())
+metrics.EXECUTOR_ESTIMATED_WAIT.set_function(executor.estimated_wait)
+metrics.EXECUTOR_POOL_WORKERS.set_function(lambda: executor.max_workers)
+metrics.DUCKDB_THREADS.set_function(lambda: executor.duckdb_threads)
@@ -0,0 +1,252 @@
+"""Maintenance for the month-partitioned submissions table (Postgres only).
+
+    python -m app.services.submission_partitions create
+    python -m app.services.submission_partitions archive
+
+Archived months are written as hive-partitioned Parquet and can be queried
+with DuckDB:
+
+    SELECT * FROM read_parquet('archive/submissions/*/*.parquet',
+                               hive_partitioning = true)
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+from datetime import date, datetime
+from typing import List, Optional
+
+import duckdb
+from sqlalchemy import Float, Integer, DateTime, JSON, text
+
+from app.config import settings
+from app.database import engine
+from app.models import Submission
+
+PARTITION_NAME = re.compile(r"^submissions_y(\d{4})m(\d{2})$")
+DEFAULT_PARTITION = "submissions_default"
+
+DUCKDB_TYPES = {
+    Integer: "BIGINT",
+    Float: "DOUBLE",
+    DateTime: "TIMESTAMP",
+    JSON: "JSON",
+}
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _partition_name(month: date) -> str:
+    return f"submissions_y{month.year:04d}m{month.month:02d}"
+
+
+def _duckdb_type(column) -> str:
+    for sa_type, duckdb_type in DUCKDB_TYPES.items():
+        if isinstance(column.type, sa_type):
+            return duckdb_type
+    return "VARCHAR"
+
+
+def list_partitions(conn) -> List[date]:
+    rows = conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = 'submissions'"
+        )
+    ).all()
+
+    months = []
+    for (name,) in rows:
+        match = PARTITION_NAME.match(name)
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+def _default_months(conn) -> List[date]:
+    """Months with rows in the default partition, i.e. without their own."""
+    if conn.execute(text(f"SELECT to_regclass('{DEFAULT_PARTITION}')")).scalar() is None:
+        return []
+    rows = conn.execute(
+        text(
+            f"SELECT DISTINCT date_trunc('month', submitted_at)::date "
+            f"FROM {DEFAULT_PARTITION}"
+        )
+    ).scalars()
+    return list(rows)
+
+
+def _attach_month(conn, month: date, from_default: bool):
+    """Create a month partition, first moving its rows out of the default one.
+
+    Postgres refuses to add a partition while the default partition holds rows
+    in its range, so the table is filled while detached and attached after.
+    """
+    name = _partition_name(month)
+    lower, upper = month.isoformat(), _add_months(month, 1).isoformat()
+    if not from_default:
+        conn.execute(
+            text(
+                f"CREATE TABLE {name} PARTITION OF submissions "
+                f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+            )
+        )
+        return
+
+    # Keep writers out of the default partition until the rows have moved
+    conn.execute(text(f"LOCK TABLE {DEFAULT_PARTITION} IN EXCLUSIVE MODE"))
+    conn.execute(text(f"CREATE TABLE {name} (LIKE submissions INCLUDING DEFAULTS)"))
+    conn.execute(
+        text(
+            f"WITH moved AS ("
+            f"DELETE FROM {DEFAULT_PARTITION} "
+            f"WHERE submitted_at >= :lower AND submitted_at < :upper RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ),
+        {"lower": lower, "upper": upper},
+    )
+    conn.execute(
+        text(
+            f"ALTER TABLE submissions ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+        )
+    )
+
+
+def create_partitions(months_ahead: int = settings.SUBMISSIONS_PARTITIONS_AHEAD) -> List[str]:
+    """Create monthly partitions from the current month up to `months_ahead`,
+    plus any month whose rows fell into the default partition."""
+    this_month = datetime.utcnow().date().replace(day=1)
+    created = []
+
+    with engine.connect() as conn:
+        existing = set(list_partitions(conn))
+        stranded = set(_default_months(conn))
+
+    months = {_add_months(this_month, offset) for offset in range(months_ahead + 1)}
+    for month in sorted((months | stranded) - existing):
+        with engine.begin() as conn:
+            _attach_month(conn, month, month in stranded)
+        created.append(_partition_name(month))
+
+    return created
+
+
+def _export_partition(conn, month: date, archive_dir: str) -> str:
+    name = _partition_name(month)
+    columns = list(Submission.__table__.columns)
+    column_names = [column.name for column in columns]
+
+    target_dir = os.path.join(archive_dir, f"month={month.strftime('%Y-%m')}")
+    os.makedirs(target_dir, exist_ok=True)
+    target = os.path.join(target_dir, f"{name}.parquet")
+
+    result = conn.execute(
+        text(f"SELECT {', '.join(column_names)} FROM {name} ORDER BY id")
+    )
+
+    duck = duckdb.connect(":memory:")
+    try:
+        column_defs = ", ".join(
+            f"{column.name} {_duckdb_type(column)}" for column in columns
+        )
+        duck.execute(f"CREATE TABLE archive ({column_defs})")
+        placeholders = ", ".join("?" for _ in columns)
+        json_columns = [
+            i for i, column in enumerate(columns) if isinstance(column.type, JSON)
+        ]
+
+        while True:
+            chunk = result.fetchmany(5000)
+            if not chunk:
+                break
+            rows = []
+            for row in chunk:
+                values = list(row)
+                for i in json_columns:
+                    if values[i] is not None:
+                        values[i] = json.dumps(values[i], ensure_ascii=False)
+                rows.append(values)
+            duck.executemany(f"INSERT INTO archive VALUES ({placeholders})", rows)
+
+        duck.execute(f"COPY archive TO '{target}' (FORMAT PARQUET, COMPRESSION ZSTD)")
+    finally:
+        duck.close()
+
+    return target
+
+
+def archive_partitions(
+    retention_months: int = settings.SUBMISSIONS_RETENTION_MONTHS,
+    archive_dir: str = settings.SUBMISSIONS_ARCHIVE_DIR,
+    dry_run: bool = False,
+) -> List[str]:
+    """Move partitions older than the retention window into Parquet files."""
+    this_month = datetime.utcnow().date().replace(day=1)
+    cutoff = _add_months(this_month, -retention_months)
+    archived = []
+
+    with engine.connect() as conn:
+        months = [month for month in list_partitions(conn) if month < cutoff]
+
+    for month in months:
+        name = _partition_name(month)
+        if dry_run:
+            archived.append(name)
+            continue
+
+        with engine.begin() as conn:
+            target = _export_partition(conn, month, archive_dir)
+            conn.execute(text(f"ALTER TABLE submissions DETACH PARTITION {name}"))
+            conn.execute(text(f"DROP TABLE {name}"))
+        logging.info(f"Archived {name} to {target}")
+        archived.append(name)
+
+    return archived
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Submissions partition maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    create_parser = subparsers.add_parser("create", help="create future partitions")
+    create_parser.add_argument(
+        "--months-ahead", type=int, default=settings.SUBMISSIONS_PARTITIONS_AHEAD
+    )
+
+    archive_parser = subparsers.add_parser(
+        "archive", help="move old partitions to Parquet"
+    )
+    archive_parser.add_argument(
+        "--retention-months", type=int, default=settings.SUBMISSIONS_RETENTION_MONTHS
+    )
+    archive_parser.add_argument(
+        "--archive-dir", default=settings.SUBMISSIONS_ARCHIVE_DIR
+    )
+    archive_parser.add_argument("--dry-run", action="store_true")
+
+    args = parser.parse_args(argv)
+
+    if engine.dialect.name != "postgresql":
+        print("Partition maintenance requires PostgreSQL, nothing to do")
+        return
+
+    if args.command == "create":
+        for name in create_partitions(args.months_ahead):
+            print(f"Created {name}")
+    elif args.command == "archive":
+        for name in archive_partitions(
+            args.retention_months, args.archive_dir, args.dry_run
+        ):
+            print(f"Archived {name}")
+
+
+if __name__ == "__main__":
+    main()
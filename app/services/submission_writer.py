@@ -0,0 +1,177 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import Submission
+from app.services import metrics
+
+
+class SubmissionWriter:
+    """Write-behind queue that batches Submission inserts off the request path."""
+
+    def __init__(
+        self,
+        batch_size: int = settings.SUBMISSION_BATCH_SIZE,
+        flush_interval: float = settings.SUBMISSION_FLUSH_INTERVAL,
+        max_queue_size: int = settings.SUBMISSION_QUEUE_SIZE,
+        retries: int = settings.SUBMISSION_WRITE_RETRIES,
+        retry_backoff: float = settings.SUBMISSION_RETRY_BACKOFF,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue_size = max_queue_size
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self._queue: Optional[asyncio.Queue] = None
+        # Rows whose flush failed; written ahead of the queue on the next batch
+        self._retry: List[Dict[str, Any]] = []
+        self._closing = False
+        self._task: Optional[asyncio.Task] = None
+        self._writes: Set[asyncio.Task] = set()
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Drain everything still queued, then stop the background flusher."""
+        if self._writes:
+            await asyncio.gather(*self._writes)
+        if self._task is None:
+            return
+        # The flag stops a loop busy with retried rows, the sentinel one
+        # waiting on an empty queue
+        self._closing = True
+        if not self._queue.full():
+            self._queue.put_nowait(None)
+        await self._task
+        self._task = None
+        self._queue = None
+
+    async def enqueue(self, **values: Any):
+        """Queue a submission row. Blocks only when the queue is full (back-pressure)."""
+        values.setdefault("submitted_at", datetime.utcnow())
+        if self._queue is None:
+            await asyncio.to_thread(self._write_batch, [values])
+            return
+        await self._queue.put(values)
+
+    def persist(self, rows: List[Dict[str, Any]]) -> asyncio.Task:
+        """Write rows as one batch in a task of their own, so the write
+        finishes even if the caller is cancelled (e.g. a client disconnect).
+        Failures are retried like queued rows; await the task to wait for it."""
+        now = datetime.utcnow()
+        for row in rows:
+            row.setdefault("submitted_at", now)
+        task = asyncio.create_task(self._flush(rows))
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+        return task
+
+    def _write_batch(self, rows: List[Dict[str, Any]]):
+        db = SessionLocal()
+        try:
+            db.execute(insert(Submission), rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _drop(self, rows: List[Dict[str, Any]], reason: str, error: Any):
+        metrics.SUBMISSION_DROPPED.inc(len(rows), reason)
+        logging.error(f"Dropped {len(rows)} submissions ({reason}): {error}")
+
+    async def _flush(self, rows: List[Dict[str, Any]]):
+        """Write a batch, retrying with backoff; rows that still fail are kept
+        for the next batch, except rows the database rejects outright."""
+        if not rows:
+            return
+        error: Optional[Exception] = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await asyncio.sleep(self.retry_backoff * 2 ** (attempt - 1))
+            try:
+                await asyncio.to_thread(self._write_batch, rows)
+                return
+            except (IntegrityError, DataError) as e:
+                # Retrying cannot help; write rows one by one so only the bad
+                # ones are lost
+                if len(rows) == 1:
+                    self._drop(rows, "invalid", e)
+                    return
+                for row in rows:
+                    await self._flush([row])
+                return
+            except Exception as e:
+                error = e
+
+        logging.warning(f"Failed to write {len(rows)} submissions, will retry: {error}")
+        room = max(0, self.max_queue_size - len(self._retry))
+        self._retry.extend(rows[:room])
+        if len(rows) > room:
+            self._drop(rows[room:], "overflow", error)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping and not self._closing:
+            batch = self._retry[: self.batch_size]
+            del self._retry[: len(batch)]
+            if not batch:
+                item = await self._queue.get()
+                if item is None:
+                    break
+                batch.append(item)
+
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            # While this flush is in flight the queue keeps filling; once it is
+            # full, enqueue() waits, which is the back-pressure on slow commits.
+            await self._flush(batch)
+
+        remaining, self._retry = self._retry, []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not None:
+                remaining.append(item)
+        for start in range(0, len(remaining), self.batch_size):
+            await self._flush(remaining[start : start + self.batch_size])
+            if self._retry:
+                # The database is still failing; do not wait out every chunk
+                self._retry.extend(remaining[start + self.batch_size :])
+                break
+        if self._retry:
+            self._drop(self._retry, "shutdown", "database unavailable at shutdown")
+            self._retry = []
+
+
+submission_writer = SubmissionWriter()
+
+metrics.SUBMISSION_QUEUE_DEPTH.set_function(
+    lambda: len(submission_writer._retry)
+    + (submission_writer._queue.qsize() if submission_writer._queue else 0)
+)
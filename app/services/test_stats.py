@@ -0,0 +1,91 @@
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Submission
+
+
+class TestStats:
+    """Per-challenge failure rates of test cases, used to run likely failures first.
+
+    Counts are loaded from the latest stored submissions the first time a
+    challenge is graded, then kept up to date from every new result. They
+    are reloaded when the challenge version changes (its tests were edited,
+    possibly by another process) and after `ttl` seconds.
+    """
+
+    def __init__(
+        self,
+        history_limit: int = settings.TEST_STATS_HISTORY,
+        ttl: float = settings.TEST_STATS_TTL,
+    ):
+        self.history_limit = history_limit
+        self.ttl = ttl
+        # challenge id -> (version, loaded at, test name -> [runs, failures])
+        self._stats: Dict[int, Tuple[int, float, Dict[str, List[int]]]] = {}
+        self._lock = threading.Lock()
+
+    def _load(self, db: Session, challenge_id: int) -> Dict[str, List[int]]:
+        rows = (
+            db.query(Submission.test_results)
+            .filter(
+                Submission.challenge_id == challenge_id,
+                Submission.status.in_(("solved", "failed")),
+            )
+            .order_by(Submission.id.desc())
+            .limit(self.history_limit)
+            .all()
+        )
+        counts: Dict[str, List[int]] = {}
+        for (test_results,) in rows:
+            self._count(counts, test_results or [])
+        return counts
+
+    @staticmethod
+    def _count(counts: Dict[str, List[int]], test_results: List[dict]):
+        for result in test_results:
+            if result.get("skipped"):
+                continue
+            entry = counts.setdefault(result.get("test_name"), [0, 0])
+            entry[0] += 1
+            if not result.get("passed"):
+                entry[1] += 1
+
+    def order(
+        self, db: Session, challenge_id: int, version: int, test_cases: List[dict]
+    ) -> List[int]:
+        """Test indexes sorted by smoothed failure rate, highest first."""
+        with self._lock:
+            entry = self._stats.get(challenge_id)
+        if (
+            entry is None
+            or entry[0] != version
+            or time.monotonic() - entry[1] > self.ttl
+        ):
+            entry = (version, time.monotonic(), self._load(db, challenge_id))
+            with self._lock:
+                self._stats[challenge_id] = entry
+        counts = entry[2]
+
+        def failure_rate(index: int) -> float:
+            with self._lock:
+                runs, failures = counts.get(test_cases[index]["name"], (0, 0))
+            return (failures + 1) / (runs + 2)
+
+        return sorted(range(len(test_cases)), key=failure_rate, reverse=True)
+
+    def record(self, challenge_id: int, test_results: List[dict]):
+        with self._lock:
+            entry = self._stats.get(challenge_id)
+            if entry is not None:
+                self._count(entry[2], test_results)
+
+    def invalidate(self, challenge_id: int):
+        with self._lock:
+            self._stats.pop(challenge_id, None)
+
+
+test_stats = TestStats()
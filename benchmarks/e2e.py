@@ -0,0 +1,303 @@
+"""End-to-end load test for the SQL Challenge API.
+
+Runs an open-loop scenario: requests are fired at a fixed arrival rate no
+matter how fast the server answers. Latency is measured from each request's
+scheduled send time, so a stalled server shows up in the percentiles
+instead of silently lowering the load.
+
+By default the app is loaded in-process on a throwaway SQLite database with
+the `test_key` challenge stub, so no network, Groq key or Postgres is needed.
+Pass --database-url to use a local Postgres, or --base-url to target a
+running server.
+
+    python -m benchmarks.e2e --scenario mixed --rate 40 --duration 30
+    python -m benchmarks.e2e --rows 2000 --tests 10 --output bench.json --max-p99-ms 500
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from benchmarks.histogram import LatencyHistogram
+
+SCENARIOS = {
+    "mixed": {
+        "execute": 0.5,
+        "history_stats": 0.1,
+        "history_submissions": 0.1,
+        "drafts_save": 0.3,
+    },
+    "execute": {"execute": 1.0},
+    "history": {"history_stats": 0.5, "history_submissions": 0.5},
+    "drafts": {"drafts_save": 1.0},
+}
+
+QUERY_MIX = {"correct": 0.5, "wrong": 0.35, "pathological": 0.15}
+
+
+def _pick(rng: random.Random, weights: Dict[str, float]) -> str:
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def _fill_table(rng: random.Random, table: dict, rows: int, id_range: int) -> List[dict]:
+    start = date(2024, 1, 1)
+    data = []
+    for i in range(rows):
+        row = {}
+        for col in table.get("columns", []):
+            if "type" not in col:
+                continue
+            name, col_type = col["name"], col["type"].upper()
+            constraints = (col.get("constraints") or "").upper()
+            if "PRIMARY KEY" in constraints:
+                row[name] = i + 1
+            elif name.endswith("_id"):
+                row[name] = rng.randint(1, max(1, id_range))
+            elif "INT" in col_type:
+                row[name] = rng.randint(18, 80)
+            elif col_type in ("REAL", "DOUBLE", "FLOAT") or "DECIMAL" in col_type:
+                row[name] = round(rng.uniform(1, 1000), 2)
+            elif col_type == "DATE":
+                row[name] = (start + timedelta(days=rng.randint(0, 700))).isoformat()
+            else:
+                row[name] = f"{name}_{rng.randint(1, max(1, rows))}"
+        data.append(row)
+    return data
+
+
+def build_challenge(template: dict, rng: random.Random, rows: int, tests: int) -> dict:
+    """Resize the stub challenge to `rows` rows per table and `tests` test cases."""
+    from app.services.sql_executor import executor
+
+    schema = template["schema_definition"]
+    solution = template["solution_query"]
+
+    def expected(data):
+        conn = executor._create_connection()
+        try:
+            executor._setup_schema(conn, schema)
+            executor._insert_data(conn, data)
+            return executor._normalize_result(executor._execute_query(conn, solution))
+        finally:
+            conn.close()
+
+    test_cases = []
+    for t in range(tests):
+        data = {
+            table["name"]: _fill_table(rng, table, rows, rows)
+            for table in schema["tables"]
+        }
+        test_cases.append(
+            {"name": f"bench {t + 1}", "input_data": data, "expected_output": expected(data)}
+        )
+
+    challenge = dict(template)
+    challenge.update(
+        difficulty="easy",
+        topics=["benchmark"],
+        sample_data=test_cases[0]["input_data"],
+        expected_output=test_cases[0]["expected_output"],
+        test_cases=test_cases,
+    )
+    return challenge
+
+
+def build_queries(challenge: dict) -> Dict[str, List[str]]:
+    solution = challenge["solution_query"]
+    first_table = challenge["schema_definition"]["tables"][0]["name"]
+    return {
+        "correct": [solution],
+        "wrong": [
+            f"SELECT * FROM ({solution}) AS s LIMIT 1",
+            f"SELECT * FROM {first_table}",
+        ],
+        "pathological": [
+            "SELEC 1",
+            "SELECT * FROM missing_table",
+            f"SELECT COUNT(*) AS n FROM {first_table} a, {first_table} b, {first_table} c",
+        ],
+    }
+
+
+class Recorder:
+    def __init__(self):
+        self.latency: Dict[str, LatencyHistogram] = {}
+        self.status: Dict[str, Dict[str, int]] = {}
+
+    def record(self, name: str, seconds: float, status: str):
+        self.latency.setdefault(name, LatencyHistogram()).record(seconds)
+        counts = self.status.setdefault(name, {})
+        counts[status] = counts.get(status, 0) + 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            name: {"latency": hist.to_dict(), "status": self.status[name]}
+            for name, hist in sorted(self.latency.items())
+        }
+
+
+async def _send(client, recorder, name, scheduled, method, url, payload=None):
+    loop = asyncio.get_running_loop()
+    try:
+        response = await client.request(method, url, json=payload)
+        status = str(response.status_code)
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    recorder.record(name, loop.time() - scheduled, status)
+
+
+async def seed(client, rng, args) -> List[Dict[str, Any]]:
+    response = await client.post(
+        "/api/challenges/preview", json={"difficulty": "easy", "topics": ["JOIN"]}
+    )
+    response.raise_for_status()
+    template = response.json()
+
+    seeded = []
+    for _ in range(args.challenges):
+        challenge = build_challenge(template, rng, args.rows, args.tests)
+        response = await client.post("/api/challenges/approve", json=challenge)
+        response.raise_for_status()
+        seeded.append({"id": response.json()["id"], "queries": build_queries(challenge)})
+    return seeded
+
+
+async def run_load(client, rng, args, seeded) -> Dict[str, Any]:
+    weights = SCENARIOS[args.scenario]
+    recorder = Recorder()
+    loop = asyncio.get_running_loop()
+    tasks = []
+
+    total = int(args.rate * args.duration)
+    start = loop.time()
+    for i in range(total):
+        scheduled = start + i / args.rate
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        challenge = rng.choice(seeded)
+        endpoint = _pick(rng, weights)
+        if endpoint == "execute":
+            kind = _pick(rng, QUERY_MIX)
+            query = rng.choice(challenge["queries"][kind])
+            request = (
+                f"execute:{kind}",
+                "POST",
+                "/api/executor/execute",
+                {"challenge_id": challenge["id"], "query": query},
+            )
+        elif endpoint == "drafts_save":
+            request = (
+                endpoint,
+                "POST",
+                "/api/drafts/save",
+                {"challenge_id": challenge["id"], "query": f"SELECT {rng.random()}"},
+            )
+        elif endpoint == "history_stats":
+            request = (endpoint, "GET", "/api/history/stats", None)
+        else:
+            request = (endpoint, "GET", "/api/history/submissions", None)
+
+        name, method, url, payload = request
+        tasks.append(
+            asyncio.create_task(
+                _send(client, recorder, name, scheduled, method, url, payload)
+            )
+        )
+
+    await asyncio.gather(*tasks)
+    elapsed = loop.time() - start
+
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "requests": total,
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "endpoints": recorder.to_dict(),
+    }
+
+
+async def run(args) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    timeout = httpx.Timeout(args.timeout)
+
+    if args.base_url:
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=timeout) as client:
+            seeded = await seed(client, rng, args)
+            return await run_load(client, rng, args, seeded)
+
+    from app.database import Base, engine
+    from main import app
+
+    Base.metadata.create_all(engine)
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench", timeout=timeout
+        ) as client:
+            seeded = await seed(client, rng, args)
+            return await run_load(client, rng, args, seeded)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="End-to-end API load test")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="mixed")
+    parser.add_argument("--rate", type=float, default=20.0, help="requests per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--challenges", type=int, default=3)
+    parser.add_argument("--rows", type=int, default=50, help="rows per table per test")
+    parser.add_argument("--tests", type=int, default=10, help="test cases per challenge")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--base-url", help="target a running server instead")
+    parser.add_argument("--database-url", help="database for the in-process app")
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument(
+        "--max-p99-ms", type=float, help="exit non-zero if any endpoint p99 exceeds this"
+    )
+    args = parser.parse_args(argv)
+
+    if not args.base_url:
+        if args.database_url:
+            os.environ["DATABASE_URL"] = args.database_url
+        else:
+            db_path = os.path.join(tempfile.mkdtemp(prefix="sql-bench-"), "bench.db")
+            os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+        os.environ["GROQ_API_KEY"] = "test_key"
+
+    started = time.time()
+    results = asyncio.run(run(args))
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k != "database_url"},
+        "started_at": started,
+        **results,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+    if args.max_p99_ms is not None:
+        slow = [
+            name
+            for name, stats in results["endpoints"].items()
+            if stats["latency"]["p99_ms"] > args.max_p99_ms
+        ]
+        if slow:
+            print(f"p99 above {args.max_p99_ms} ms: {', '.join(slow)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""Microbenchmarks for the stages of SQLExecutor.
+
+Each stage is timed in isolation over synthetic schemas. The grid covers
+table counts, row counts, column types and result sizes. Stages are:
+_create_connection, the cold and warm acquire/release cycles, _setup_schema,
+_insert_data (and the compiled-plan loader), _execute_query,
+_normalize_result and _compare_results.
+Allocations are measured with tracemalloc in a separate pass, so tracing
+does not distort the timings.
+
+    python -m benchmarks.executor_micro
+    python -m benchmarks.executor_micro --quick --stage insert_data --output micro.json
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from app.services.sql_executor import SQLExecutor
+
+COLUMN_TYPES = ["INTEGER", "DECIMAL(10,2)", "DATE", "DOUBLE"]
+
+GRID = {
+    "tables": [1, 4, 16],
+    "rows": [10, 100, 1000],
+    "result_size": [10, 100, 1000, 10000],
+}
+
+QUICK_GRID = {
+    "tables": [1, 4],
+    "rows": [10, 100],
+    "result_size": [10, 1000],
+}
+
+
+def synthetic_schema(tables: int, column_type: str, columns: int = 4) -> dict:
+    return {
+        "tables": [
+            {
+                "name": f"t{t}",
+                "columns": [{"name": "id", "type": "INTEGER", "constraints": "PRIMARY KEY"}]
+                + [{"name": f"c{c}", "type": column_type} for c in range(columns)],
+            }
+            for t in range(tables)
+        ]
+    }
+
+
+def _value(rng: random.Random, column_type: str) -> Any:
+    if column_type == "INTEGER":
+        return rng.randint(0, 1_000_000)
+    if column_type == "DATE":
+        return (date(2020, 1, 1) + timedelta(days=rng.randint(0, 2000))).isoformat()
+    return round(rng.uniform(0, 10_000), 2)
+
+
+def synthetic_data(schema: dict, rows: int, column_type: str, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    data = {}
+    for table in schema["tables"]:
+        names = [col["name"] for col in table["columns"][1:]]
+        data[table["name"]] = [
+            {"id": i + 1, **{name: _value(rng, column_type) for name in names}}
+            for i in range(rows)
+        ]
+    return data
+
+
+class Case:
+    """One benchmark point: fresh state per iteration from setup()."""
+
+    def __init__(
+        self,
+        stage: str,
+        params: Dict[str, Any],
+        run: Callable[[Any], Any],
+        setup: Callable[[], Any] = lambda: None,
+        teardown: Callable[[Any], None] = lambda state: None,
+    ):
+        self.stage = stage
+        self.params = params
+        self.run = run
+        self.setup = setup
+        self.teardown = teardown
+
+
+def _connected(executor: SQLExecutor, schema: Optional[dict] = None, data: Optional[dict] = None):
+    def setup():
+        conn = executor._create_connection()
+        if schema is not None:
+            executor._setup_schema(conn, schema)
+        if data is not None:
+            executor._insert_data(conn, data)
+        return conn
+
+    return setup
+
+
+def build_cases(executor: SQLExecutor, grid: Dict[str, List[int]]) -> List[Case]:
+    cases = [
+        Case(
+            "create_connection",
+            {},
+            run=lambda state: executor._create_connection().close(),
+        ),
+        Case(
+            "connection_cycle",
+            {"mode": "cold"},
+            # Without a warm connection the cycle pays for the connect, the
+            # baseline snapshot and the fixture ATTACH
+            setup=lambda: executor._discard_connection("benchmark"),
+            run=lambda state: executor._release_connection(
+                executor._acquire_connection()
+            ),
+        ),
+        Case(
+            "connection_cycle",
+            {"mode": "warm"},
+            run=lambda state: executor._release_connection(
+                executor._acquire_connection()
+            ),
+        ),
+    ]
+
+    for tables in grid["tables"]:
+        schema = synthetic_schema(tables, "INTEGER")
+        cases.append(
+            Case(
+                "setup_schema",
+                {"tables": tables},
+                setup=_connected(executor),
+                run=lambda conn, schema=schema: executor._setup_schema(conn, schema),
+                teardown=lambda conn: conn.close(),
+            )
+        )
+
+    for column_type in COLUMN_TYPES:
+        for rows in grid["rows"]:
+            schema = synthetic_schema(1, column_type)
+            data = synthetic_data(schema, rows, column_type)
+            plan = executor.build_plan(schema, [{"name": "bench", "input_data": data}])
+            params = {"column_type": column_type, "rows": rows}
+            cases.append(
+                Case(
+                    "insert_data",
+                    params,
+                    setup=_connected(executor, schema),
+                    run=lambda conn, data=data: executor._insert_data(conn, data),
+                    teardown=lambda conn: conn.close(),
+                )
+            )
+            cases.append(
+                Case(
+                    "load_inserts",
+                    params,
+                    setup=_connected(executor, schema),
+                    run=lambda conn, plan=plan: executor._load_inserts(
+                        conn, plan["test_cases"][0]["inserts"]
+                    ),
+                    teardown=lambda conn: conn.close(),
+                )
+            )
+
+    for column_type in COLUMN_TYPES:
+        for size in grid["result_size"]:
+            schema = synthetic_schema(1, column_type)
+            data = synthetic_data(schema, size, column_type)
+            params = {"column_type": column_type, "result_size": size}
+
+            conn = executor._create_connection()
+            executor._setup_schema(conn, schema)
+            executor._insert_data(conn, data)
+            raw = executor._execute_query(conn, "SELECT * FROM t0")
+            conn.close()
+            expected = executor._normalize_result(raw)
+
+            cases.append(
+                Case(
+                    "execute_query",
+                    params,
+                    setup=_connected(executor, schema, data),
+                    run=lambda conn: executor._execute_query(conn, "SELECT * FROM t0"),
+                    teardown=lambda conn: conn.close(),
+                )
+            )
+            cases.append(
+                Case(
+                    "normalize_result",
+                    params,
+                    run=lambda state, raw=raw: executor._normalize_result(raw),
+                )
+            )
+            cases.append(
+                Case(
+                    "compare_results",
+                    params,
+                    run=lambda state, raw=raw, expected=expected: executor._compare_results(
+                        expected, raw
+                    ),
+                )
+            )
+
+    return cases
+
+
+def _rows_per_case(case: Case) -> int:
+    return case.params.get("rows") or case.params.get("result_size") or 0
+
+
+def time_case(case: Case, repeat: int, warmup: int) -> Dict[str, Any]:
+    samples = []
+    for i in range(warmup + repeat):
+        state = case.setup()
+        start = time.perf_counter_ns()
+        case.run(state)
+        elapsed = time.perf_counter_ns() - start
+        case.teardown(state)
+        if i >= warmup:
+            samples.append(elapsed)
+
+    samples.sort()
+    mean_ns = statistics.fmean(samples)
+    result = {
+        "ops_per_s": round(1e9 / mean_ns, 2) if mean_ns else 0.0,
+        "mean_us": round(mean_ns / 1000, 3),
+        "p50_us": round(samples[len(samples) // 2] / 1000, 3),
+        "p99_us": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] / 1000, 3),
+        "stdev_us": round(statistics.pstdev(samples) / 1000, 3),
+    }
+    rows = _rows_per_case(case)
+    if rows:
+        result["rows_per_s"] = round(rows * 1e9 / mean_ns, 2)
+    return result
+
+
+def measure_allocations(case: Case, repeat: int) -> Dict[str, int]:
+    allocated = []
+    peaks = []
+    for _ in range(repeat):
+        state = case.setup()
+        tracemalloc.start()
+        try:
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            case.run(state)
+            after, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        case.teardown(state)
+        allocated.append(after - before)
+        peaks.append(peak - before)
+    return {"retained_bytes": max(allocated), "peak_bytes": max(peaks)}
+
+
+def scaling_curves(results: List[Dict[str, Any]]) -> Dict[str, Dict[str, List[List[float]]]]:
+    """mean_us as a function of the size parameter, one series per column type."""
+    curves: Dict[str, Dict[str, List[List[float]]]] = {}
+    for entry in results:
+        params = entry["params"]
+        axis = next((k for k in ("tables", "rows", "result_size") if k in params), None)
+        if axis is None:
+            continue
+        series = curves.setdefault(entry["stage"], {}).setdefault(
+            f"{params.get('column_type', 'INTEGER')}:{axis}", []
+        )
+        series.append([params[axis], entry["mean_us"]])
+    return curves
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="SQLExecutor stage microbenchmarks")
+    parser.add_argument("--quick", action="store_true", help="smaller grid")
+    parser.add_argument("--stage", action="append", help="only run these stages")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--alloc-repeat", type=int, default=3)
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args(argv)
+
+    executor = SQLExecutor()
+    cases = build_cases(executor, QUICK_GRID if args.quick else GRID)
+    if args.stage:
+        cases = [case for case in cases if case.stage in args.stage]
+
+    results = []
+    for case in cases:
+        entry = {"stage": case.stage, "params": case.params}
+        entry.update(time_case(case, args.repeat, args.warmup))
+        entry.update(measure_allocations(case, args.alloc_repeat))
+        results.append(entry)
+        print(
+            f"{case.stage:<18} {json.dumps(case.params):<48} "
+            f"{entry['mean_us']:>12.1f} us  {entry['peak_bytes']:>12} B peak"
+        )
+
+    executor.executor.shutdown(wait=False)
+
+    report = {
+        "config": vars(args),
+        "results": results,
+        "scaling": scaling_curves(results),
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import math
+from typing import Dict, List
+
+
+class LatencyHistogram:
+    """HDR-style histogram: log2 buckets split into linear sub-buckets.
+
+    Values are recorded in microseconds with a relative error bounded by
+    1 / sub_buckets, so memory stays fixed no matter how many samples.
+    """
+
+    def __init__(self, sub_buckets: int = 256, max_exponent: int = 40):
+        self.sub_buckets = sub_buckets
+        self.sub_bits = int(math.log2(sub_buckets))
+        self.counts: List[int] = [0] * ((max_exponent + 1) * sub_buckets)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def _index(self, value: int) -> int:
+        if value < self.sub_buckets:
+            return value
+        exponent = value.bit_length() - self.sub_bits
+        sub = value >> exponent
+        return exponent * self.sub_buckets + sub
+
+    def _value_at(self, index: int) -> int:
+        exponent, sub = divmod(index, self.sub_buckets)
+        if exponent == 0:
+            return sub
+        return ((sub + 1) << exponent) - 1
+
+    def record(self, seconds: float):
+        value = max(0, int(seconds * 1_000_000))
+        index = min(self._index(value), len(self.counts) - 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "LatencyHistogram"):
+        for i, c in enumerate(other.counts):
+            self.counts[i] += c
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def percentile(self, p: float) -> float:
+        """Value in milliseconds at percentile p (0-100)."""
+        if not self.count:
+            return 0.0
+        target = max(1, math.ceil(self.count * p / 100))
+        seen = 0
+        for index, c in enumerate(self.counts):
+            seen += c
+            if seen >= target:
+                return min(self._value_at(index), self.max) / 1000
+        return self.max / 1000
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "min_ms": (self.min or 0) / 1000,
+            "mean_ms": (self.total / self.count / 1000) if self.count else 0.0,
+            "p50_ms": self.percentile(50),
+            "p90_ms": self.percentile(90),
+            "p99_ms": self.percentile(99),
+            "p999_ms": self.percentile(99.9),
+            "max_ms": self.max / 1000,
+        }
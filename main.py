@@ -1,11 +1,42 @@
-from fastapi import FastAPI
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import challenges, executor, history, drafts
+from fastapi.responses import PlainTextResponse
+from app.api import challenges, executor, history, drafts, regrade, worker
+from app.services.submission_writer import submission_writer
+from app.services.draft_coalescer import draft_coalescer
+from app.services.regrade import regrade_service
+from app.services.parquet_datasets import parquet_datasets
+from app.services.remote_executor import grading_backend
+from app.services.sql_executor import executor as sql_executor
+from app.services import metrics
+from app.config import settings
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await submission_writer.start()
+    await draft_coalescer.start()
+    await regrade_service.start()
+    await parquet_datasets.start()
+    if sql_executor.store is not None:
+        await asyncio.to_thread(sql_executor.store.sweep)
+    await grading_backend.start()
+    yield
+    await grading_backend.stop()
+    await parquet_datasets.stop()
+    await regrade_service.stop()
+    await draft_coalescer.stop()
+    await submission_writer.stop()
+
 
 app = FastAPI(
     title="SQL Challenge API",
     description="API для генерации и проверки SQL задач",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -18,10 +49,37 @@ app.add_middleware(
     max_age=3600,
 )
 
+
+def _route_template(request: Request) -> str:
+    route = request.scope.get("route")
+    return getattr(route, "path_format", None) or "unmatched"
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status = "500"
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+        return response
+    finally:
+        metrics.HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            request.method,
+            _route_template(request),
+            status,
+        )
+
+
 app.include_router(challenges.router, prefix="/api/challenges", tags=["challenges"])
 app.include_router(executor.router, prefix="/api/executor", tags=["execute"])
 app.include_router(history.router, prefix="/api/history", tags=["history"])
 app.include_router(drafts.router, prefix="/api/drafts", tags=["drafts"])
+app.include_router(regrade.router, prefix="/api/regrade", tags=["regrade"])
+if settings.EXECUTOR_WORKER_TOKEN:
+    # Grading-node endpoints run submitted jobs; never serve them unauthenticated
+    app.include_router(worker.router, prefix="/api/worker", tags=["worker"])
 
 
 @app.get("/")
@@ -32,3 +90,10 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    return PlainTextResponse(
+        metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4"
+    )
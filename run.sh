@@ -13,6 +13,7 @@ pip install -r requirements.txt
 
 echo "Применение миграций..."
 alembic upgrade head
+python -m app.services.submission_partitions create
 
 echo "Запуск сервера..."
 uvicorn main:app --reload --host 0.0.0.0 --port 8000
@@ -0,0 +1,100 @@
+import asyncio
+import os
+
+os.environ.setdefault("GROQ_API_KEY", "test_key")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import duckdb
+import pytest
+
+from app.config import settings
+from app.services.parquet_datasets import parquet_datasets
+from app.services.sql_executor import dataset_views, executor, schema_column_types
+
+SCHEMA = {
+    "tables": [
+        {
+            "name": "orders",
+            "columns": [
+                {"name": "id", "type": "INTEGER", "constraints": "PRIMARY KEY"},
+                {"name": "ordered_on", "type": "DATE"},
+                {"name": "created_at", "type": "TIMESTAMP"},
+                {"name": "amount", "type": "DECIMAL(10,2)"},
+            ],
+        }
+    ]
+}
+
+
+@pytest.fixture
+def dataset(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "DATASETS_DIR", str(tmp_path))
+    spec = parquet_datasets.spec(SCHEMA, 500, 7)
+    parquet_datasets.ensure(SCHEMA, spec)
+    conn = duckdb.connect(":memory:")
+    for view in dataset_views(spec["key"], schema_column_types(SCHEMA)):
+        conn.execute(view)
+    yield conn
+    conn.close()
+
+
+def test_views_keep_declared_types(dataset):
+    types = {row[0]: row[1] for row in dataset.execute("DESCRIBE orders").fetchall()}
+    assert types == {
+        "id": "INTEGER",
+        "ordered_on": "DATE",
+        "created_at": "TIMESTAMP",
+        "amount": "DECIMAL(10,2)",
+    }
+
+
+def test_date_and_decimal_predicates(dataset):
+    total = dataset.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+    before, after = dataset.execute(
+        "SELECT COUNT(*) FILTER (WHERE ordered_on < DATE '2000-01-01' + 250), "
+        "COUNT(*) FILTER (WHERE ordered_on >= DATE '2000-01-01' + 250) FROM orders"
+    ).fetchone()
+    assert before + after == total == 500
+
+    months = dataset.execute(
+        "SELECT date_trunc('month', created_at) AS m, EXTRACT(year FROM ordered_on) "
+        "FROM orders GROUP BY ALL"
+    ).fetchall()
+    assert months
+
+    cheap = dataset.execute(
+        "SELECT COUNT(*) FROM orders WHERE amount < 100.50"
+    ).fetchone()[0]
+    assert 0 <= cheap <= total
+
+
+def test_compute_output_runs_on_the_executor(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "DATASETS_DIR", str(tmp_path))
+    spec = parquet_datasets.spec(SCHEMA, 200, 3)
+    rows = asyncio.run(
+        parquet_datasets.compute_output(
+            "SELECT EXTRACT(year FROM ordered_on) AS y, SUM(amount) AS total "
+            "FROM orders WHERE ordered_on >= DATE '2000-01-01' GROUP BY y ORDER BY y",
+            SCHEMA,
+            spec,
+        )
+    )
+    assert rows and all(set(row) == {"y", "total"} for row in rows)
+
+    with pytest.raises(ValueError):
+        asyncio.run(
+            parquet_datasets.compute_output(
+                "SELECT * FROM read_csv('/etc/passwd')", SCHEMA, spec
+            )
+        )
+
+
+def test_plan_rejects_bad_dataset_key():
+    test_case = {
+        "name": "big",
+        "input_data": {},
+        "expected_output": [],
+        "dataset": {"key": "../../etc", "rows": 1, "seed": 0},
+    }
+    with pytest.raises(ValueError):
+        executor.build_plan(SCHEMA, [test_case])